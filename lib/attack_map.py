@@ -0,0 +1,134 @@
+"""Attack maps of a position, computed once from python-chess bitboards
+Queries are integer mask operations instead of loops over attackers
+"""
+import chess
+from constants import PIECE_TYPES_TO_ROUGH_VALUES
+
+SLIDER_ATTACKS = [(chess.BB_FILE_ATTACKS, chess.BB_FILE_MASKS, chess.ROOK),
+                  (chess.BB_RANK_ATTACKS, chess.BB_RANK_MASKS, chess.ROOK),
+                  (chess.BB_DIAG_ATTACKS, chess.BB_DIAG_MASKS, chess.BISHOP)]
+
+
+class AttackMap:
+    """Every mask is indexed by color, and by piece type where there is one.
+    A piece pinned to its king only attacks squares along the pin.
+    """
+
+    def __init__(self, board: chess.Board):
+        self.board = board
+        # pinned[color] holds the pieces of color pinned to their king
+        self.pinned = [chess.BB_EMPTY, chess.BB_EMPTY]
+        # Square of a pinned piece to the line it is pinned along
+        self.pin_rays = {}
+        # attacks[color][piece_type] holds the squares attacked by pieces of color and piece_type
+        self.attacks = [[chess.BB_EMPTY] * 7, [chess.BB_EMPTY] * 7]
+        # all_attacks[color] holds the squares attacked by any piece of color
+        self.all_attacks = [chess.BB_EMPTY, chess.BB_EMPTY]
+        # Like all_attacks, but ignoring pins as python-chess's is_attacked_by does
+        self.pseudo_attacks = [chess.BB_EMPTY, chess.BB_EMPTY]
+        # Squares attacked by at least two pieces of color
+        self.double_attacks = [chess.BB_EMPTY, chess.BB_EMPTY]
+        # Squares a slider only attacks through a friendly slider moving along the same line,
+        # i.e. squares backed up by the back piece of a battery
+        self.xray_attacks = [chess.BB_EMPTY, chess.BB_EMPTY]
+        # attacked_by_lesser[color] holds the pieces of color attacked by a piece of lower value
+        self.attacked_by_lesser = [chess.BB_EMPTY, chess.BB_EMPTY]
+
+        for color in chess.COLORS:
+            self._add_pins(color)
+        for color in chess.COLORS:
+            self._add_attacks(color)
+        for color in chess.COLORS:
+            self._add_attacked_by_lesser(color)
+
+    def _add_pins(self, color: chess.Color) -> None:
+        board = self.board
+        king = board.king(color)
+        if king is None:
+            return
+        for attacks, _, piece_type in SLIDER_ATTACKS:
+            sliders = (board.rooks if piece_type == chess.ROOK else board.bishops) | board.queens
+            snipers = attacks[king][0] & sliders & board.occupied_co[not color]
+            for sniper in chess.scan_forward(snipers):
+                blockers = chess.between(king, sniper) & board.occupied
+                if blockers and not blockers & (blockers - 1) and blockers & board.occupied_co[color]:
+                    self.pinned[color] |= blockers
+                    self.pin_rays[chess.lsb(blockers)] = chess.ray(king, sniper)
+
+    def _add_attacks(self, color: chess.Color) -> None:
+        board = self.board
+        attacks = self.attacks[color]
+        all_attacks = chess.BB_EMPTY
+        pseudo_attacks = chess.BB_EMPTY
+        double_attacks = chess.BB_EMPTY
+        for square in chess.scan_forward(board.occupied_co[color]):
+            square_attacks = board.attacks_mask(square)
+            pseudo_attacks |= square_attacks
+            if self.pinned[color] & chess.BB_SQUARES[square]:
+                square_attacks &= self.pin_rays[square]
+            attacks[board.piece_type_at(square)] |= square_attacks
+            double_attacks |= all_attacks & square_attacks
+            all_attacks |= square_attacks
+        self.all_attacks[color] = all_attacks
+        self.pseudo_attacks[color] = pseudo_attacks
+        self.double_attacks[color] = double_attacks
+        self.xray_attacks[color] = self._get_xray_attacks(color)
+
+    def _get_xray_attacks(self, color: chess.Color) -> chess.Bitboard:
+        board = self.board
+        xray_attacks = chess.BB_EMPTY
+        for attacks, masks, piece_type in SLIDER_ATTACKS:
+            sliders = ((board.rooks if piece_type == chess.ROOK else board.bishops) | board.queens) & \
+                board.occupied_co[color] & ~self.pinned[color]
+            # Sliders on the same line see through each other
+            see_through_occupied = board.occupied & ~sliders
+            for square in chess.scan_forward(sliders):
+                xray_attacks |= attacks[square][masks[square] & see_through_occupied] & \
+                    ~attacks[square][masks[square] & board.occupied]
+        return xray_attacks
+
+    def _add_attacked_by_lesser(self, color: chess.Color) -> None:
+        board = self.board
+        enemy_attacks = self.attacks[not color]
+        for piece_type in chess.PIECE_TYPES:
+            if piece_type == chess.KING:
+                continue
+            lesser_attacks = chess.BB_EMPTY
+            for attacker_type in chess.PIECE_TYPES:
+                if PIECE_TYPES_TO_ROUGH_VALUES[attacker_type] < PIECE_TYPES_TO_ROUGH_VALUES[piece_type]:
+                    lesser_attacks |= enemy_attacks[attacker_type]
+            self.attacked_by_lesser[color] |= board.pieces_mask(piece_type, color) & lesser_attacks
+
+    def get_attackers_mask(self, color: chess.Color, square: chess.Square) -> chess.Bitboard:
+        """Pieces of color that can capture on square; a pin to the king is respected
+        and kings can't be captured
+        """
+        board = self.board
+        if board.kings & chess.BB_SQUARES[square]:
+            return chess.BB_EMPTY
+        attackers = board.attackers_mask(color, square)
+        for pinned in chess.scan_forward(attackers & self.pinned[color]):
+            if not self.pin_rays[pinned] & chess.BB_SQUARES[square]:
+                attackers &= ~chess.BB_SQUARES[pinned]
+        return attackers
+
+    def can_capture(self, attacking_piece: chess.Square, attacked_piece: chess.Square) -> bool:
+        """Can attacking_piece, which attacks attacked_piece, take it?
+        """
+        board = self.board
+        if board.kings & chess.BB_SQUARES[attacked_piece]:
+            return False
+        return not self.pinned[board.color_at(attacking_piece)] & chess.BB_SQUARES[attacking_piece] or \
+            bool(self.pin_rays[attacking_piece] & chess.BB_SQUARES[attacked_piece])
+
+    def is_attacked(self, color: chess.Color, square: chess.Square) -> bool:
+        """Can a piece of color capture on square?
+        """
+        return bool(self.all_attacks[color] & chess.BB_SQUARES[square]) and \
+            not self.board.kings & chess.BB_SQUARES[square]
+
+    def get_hanging_pieces(self, color: chess.Color) -> chess.Bitboard:
+        """Pieces of color other than the king that can be captured and aren't defended
+        """
+        board = self.board
+        return board.occupied_co[color] & ~board.kings & self.all_attacks[not color] & ~self.all_attacks[color]
@@ -1,14 +1,25 @@
 import chess
+import chess.polyglot
 import chess_util
 import re
 from typing import List, Set
 from constants import PIECE_TYPES_TO_ROUGH_VALUES
+from attack_map import AttackMap
 from pickle import NONE, FALSE, TRUE
 
 PIECE_TYPES_TO_VALUES = {chess.PAWN: 100, chess.KNIGHT: 305, chess.BISHOP: 330,
                          chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 10_000}
 NON_PAWN_PIECE_TYPES = [chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]
 
+ZOBRIST_HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+ZOBRIST_TURN_KEY = chess.polyglot.POLYGLOT_RANDOM_ARRAY[780]
+
+
+def get_zobrist_piece_key(piece_type: chess.PieceType, color: chess.Color, square: chess.Square) -> int:
+    """Returns the polyglot key for a piece of `piece_type` and `color` on `square`
+    """
+    return chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square]
+
 
 class Board(chess.Board, object):
 
@@ -16,6 +27,16 @@ class Board(chess.Board, object):
         self._phase = {}
         self._squares_to_attackers_and_defenders = {}
         self._squares_to_soft_attackers_and_defenders = {}
+        # AttackMap of the position; None until it is first needed
+        self._attack_map = None
+        # Running zobrist hash; None until it is first needed
+        self._zobrist_hash = None
+        # The castling part of _zobrist_hash, so it is only recomputed when castling rights change
+        self._zobrist_castling_hash = 0
+        # The zobrist hash of only the pawns, set by clear_stack when the position is set
+        self._pawn_zobrist_hash = 0
+        # (zobrist hash, castling hash, pawn hash) before each move in move_stack
+        self._zobrist_stack = []
         super(Board, self).__init__(fen=fen, chess960=chess960)
 
     def copy(self):
@@ -23,21 +44,132 @@ class Board(chess.Board, object):
         board._phase = self._phase.copy()
         board._squares_to_attackers_and_defenders = self._squares_to_attackers_and_defenders.copy()
         board._squares_to_soft_attackers_and_defenders = self._squares_to_soft_attackers_and_defenders.copy()
+        board._attack_map = None
+        board._zobrist_hash = self._zobrist_hash
+        board._zobrist_castling_hash = self._zobrist_castling_hash
+        board._pawn_zobrist_hash = self._pawn_zobrist_hash
+        board._zobrist_stack = self._zobrist_stack.copy()
         return board
 
+    def clear_stack(self):
+        # Every python-chess method that edits the position outside of push/pop clears the stack,
+        # so the running hashes have to be recomputed
+        super().clear_stack()
+        self._attack_map = None
+        self._zobrist_hash = None
+        # Every evaluation looks up the pawn hash, so it is always kept up to date
+        self._pawn_zobrist_hash = 0
+        for color in chess.COLORS:
+            for square in chess.scan_forward(self.pawns & self.occupied_co[color]):
+                self._pawn_zobrist_hash ^= get_zobrist_piece_key(chess.PAWN, color, square)
+        self._zobrist_stack = []
+
     # Todo: Update phase rather than reset it
     def push(self, move):
         self._phase.clear()
         self._squares_to_attackers_and_defenders.clear()
         self._squares_to_soft_attackers_and_defenders.clear()
-        return super().push(move)
+        self._attack_map = None
+        self._zobrist_stack.append((self._zobrist_hash, self._zobrist_castling_hash, self._pawn_zobrist_hash))
+        if self._zobrist_hash is None:
+            white_pawns_before = self.pawns & self.occupied_co[chess.WHITE]
+            black_pawns_before = self.pawns & self.occupied_co[chess.BLACK]
+            result = super().push(move)
+            # Only pawn moves and captures change the pawns
+            for square in chess.scan_forward(white_pawns_before ^ self.pawns & self.occupied_co[chess.WHITE]):
+                self._pawn_zobrist_hash ^= get_zobrist_piece_key(chess.PAWN, chess.WHITE, square)
+            for square in chess.scan_forward(black_pawns_before ^ self.pawns & self.occupied_co[chess.BLACK]):
+                self._pawn_zobrist_hash ^= get_zobrist_piece_key(chess.PAWN, chess.BLACK, square)
+            return result
+
+        pieces_before = self._get_pieces_by_color()
+        castling_rights_before = self.castling_rights
+        zobrist_hash = self._zobrist_hash ^ ZOBRIST_HASHER.hash_ep_square(self)
+        result = super().push(move)
+
+        zobrist_hash ^= ZOBRIST_TURN_KEY ^ ZOBRIST_HASHER.hash_ep_square(self)
+        if self.castling_rights != castling_rights_before:
+            zobrist_hash ^= self._zobrist_castling_hash
+            self._zobrist_castling_hash = ZOBRIST_HASHER.hash_castling(self)
+            zobrist_hash ^= self._zobrist_castling_hash
+        # Only the few squares touched by the move differ (including castling rooks,
+        # en passant captures, and promotions)
+        for i, pieces_after in enumerate(self._get_pieces_by_color()):
+            changed_squares = pieces_before[i] ^ pieces_after
+            if changed_squares:
+                piece_type = i // 2 + 1
+                color = i % 2
+                for square in chess.scan_forward(changed_squares):
+                    key = get_zobrist_piece_key(piece_type, color, square)
+                    zobrist_hash ^= key
+                    if piece_type == chess.PAWN:
+                        self._pawn_zobrist_hash ^= key
+        self._zobrist_hash = zobrist_hash
+        return result
 
     # Todo: Update phase rather than reset it
     def pop(self):
         self._phase.clear()
         self._squares_to_attackers_and_defenders.clear()
         self._squares_to_soft_attackers_and_defenders.clear()
-        return super().pop()
+        self._attack_map = None
+        move = super().pop()
+        self._zobrist_hash, self._zobrist_castling_hash, self._pawn_zobrist_hash = self._zobrist_stack.pop()
+        return move
+
+    def _get_pieces_by_color(self) -> List[chess.Bitboard]:
+        """Returns the bitboard for every piece type and color,
+        ordered the same way as the polyglot piece keys
+        """
+        black = self.occupied_co[chess.BLACK]
+        white = self.occupied_co[chess.WHITE]
+        return [self.pawns & black, self.pawns & white,
+                self.knights & black, self.knights & white,
+                self.bishops & black, self.bishops & white,
+                self.rooks & black, self.rooks & white,
+                self.queens & black, self.queens & white,
+                self.kings & black, self.kings & white]
+
+    def get_zh(self) -> int:
+        """Gets the zobrist hash of the position.
+        The hash is kept up to date by push and pop, so this is O(1) after the first call.
+        """
+        if self._zobrist_hash is None:
+            self._zobrist_castling_hash = ZOBRIST_HASHER.hash_castling(self)
+            self._zobrist_hash = chess.polyglot.zobrist_hash(self)
+        return self._zobrist_hash
+
+    def get_pawn_zh(self) -> int:
+        """Gets the zobrist hash of only the pawns, which only changes on pawn moves and captures
+        """
+        return self._pawn_zobrist_hash
+
+    def get_attack_map(self) -> AttackMap:
+        """Gets the attack maps of the position, computing them once per position
+        """
+        if self._attack_map is None:
+            self._attack_map = AttackMap(self)
+        return self._attack_map
+
+    def is_repetition(self, count: int = 3) -> bool:
+        """Compares zobrist hashes rather than replaying the move stack.
+        Falls back to python-chess when hashes are missing for part of the game.
+        """
+        zobrist_hash = self._zobrist_hash
+        if zobrist_hash is None:
+            return super().is_repetition(count)
+        num_repetitions = 1
+        # Positions before the last capture or pawn move cannot repeat
+        max_plies_back = min(self.halfmove_clock, len(self._zobrist_stack))
+        for plies_back in range(2, max_plies_back + 1, 2):
+            previous_hash = self._zobrist_stack[-plies_back][0]
+            if previous_hash is None:
+                return super().is_repetition(count)
+            if previous_hash == zobrist_hash:
+                num_repetitions += 1
+                if num_repetitions >= count:
+                    return True
+        return num_repetitions >= count
 
     def get_position_string(self) -> str:
         """Gets the FEN without the halfmove clock or fullmove number.
@@ -126,18 +258,16 @@ class Board(chess.Board, object):
     def get_pinned_attackers_and_defenders(self, piece, defend_color=None):
         if defend_color is None:
             defend_color = self.color_at(piece)
-        pinned_attackers = []
+        attack_map = self.get_attack_map()
         all_attackers = self.attackers(not defend_color, piece)
         all_defenders = self.attackers(defend_color, piece)
-        for attacker in all_attackers:
-            if (not chess_util.can_piece_capture(self, attacker, piece)) and \
-                    chess_util.get_pinner(self, attacker) in all_defenders:
-                pinned_attackers.append(attacker)
-        pinned_defenders = []
-        for defender in all_defenders:
-            if (not chess_util.can_piece_capture(self, defender, piece)) and \
-                    chess_util.get_pinner(self, defender) in all_attackers:
-                pinned_defenders.append(defender)
+        # Pieces pinned to their king away from piece
+        pinned_away_attackers = int(all_attackers) & ~attack_map.get_attackers_mask(not defend_color, piece)
+        pinned_away_defenders = int(all_defenders) & ~attack_map.get_attackers_mask(defend_color, piece)
+        pinned_attackers = [attacker for attacker in chess.scan_forward(pinned_away_attackers)
+                            if chess_util.get_pinner(self, attacker) in all_defenders]
+        pinned_defenders = [defender for defender in chess.scan_forward(pinned_away_defenders)
+                            if chess_util.get_pinner(self, defender) in all_attackers]
         return pinned_attackers, pinned_defenders
 
     # Gets attackers of square that are part of a battery of attackers (param)
@@ -163,10 +293,9 @@ class Board(chess.Board, object):
             -> (List[chess.Square], List[chess.Square]):
         if defend_color is None:
             defend_color = self.color_at(square)
-        attackers = [attacker for attacker in self.attackers(not defend_color, square) if
-                     chess_util.can_piece_capture(self, attacker, square)]
-        defenders = [attacker for attacker in self.attackers(defend_color, square) if
-                     chess_util.can_piece_capture(self, attacker, square)]
+        attack_map = self.get_attack_map()
+        attackers = list(chess.scan_forward(attack_map.get_attackers_mask(not defend_color, square)))
+        defenders = list(chess.scan_forward(attack_map.get_attackers_mask(defend_color, square)))
         return attackers, defenders
 
     def is_soft_pinned(self, piece: chess.Square):
@@ -203,8 +332,7 @@ class Board(chess.Board, object):
 
     def has_defender(self, piece: chess.Square):
         defend_color = self.color_at(piece)
-        return any(
-            chess_util.can_piece_capture(self, defender, piece) for defender in self.attackers(defend_color, piece))
+        return bool(self.get_attack_map().get_attackers_mask(defend_color, piece))
 
     def get_soft_first_attackers(self, square: chess.Square, defend_color: chess.Color) -> List[chess.Square]:
         """Get first attackers - the pieces of color that can move to square first
@@ -329,8 +457,7 @@ class Board(chess.Board, object):
         """Is `piece` attacked by a weaker piece
         """
         piece_color = self.color_at(piece)
-        return any(attacker for attacker in self.attackers(not piece_color, piece)
-                   if self.is_stronger_piece_attacked_by(attacker, piece))
+        return bool(self.get_attack_map().attacked_by_lesser[piece_color] & chess.BB_SQUARES[piece])
 
     def is_hanging_piece_attacked_by(self, attacking_piece: chess.Square,
                                      attacked_piece: chess.Square) -> bool:
@@ -26,6 +26,34 @@ PIECE_TYPES_TO_VALUES = {chess.PAWN: 100, chess.KNIGHT: 305, chess.BISHOP: 330,
 PIECE_TYPES_TO_ROUGH_VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 300,
 							chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 10_000}
 
+# Geometry bitboards used by the helpers below, built once at import
+# Both diagonals through each square, including the square
+BB_DIAGONALS = [chess.BB_DIAG_ATTACKS[square][0] | chess.BB_SQUARES[square] for square in chess.SQUARES]
+BB_FILE_AND_RANKS = [chess.BB_FILE_ATTACKS[square][0] | chess.BB_RANK_ATTACKS[square][0] | chess.BB_SQUARES[square]
+					for square in chess.SQUARES]
+# Files next to the file of each square, as file indices and as a bitboard
+ADJACENT_FILES = [[adjacent_file for adjacent_file in [chess.square_file(square) - 1, chess.square_file(square) + 1]
+				if 0 <= adjacent_file <= MAX_FILE] for square in chess.SQUARES]
+BB_ADJACENT_FILES = [sum(chess.BB_FILES[adjacent_file] for adjacent_file in ADJACENT_FILES[square])
+					for square in chess.SQUARES]
+# Indexed by two squares, see between_inclusive and start_ray
+BB_BETWEEN_INCLUSIVE = [[chess.BB_RAYS[a][b] & ((chess.BB_ALL << a) ^ (chess.BB_ALL << (b+1))) for b in chess.SQUARES]
+						for a in chess.SQUARES]
+BB_START_RAYS = [[chess.BB_RAYS[a][b] & (chess.BB_ALL << a) for b in chess.SQUARES] for a in chess.SQUARES]
+
+def get_ranks_in_front_mask(square: chess.Square, color: chess.Color) -> chess.Bitboard:
+	"""Returns the ranks in front of square from color's side of the board
+	"""
+	if color == chess.WHITE:
+		return chess.BB_ALL & (chess.BB_ALL << 8 * (chess.square_rank(square) + 1))
+	return (1 << 8 * chess.square_rank(square)) - 1
+
+# Squares in front of a pawn on its file, and also on the adjacent files, indexed by color then square
+BB_FRONT_SPANS = [[chess.BB_FILES[chess.square_file(square)] & get_ranks_in_front_mask(square, color)
+				for square in chess.SQUARES] for color in chess.COLORS[::-1]]
+BB_PASSED_PAWN_SPANS = [[(chess.BB_FILES[chess.square_file(square)] | BB_ADJACENT_FILES[square]) &
+						get_ranks_in_front_mask(square, color) for square in chess.SQUARES] for color in chess.COLORS[::-1]]
+
 # Returns True if the piece is on a light square
 # piece must be a Square
 def is_piece_on_light_square(piece):
@@ -47,62 +75,40 @@ def on_dark_squares(pieces: chess.SquareSet) -> bool:
 
 # Returns SquareSet containing all squares on the diagonals associated with the square
 def get_diagonals(square):
-	file = chess.square_file(square)
-	rank = chess.square_rank(square)
-	diagonal_squares = chess.SquareSet()
-	for file_mod in [-1, 1]:
-		for rank_mod in [-1, 1]:
-			diagonal_file = file + file_mod
-			diagonal_rank = rank + rank_mod
-			if diagonal_file >= chess.square_file(chess.A1) and diagonal_file <= chess.square_file(chess.H8) \
-				and diagonal_rank >= chess.square_rank(chess.A1) and diagonal_rank <= chess.square_rank(chess.H8):
-				diagonal_squares = diagonal_squares.union(chess.SquareSet.ray(square, chess.square(diagonal_file, diagonal_rank)))
-	return diagonal_squares
+	return chess.SquareSet(BB_DIAGONALS[square])
+
+def get_diagonals_mask(square: chess.Square) -> chess.Bitboard:
+	return BB_DIAGONALS[square]
 
 # Returns a list of the files adjacent to square
 # e.g. 0 is the A file, 7 is the H file
 def get_adjacent_files(square):
-	file = chess.square_file(square)
-	adjacent_files = [file-1, file+1]
-	return [adjacent_file for adjacent_file in adjacent_files if adjacent_file >= 0 and adjacent_file <= MAX_FILE]
+	return list(ADJACENT_FILES[square])
+
+def get_adjacent_files_mask(square: chess.Square) -> chess.Bitboard:
+	return BB_ADJACENT_FILES[square]
 
 # Returns SquareSet containing all squares on the same file associated with the square
 def get_file_squares(square):
-	same_file_square = add_rank(square, 1)
-	if not same_file_square:
-		same_file_square = add_rank(square, -1)
-	return chess.SquareSet.ray(square, same_file_square)
+	return chess.SquareSet(chess.BB_FILES[chess.square_file(square)])
+
+def get_file_mask(square: chess.Square) -> chess.Bitboard:
+	return chess.BB_FILES[chess.square_file(square)]
 
 # Returns SquareSet containing all squares on the same rank and file associated with the square
 def get_file_and_rank_squares(square):
-	file = chess.square_file(square)
-	rank = chess.square_rank(square)
-	result_squares = chess.SquareSet()
-	for mod in [-1, 1]:
-		result_file = file + mod
-		if result_file >= chess.square_file(chess.A1) and result_file <= chess.square_file(chess.H8):
-			result_squares = result_squares.union(chess.SquareSet.ray(square, chess.square(result_file, rank)))
-		result_rank = rank + mod
-		if result_rank >= chess.square_file(chess.A1) and result_rank <= chess.square_file(chess.H8):
-			result_squares = result_squares.union(chess.SquareSet.ray(square, chess.square(file, result_rank)))
-	return result_squares
+	return chess.SquareSet(BB_FILE_AND_RANKS[square])
+
+def get_file_and_rank_mask(square: chess.Square) -> chess.Bitboard:
+	return BB_FILE_AND_RANKS[square]
 
 # Checks if the file containing square has one pawn on it
 def is_half_open_file(board, square):
-	file_squares = get_file_squares(square)
-	pawn_count = 0
-	for file_square in file_squares:
-		if board.piece_type_at(file_square) == chess.PAWN:
-			pawn_count += 1
-	return pawn_count == 1
+	return chess.popcount(board.pawns & get_file_mask(square)) == 1
 
 # Checks if the file containing square has no pawns on it
 def is_open_file(board, square):
-	file_squares = get_file_squares(square)
-	for file_square in file_squares:
-		if board.piece_type_at(file_square) == chess.PAWN:
-			return False
-	return True
+	return not board.pawns & get_file_mask(square)
 
 # Returns the square + num_ranks or None if square is not in the board
 # e.g., A1 + 1 = A2, A8 + 1 = None
@@ -136,26 +142,43 @@ def get_prior_pawn_square(pawn: chess.Square, pawn_color: chess.Color) -> chess.
 
 # Returns squares 1 king distance away from square
 def get_adjacent_squares(square):
-	return {x for x in chess.SQUARES if chess.square_distance(x, square) == 1}
+	return set(chess.scan_forward(chess.BB_KING_ATTACKS[square]))
 
 # Returns 0 to 7 for the rank where the values are flipped if color is black
 def get_adjusted_rank(square, color):
 	return chess.square_rank(square) if color else MAX_RANK - chess.square_rank(square)
 
 
+def get_front_span_mask(square: chess.Square, color: chess.Color) -> chess.Bitboard:
+	"""Returns the squares a pawn of color on square would move through to promote
+	"""
+	return BB_FRONT_SPANS[color][square]
+
+
+def get_passed_pawn_span_mask(square: chess.Square, color: chess.Color) -> chess.Bitboard:
+	"""Returns the squares where an enemy pawn stops a pawn of color on square from being passed
+	"""
+	return BB_PASSED_PAWN_SPANS[color][square]
+
+
 def between_inclusive(a: chess.Square, b: chess.Square) -> chess.SquareSet:
 	"""Returns the set of squares between a and b, including a and b
 	"""
-	bb = chess.BB_RAYS[a][b] & ((chess.BB_ALL << a) ^ (chess.BB_ALL << (b+1)))
-	return chess.SquareSet(bb)
+	return chess.SquareSet(BB_BETWEEN_INCLUSIVE[a][b])
+
+
+def between_inclusive_mask(a: chess.Square, b: chess.Square) -> chess.Bitboard:
+	return BB_BETWEEN_INCLUSIVE[a][b]
 
 
 def start_ray(a: chess.Square, b: chess.Square) -> chess.SquareSet:
 	"""Returns the set of squares starting at `a` in the direction of `b`
 	"""
-	# bb = chess.BB_RAYS[a][b] & ((chess.BB_ALL << a) ^ (chess.BB_ALL << (b+1)))
-	bb = chess.BB_RAYS[a][b] & (chess.BB_ALL << a)
-	return chess.SquareSet(bb)
+	return chess.SquareSet(BB_START_RAYS[a][b])
+
+
+def start_ray_mask(a: chess.Square, b: chess.Square) -> chess.Bitboard:
+	return BB_START_RAYS[a][b]
 
 
 # How many minor pieces (e.g. bishops and knights) does color have?
@@ -214,26 +237,20 @@ def is_rook_pinned(board, rook, color):
 
 
 def can_piece_be_captured_by_weaker_piece(board, piece):
-	color = not board.color_at(piece)
-	return any(attacker for attacker in board.attackers(color, piece)
-			if can_piece_capture(board, attacker, piece) and
-			PIECE_TYPES_TO_ROUGH_VALUES[board.piece_type_at(attacker)] < \
-			PIECE_TYPES_TO_ROUGH_VALUES[board.piece_type_at(piece)])
+	return bool(board.get_attack_map().attacked_by_lesser[board.color_at(piece)] & chess.BB_SQUARES[piece])
 
 
 # Can the piece be taken by an enemy piece
 def can_piece_be_captured(board, piece):
-	color = not board.color_at(piece)
-	return any(attacker for attacker in board.attackers(color, piece) if can_piece_capture(board, attacker, piece))
+	return board.get_attack_map().is_attacked(not board.color_at(piece), piece)
 
 
 def can_hanging_piece_be_captured(board, piece):
 	"""Is `piece` undefended, and can it be captured?
 	"""
-	if board.attackers(board.color_at(piece), piece):
+	if board.attackers_mask(board.color_at(piece), piece):
 		return False
-	return any(attacker for attacker in board.attackers(not board.color_at(piece), piece)
-			if can_piece_capture(board, attacker, piece))
+	return board.get_attack_map().is_attacked(not board.color_at(piece), piece)
 
 def can_hanging_piece_be_captured_by(board, attacking_piece, attacked_piece):
 	"""Is `attacked_piece` undefended, and can it be captured by `attacking_piece`?
@@ -248,11 +265,7 @@ def can_piece_capture(board, attacking_piece, attacked_piece):
 	Assumes that attacking_piece is actually attacking attacked_piece, and
 	attacked_piece is not a king
 	"""
-	color = board.color_at(attacking_piece)
-	if board.piece_type_at(attacked_piece) == chess.KING or (board.is_pinned(color, attacking_piece) and
-															attacked_piece not in board.pin(color, attacking_piece)):
-		return False
-	return True
+	return board.get_attack_map().can_capture(attacking_piece, attacked_piece)
 
 
 def can_piece_capture_no_pin(board: Board, attacking_piece, attacked_piece):
@@ -305,8 +318,9 @@ def get_attackers(board, square, color):
 # Batteries not included, kings currently included
 def get_first_attackers_and_defenders(board, square):
 	defend_color = board.color_at(square)
-	attackers = [attacker for attacker in board.attackers(not defend_color, square) if can_piece_capture(board, attacker, square)]
-	defenders = [attacker for attacker in board.attackers(defend_color, square) if can_piece_capture(board, attacker, square)]
+	attack_map = board.get_attack_map()
+	attackers = list(chess.scan_forward(attack_map.get_attackers_mask(not defend_color, square)))
+	defenders = list(chess.scan_forward(attack_map.get_attackers_mask(defend_color, square)))
 	return attackers, defenders
 
 # Get second attackers and defenders - the attackers and defenders who can't move to square first
@@ -387,6 +401,78 @@ def are_more_attackers_than_defenders(board, piece, attack_color=None):
 	num_attackers += get_num_pinner_and_pinned_piece_attacker_pairs(board, all_attackers, defenders, piece)
 	return num_attackers > num_defenders
 
+LEAST_VALUABLE_TO_MOST_PIECE_TYPES = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING]
+
+def get_least_valuable_attacker(board: Board, attackers: chess.Bitboard, color: chess.Color,
+								square: chess.Square=None):
+	"""Returns (square, piece type) of the least valuable piece of `color` in the `attackers` bitboard,
+	or (None, None) if there isn't one.
+	If `square` is given, pieces pinned to their king that can't move to `square` are skipped.
+	"""
+	color_attackers = attackers & board.occupied_co[color]
+	if color_attackers:
+		for piece_type in LEAST_VALUABLE_TO_MOST_PIECE_TYPES:
+			for attacker in chess.scan_forward(color_attackers & board.pieces_mask(piece_type, color)):
+				if square is None or board.pin_mask(color, attacker) & chess.BB_SQUARES[square]:
+					return attacker, piece_type
+	return None, None
+
+def see(board: Board, move: chess.Move, piece_values=PIECE_TYPES_TO_ROUGH_VALUES) -> int:
+	"""Static exchange evaluation of the capture `move`.
+	Both sides keep capturing on move.to_square with their least valuable piece for as long as it pays,
+	including sliders that attack through the pieces that were traded off.
+	Returns the material won by the side making `move`, negative if it loses material.
+	Pieces pinned to their king only recapture along the pin. Checks are not considered.
+	"""
+	to_square = move.to_square
+	color = board.color_at(move.from_square)
+	occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+	if board.is_en_passant(move):
+		captured_pawn = to_square - 8 if color == chess.WHITE else to_square + 8
+		occupied &= ~chess.BB_SQUARES[captured_pawn]
+		captured_piece_type = chess.PAWN
+	else:
+		captured_piece_type = board.piece_type_at(to_square)
+	# gains[i] is the material won by the side making capture i, if the exchange stopped there
+	gains = [piece_values[captured_piece_type] if captured_piece_type else 0]
+	attacker_piece_type = board.piece_type_at(move.from_square)
+	if move.promotion is not None:
+		gains[0] += piece_values[move.promotion] - piece_values[chess.PAWN]
+		attacker_piece_type = move.promotion
+	color = not color
+	while True:
+		# What the next capture would win by taking the last piece to move to to_square
+		gains.append(piece_values[attacker_piece_type] - gains[-1])
+		# Neither side can gain by continuing
+		if max(-gains[-2], gains[-1]) < 0:
+			break
+		attackers = (board.attackers_mask(chess.WHITE, to_square, occupied) |
+					board.attackers_mask(chess.BLACK, to_square, occupied)) & occupied
+		attacker, attacker_piece_type = get_least_valuable_attacker(board, attackers, color, to_square)
+		if attacker is None:
+			break
+		occupied &= ~chess.BB_SQUARES[attacker]
+		color = not color
+	# The last capture was never made
+	gains.pop()
+	# Either side can stop capturing when continuing would lose material
+	for i in range(len(gains) - 1, 0, -1):
+		gains[i - 1] = -max(-gains[i - 1], gains[i])
+	return gains[0]
+
+def see_square(board: Board, square: chess.Square, color: chess.Color=None,
+			piece_values=PIECE_TYPES_TO_ROUGH_VALUES) -> int:
+	"""Static exchange evaluation of `color`, by default the side to move,
+	capturing the piece on `square` with its least valuable attacker.
+	Returns 0 if `color` has no attackers.
+	"""
+	if color is None:
+		color = board.turn
+	attacker, _ = get_least_valuable_attacker(board, board.attackers_mask(color, square), color, square)
+	if attacker is None:
+		return 0
+	return see(board, chess.Move(attacker, square), piece_values)
+
 def get_attackers_and_defenders(board, piece):
 	first_attackers, first_defenders = get_first_attackers_and_defenders(board, piece)
 	second_attackers, second_defenders = get_second_attackers_and_defenders(board, piece, first_attackers, first_defenders)
@@ -7,11 +7,38 @@ WINNING_EVAL = MAX_EVAL / 2
 MIN_EVAL = -MAX_EVAL
 DRAW_EVAL = 0
 
-# Mate in 10
-MAX_MATING_EVAL = MAX_EVAL - 10
-MIN_MATING_EVAL = MIN_EVAL + 10
+# Mates are scored MAX_EVAL minus the number of plies until mate, so quicker mates score higher.
+# Evaluations past these are mates.
+MAX_MATING_EVAL = MAX_EVAL - 200
+MIN_MATING_EVAL = MIN_EVAL + 200
 
 PIECE_TYPES_TO_ROUGH_VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 300,
                                chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 10_000}
 
 LONG_RANGE_PIECE_TYPES = {chess.BISHOP, chess.ROOK, chess.QUEEN}
+
+# Aspiration windows start this far either side of the last iteration's evaluation
+ASPIRATION_WINDOW = 50
+# How many times wider the window gets after each failed search
+ASPIRATION_WIDEN_FACTOR = 4
+
+# Null move pruning searches the position after passing this many plies shallower
+NULL_MOVE_REDUCTION = 2
+# Null move pruning is only tried with at least this much depth remaining
+NULL_MOVE_MIN_DEPTH = 2
+# The static evaluation has to be within this margin of beta for a null move to be tried
+NULL_MOVE_MARGIN = 50
+# From this depth, a null move cutoff is verified by a reduced search without null moves
+NULL_MOVE_VERIFICATION_DEPTH = 5
+
+# Late move reductions start at this depth, after this many moves have been searched at full depth
+LMR_MIN_DEPTH = 3
+LMR_FULL_DEPTH_MOVES = 3
+# Larger values reduce less
+LMR_DIVISOR = 2.25
+
+# At depth 1, quiet moves that can't bring the evaluation within this margin of alpha are skipped
+FUTILITY_MARGIN = 200
+# At depth 2, positions evaluated this far below alpha go straight to the quiescence search
+RAZOR_MARGIN = 400
+RAZOR_DEPTH = 2
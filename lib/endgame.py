@@ -70,33 +70,34 @@ def get_strong_color(board):
 	_, white_has_pieces = has_pieces(board, chess.WHITE)
 	return chess.WHITE if white_has_pieces else chess.BLACK
 
+PROMOTING_RANK = 7
+# A pawn on its starting rank can push two squares
+MAX_MOVES_TO_PROMOTE = 5
+
+# Pawn tables indexed by color then square
+NUM_MOVES_TO_PROMOTE = [[min(MAX_MOVES_TO_PROMOTE, PROMOTING_RANK - chess_util.get_adjusted_rank(square, color))
+						for square in chess.SQUARES] for color in chess.COLORS[::-1]]
+PROMOTION_SQUARES = [[chess.square(chess.square_file(square), 7 if color else 0) for square in chess.SQUARES]
+					for color in chess.COLORS[::-1]]
+# Squares the opponent's king can catch the pawn from, the square of the pawn,
+# indexed by color, whether it is the pawn's turn, then square
+BB_PAWN_SQUARES = [[[sum(chess.BB_SQUARES[king] for king in chess.SQUARES
+						if chess.square_distance(king, PROMOTION_SQUARES[color][square]) <=
+						NUM_MOVES_TO_PROMOTE[color][square] + (0 if pawn_turn else 1))
+					for square in chess.SQUARES] for pawn_turn in [False, True]] for color in chess.COLORS[::-1]]
+
 # Returns the number of moves required to promote the pawn assuming there are no pieces in the way
 def get_num_moves_to_promote(pawn, color):
-	promoting_rank = 7
-	adjusted_rank = chess_util.get_adjusted_rank(pawn, color)
-	max_moves_to_promote = 5
-	return min(max_moves_to_promote, promoting_rank - adjusted_rank)
+	return NUM_MOVES_TO_PROMOTE[color][pawn]
 
 # Returns the square a pawn would promote on
 def get_promotion_square(pawn, color):
-	file = chess.square_file(pawn)
-	if color: # white pawn
-		rank = 7
-		return chess.square(file, rank)
-	# black pawn
-	rank = 0
-	return chess.square(file, rank)
+	return PROMOTION_SQUARES[color][pawn]
 
 def is_pawn_outside_of_square(board, pawn):
 	pawn_color = board.color_at(pawn)
-	chasing_king = board.king(not pawn_color)
-	num_moves_to_promote = get_num_moves_to_promote(pawn, pawn_color)
-	promotion_square = get_promotion_square(pawn, pawn_color)
-	num_king_moves = chess.square_distance(chasing_king, promotion_square)
-	if (board.turn == pawn_color and num_moves_to_promote < num_king_moves) or \
-		(board.turn != pawn_color and num_moves_to_promote < num_king_moves - 1):
-		return True
-	return False
+	chasing_king = board.kings & board.occupied_co[not pawn_color]
+	return not BB_PAWN_SQUARES[pawn_color][board.turn == pawn_color][pawn] & chasing_king
 
 # Returns the square containing the pawn the opponent's king cannot reach before promoting; None otherwise
 def get_pawn_outside_of_square(board, pawn_color):
@@ -0,0 +1,111 @@
+import chess
+from array import array
+from board import Board
+from typing import List, Optional, Tuple
+
+# Caches the evaluations found by search_extension.SearchExtension
+# Entries are keyed by the zobrist hash of the position and the turn it was evaluated for,
+# live in a fixed number of slots allocated up front, and are aged between searches instead of cleared
+
+DEFAULT_EVAL_CACHE_MB = 8
+# Size of the cache used by a SearchExtension that isn't given one
+DEFAULT_EVAL_CACHE_SLOTS = 1024
+# Number of entries stored at each slot
+EVAL_CACHE_WAYS = 2
+# Rough bytes used by a single entry: key + age + the evaluation tuple and its list of moves
+EVAL_CACHE_ENTRY_SIZE = 8 + 1 + 128
+# Mixed into the key of positions evaluated for black, so both turns can be cached for a position
+BLACK_KEY = 0x9D39247E33776D41
+
+# Size of caches made by EvalCache.from_mb, set with the EvalCache UCI option
+eval_cache_mb = DEFAULT_EVAL_CACHE_MB
+
+def set_eval_cache_mb(size_mb: int) -> None:
+    global eval_cache_mb
+    eval_cache_mb = size_mb
+
+
+class EvalCache:
+
+    def __init__(self, size: int=DEFAULT_EVAL_CACHE_SLOTS):
+        """Allocates size slots of EVAL_CACHE_WAYS entries each
+        """
+        self.size = size
+        self.age = 0
+        self.settings = None
+        self.keys = array('Q', bytes(8 * size * EVAL_CACHE_WAYS))
+        self.ages = array('B', bytes(size * EVAL_CACHE_WAYS))
+        # (evaluation, moves) of each entry, None if the entry is empty
+        self.evaluations = [None] * (size * EVAL_CACHE_WAYS)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        # Stores that replaced another position from the same search
+        self.replacements = 0
+
+    @classmethod
+    def from_mb(cls, size_mb: int=None) -> 'EvalCache':
+        """Sizes the cache to use roughly size_mb megabytes, eval_cache_mb by default
+        """
+        if size_mb is None:
+            size_mb = eval_cache_mb
+        return cls(max(1, size_mb * 1024 * 1024 // (EVAL_CACHE_ENTRY_SIZE * EVAL_CACHE_WAYS)))
+
+    def clear(self) -> None:
+        self.keys = array('Q', bytes(8 * self.size * EVAL_CACHE_WAYS))
+        self.ages = array('B', bytes(self.size * EVAL_CACHE_WAYS))
+        self.evaluations = [None] * (self.size * EVAL_CACHE_WAYS)
+
+    def new_search(self, settings: Tuple=None) -> None:
+        """Should be called before each search so entries from old searches get replaced first
+        settings is whatever the cached evaluations depend on, such as the search extension limits.
+        Entries stored with other settings are cleared.
+        """
+        if settings != self.settings:
+            self.clear()
+            self.settings = settings
+        self.age = (self.age + 1) % 256
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def get(self, board: Board, turn: chess.Color) -> Optional[Tuple[float, List[chess.Move]]]:
+        """Returns the (evaluation, moves) stored for board evaluated for turn, or None
+        """
+        key = self._get_key(board, turn)
+        start = key % self.size * EVAL_CACHE_WAYS
+        for i in range(start, start + EVAL_CACHE_WAYS):
+            if self.keys[i] == key and self.evaluations[i] is not None:
+                self.hits += 1
+                return self.evaluations[i]
+        self.misses += 1
+        return None
+
+    def store(self, board: Board, turn: chess.Color, evaluation: Tuple[float, List[chess.Move]]) -> None:
+        """Prefers replacing the same position, then empty entries, then entries from old searches.
+        Otherwise the last entry of the slot is replaced, so the first keeps what it stored this search.
+        """
+        key = self._get_key(board, turn)
+        start = key % self.size * EVAL_CACHE_WAYS
+        use = None
+        for i in range(start, start + EVAL_CACHE_WAYS):
+            if self.keys[i] == key or self.evaluations[i] is None:
+                use = i
+                break
+            if use is None and self.ages[i] != self.age:
+                use = i
+        if use is None:
+            use = start + EVAL_CACHE_WAYS - 1
+            self.replacements += 1
+        self.keys[use] = key
+        self.ages[use] = self.age
+        self.evaluations[use] = evaluation
+        self.stores += 1
+
+    def get_hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def _get_key(self, board: Board, turn: chess.Color) -> int:
+        return board.get_zh() if turn == chess.WHITE else board.get_zh() ^ BLACK_KEY
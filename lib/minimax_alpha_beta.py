@@ -1,27 +1,53 @@
-# Todo: Value quicker mates
 # Todo: Consider extensions. Extend depth on certain positions (e.g., checks, hanging pieces)
-# Todo: Check late move reduction
-# Todo: Negamax? Is it any faster than minimax?
 # Todo: Rewrite some code in c++; c++ 100x faster?
 import chess
 import chess_util
 import position_evaluator
+from constants import ASPIRATION_WINDOW, ASPIRATION_WIDEN_FACTOR, MAX_MATING_EVAL
 import datetime
+import multiprocessing
+import os
+import sys
 import time
+import transposition_table2
+from board import Board
+from contextlib import contextmanager
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
 from move_filter import is_bad_move
-from transposition_table2 import tt_init, tt_lookup_helper, tt_store
+from eval_cache import EvalCache
+from move_position_evaluator import MovePositionEvaluator
+from transposition_table2 import tt_inc_age, tt_lookup_helper, tt_store
 from search_extension import SearchExtension
+from search_extension_util import get_root_mate_eval, get_position_mate_eval
+from search_limits import POLL_INTERVAL, SearchAborted, SearchLimits
 
-# Mate in 2 is worse than mate in 1
-MATE_DEPTH_PENALTY = 1
 PIECE_TYPES_TO_VALUES = position_evaluator.PIECE_TYPES_TO_VALUES.copy()
 PIECE_TYPES_TO_VALUES[chess.KING] = 0
 
 node_count = 0
 prune_count = 0
 tt_hit_count = 0
+# Number of times an aspiration window had to be widened and the position searched again
+fail_high_count = 0
+fail_low_count = 0
 
-fens_to_evals = {}
+# Search extension evaluations of leaves, kept between searches; made by get_eval_cache on first use
+eval_cache = None
+
+# Seconds between checks of the search limits while analysis workers run
+ANALYSIS_POLL_INTERVAL = .1
+# Set in each analysis worker process by init_analysis_worker
+# Scores of the best root moves found so far by any worker, in shared memory
+analysis_best_scores = None
+analysis_stop_event = None
+# Nodes searched by every worker of the pool, in shared memory
+analysis_node_count = None
+
+def get_eval_cache() -> EvalCache:
+	global eval_cache
+	if eval_cache is None:
+		eval_cache = EvalCache.from_mb()
+	return eval_cache
 
 # Returns (evaluation, move)
 # This is a wrapper around minimax to cover anything required before the search starts
@@ -29,15 +55,19 @@ fens_to_evals = {}
 def minimax_helper(board, depth, forced_mate_depth: int=2,
 				num_captures: int=8, use_tt=False, sort_moves=False,
 				move_filter=None, move_filter_depth: int=1, extend_search: bool=True,
-				evaluate_position=position_evaluator.evaluate_position):
+				evaluate_position=position_evaluator.evaluate_position,
+				alpha=position_evaluator.MIN_EVAL, beta=position_evaluator.MAX_EVAL):
 	start = datetime.datetime.now()
 	turn = board.turn
-	global fens_to_evals
-	fens_to_evals = {}
-	result = minimax(board, depth, turn, position_evaluator.MIN_EVAL, position_evaluator.MAX_EVAL,
+	# Leaf evaluations depend on the search extension limits, so they are only kept while those are the same
+	get_eval_cache().new_search((forced_mate_depth, num_captures))
+	# Scores every piece once, then follows the search move by move for the search extension at the leaves
+	move_position_evaluator = MovePositionEvaluator(board, turn) if extend_search else None
+	result = minimax(board, depth, turn, alpha, beta,
 		evaluate_position, use_tt, sort_moves, move_filter=move_filter,
 		move_filter_depth=move_filter_depth, extend_search=extend_search,
-		forced_mate_depth=forced_mate_depth, num_captures=num_captures)
+		forced_mate_depth=forced_mate_depth, num_captures=num_captures,
+		move_position_evaluator=move_position_evaluator)
 	print("depth =", depth)
 	print("extend search =", extend_search)
 	if extend_search:
@@ -51,6 +81,9 @@ def minimax_helper(board, depth, forced_mate_depth: int=2,
 	print("node_count = ", node_count)
 	if use_tt:
 		print("tt_hit_count = ", tt_hit_count)
+	if extend_search:
+		print("eval cache hits =", eval_cache.hits, "misses =", eval_cache.misses,
+			"hit rate =", round(eval_cache.get_hit_rate(), 3), "replacements =", eval_cache.replacements)
 	end = datetime.datetime.now()
 	print("move time = ", end-start)
 	if result is None:
@@ -58,19 +91,53 @@ def minimax_helper(board, depth, forced_mate_depth: int=2,
 	return (result[0], result[1][0])
 
 
+# Returns (evaluation, move)
+# Searches a narrow window around previous_evaluation, such as from the last iteration,
+# widening the side that failed until the evaluation is inside the window
+def aspiration_helper(board, depth, previous_evaluation=None, use_tt=False):
+	if previous_evaluation is None or abs(previous_evaluation) >= MAX_MATING_EVAL:
+		return minimax_helper(board, depth, use_tt=use_tt)
+	global fail_high_count, fail_low_count
+	window = ASPIRATION_WINDOW
+	alpha = max(previous_evaluation - window, position_evaluator.MIN_EVAL)
+	beta = min(previous_evaluation + window, position_evaluator.MAX_EVAL)
+	while True:
+		result = minimax_helper(board, depth, use_tt=use_tt, alpha=alpha, beta=beta)
+		window *= ASPIRATION_WIDEN_FACTOR
+		if result[0] is None:
+			return result
+		if result[0] <= alpha and alpha > position_evaluator.MIN_EVAL:
+			fail_low_count += 1
+			alpha = max(result[0] - window, position_evaluator.MIN_EVAL)
+		elif result[0] >= beta and beta < position_evaluator.MAX_EVAL:
+			fail_high_count += 1
+			beta = min(result[0] + window, position_evaluator.MAX_EVAL)
+		else:
+			print("aspiration fail highs =", fail_high_count, "fail lows =", fail_low_count)
+			return result
+
+
 def minimax(board, depth, turn, alpha, beta, evaluate_position, use_tt=False, sort_moves=False,
 		move_filter=None, move_filter_depth: int=1, depth_reached=0, extend_search: bool=True,
-		forced_mate_depth: int=2, num_captures: int=8):
+		forced_mate_depth: int=2, num_captures: int=8, move_position_evaluator=None, limits=None):
 	"""Returns (evaluation, move list) or None if there is no move
 	alpha is the min possible value
 	beta is the max possible value
+	Mates are scored by the number of plies from the root, depth_reached plies above board
+	move_position_evaluator, if given, is evaluating board for turn and is kept up to date with the moves searched
+	limits, a search_limits.SearchLimits, is checked at every node, including those of the search extension.
+	search_limits.SearchAborted is raised if a limit is reached, leaving board and move_position_evaluator
+	where the search stopped
 	"""
 	global node_count, prune_count, tt_hit_count
 	node_count += 1
+	if limits is not None:
+		limits.check()
 	if depth == 0 or chess_util.is_game_over(board):
 		evaluation = 0
 		if extend_search:
-			evaluation = SearchExtension(board, turn, fens_to_evals=fens_to_evals).search(
+			evaluation = SearchExtension(board, turn, eval_cache=eval_cache, limits=limits,
+										move_position_evaluator=move_position_evaluator).search(
 				forced_mate_depth=forced_mate_depth, num_captures_remaining=num_captures)
 		else:
 			evaluation = (evaluate_position(board, turn, check_tactics=True, extend=True,
@@ -81,12 +148,22 @@ def minimax(board, depth, turn, alpha, beta, evaluate_position, use_tt=False, so
 		#print("is repetition =", board.is_repetition())
 		#print(board)
 		#print(board.move_stack)
-		return evaluation
+		# Leaf mates are scored from the leaf
+		return (get_root_mate_eval(evaluation[0], depth_reached), evaluation[1])
+	# Entries from a filtered search are only reused by filtered searches
+	filtered = move_filter is not None
+	tt_move = None
 	if use_tt:
-		tt_hit = tt_lookup_helper(board, alpha, beta, depth, turn)
-		if tt_hit and tt_hit[0]:
-			tt_hit_count += 1
-			return tt_hit[1]
+		# Entries hold mates scored from their own position
+		tt_hit = tt_lookup_helper(board, get_position_mate_eval(alpha, depth_reached),
+								get_position_mate_eval(beta, depth_reached), depth, turn, filtered)
+		if tt_hit:
+			tt_move = tt_hit[1][1]
+			# Never cut off at the root because a move has to be returned
+			if tt_hit[0] and depth_reached > 0:
+				tt_hit_count += 1
+				score, move = tt_hit[1]
+				return (get_root_mate_eval(score, depth_reached), [move] if move else [])
 	moves = list(board.legal_moves)
 	if move_filter is None:
 		moves = [move for move in moves if not is_bad_move(board, move)]
@@ -98,15 +175,26 @@ def minimax(board, depth, turn, alpha, beta, evaluate_position, use_tt=False, so
 			moves.append(chess.Move.null())
 	if (sort_moves):
 		moves = sorted(moves, reverse = True, key = lambda move: get_move_value(board, turn, move, evaluate_position))
+	# Try the best move from a previous search first
+	if tt_move is not None and tt_move in moves:
+		moves.remove(tt_move)
+		moves.insert(0, tt_move)
+	# The stored bound depends on the window the node was searched with
+	original_alpha, original_beta = alpha, beta
 	maximizing = board.turn == turn
 	if maximizing:
 		max_evaluation = None
 		for move in moves:
 			board.push(move)
+			if move_position_evaluator is not None:
+				move_position_evaluator.evaluate_after_move(thorough=True)
 			evaluation = minimax(board, depth - 1, turn, alpha, beta, evaluate_position, use_tt, sort_moves,
 								move_filter=move_filter, move_filter_depth=move_filter_depth,
-								extend_search=extend_search,
-								num_captures=num_captures, forced_mate_depth=forced_mate_depth)
+								depth_reached=depth_reached + 1, extend_search=extend_search,
+								num_captures=num_captures, forced_mate_depth=forced_mate_depth,
+								move_position_evaluator=move_position_evaluator, limits=limits)
+			if move_position_evaluator is not None:
+				move_position_evaluator.undo_move()
 			board.pop()
 			if max_evaluation == None or evaluation[0] > max_evaluation[0]: # greater than so max_evaluation only gets replaced if evaluation is higher
 			# that way max_evaluation will only be updated with a fully evaluated node
@@ -119,17 +207,26 @@ def minimax(board, depth, turn, alpha, beta, evaluate_position, use_tt=False, so
 		#print("depth = ", depth)
 		#print("max_evaluation = ", max_evaluation)
 		#print(board)
-		if use_tt:
-			tt_store(board, alpha, beta, max_evaluation[0], max_evaluation[1], depth, turn)
+		# Draws by repetition depend on how the position was reached, so they are not stored
+		if use_tt and max_evaluation[0] != position_evaluator.DRAW_EVAL:
+			tt_store(board, get_position_mate_eval(original_alpha, depth_reached),
+					get_position_mate_eval(original_beta, depth_reached),
+					get_position_mate_eval(max_evaluation[0], depth_reached), max_evaluation[1][0],
+					depth, turn, filtered)
 		return max_evaluation
 	# Else minimizing
 	min_evaluation = None
 	for move in moves:
 		board.push(move)
+		if move_position_evaluator is not None:
+			move_position_evaluator.evaluate_after_move(thorough=True)
 		evaluation = minimax(board, depth - 1, turn, alpha, beta, evaluate_position, use_tt, sort_moves,
 							move_filter=move_filter, move_filter_depth=move_filter_depth,
-							extend_search=extend_search,
-							num_captures=num_captures, forced_mate_depth=forced_mate_depth)
+							depth_reached=depth_reached + 1, extend_search=extend_search,
+							num_captures=num_captures, forced_mate_depth=forced_mate_depth,
+							move_position_evaluator=move_position_evaluator, limits=limits)
+		if move_position_evaluator is not None:
+			move_position_evaluator.undo_move()
 		board.pop()
 		if min_evaluation == None or evaluation[0] < min_evaluation[0]:
 			min_evaluation = (evaluation[0], [move] + evaluation[1])
@@ -140,21 +237,13 @@ def minimax(board, depth, turn, alpha, beta, evaluate_position, use_tt=False, so
 	#print("depth = ", depth)
 	#print("min_evaluation = ", min_evaluation)
 	#print(board)
-	if use_tt:
-		tt_store(board, alpha, beta, min_evaluation[0], min_evaluation[1], depth, turn)
+	if use_tt and min_evaluation[0] != position_evaluator.DRAW_EVAL:
+		tt_store(board, get_position_mate_eval(original_alpha, depth_reached),
+				get_position_mate_eval(original_beta, depth_reached),
+				get_position_mate_eval(min_evaluation[0], depth_reached), min_evaluation[1][0],
+				depth, turn, filtered)
 	return min_evaluation
 
-# Todo: Test and use this
-# Handles mate in 1 is better than mate in 2
-def get_evaluation(board, turn, evaluate_position, depth_reached):
-	score = evaluate_position(board, turn)
-	score = get_mate_depth_adjusted_eval(score, depth_reached)
-	evaluation = (score, board.peek())
-	return evaluation
-
-def get_mate_depth_adjusted_eval(score, depth_reached):
-	return score - depth_reached * MATE_DEPTH_PENALTY if score == position_evaluator.MAX_EVAL else score
-
 
 def get_move_value(board, turn, move, evaluate_position):
 	board.push(move)
@@ -179,17 +268,22 @@ def get_mvv_lva_value(board, move):
 	return value
 
 def init_counts():
-	global node_count, prune_count, tt_hit_count
+	global node_count, prune_count, tt_hit_count, fail_high_count, fail_low_count
 	node_count = 0
 	prune_count = 0
 	tt_hit_count = 0
+	fail_high_count = 0
+	fail_low_count = 0
 
 # Minimax with alpha beta pruning to some depth
+# The transposition table is only aged by the caller,
+# so entries carry over between calls made for the same move
 def pick_full_move(board, depth=3, forced_mate_depth=2, num_captures=8,
-				move_filter=None, move_filter_depth: int=1, extend_search: bool=True):
+				move_filter=None, move_filter_depth: int=1, extend_search: bool=True,
+				use_tt: bool=False):
 	init_counts()
 	result = minimax_helper(board, depth, forced_mate_depth=forced_mate_depth,
-						num_captures=num_captures, move_filter=move_filter,
+						num_captures=num_captures, use_tt=use_tt, move_filter=move_filter,
 						move_filter_depth=move_filter_depth, extend_search=extend_search)
 	return result
 
@@ -210,11 +304,10 @@ def pick_move_with_sort(board, depth=3):
 	return pick_full_move_with_sort(board, depth)[1]
 
 # transposition table
-# Initializes tt every move search?
+# The table is kept between moves; entries from older searches are replaced first
 def pick_full_move_with_tt(board, depth=3):
 	init_counts()
-	num_elements = 1024 * 8
-	tt_init(num_elements)
+	tt_inc_age()
 	result = minimax_helper(board, depth, sort_moves=False, use_tt=True)
 	return result
 
@@ -226,20 +319,19 @@ def pick_move_ids(board, max_depth=3):
 	init_counts()
 	result = (position_evaluator.MIN_EVAL, None)
 	depth = 1
-	while(depth <= max_depth and result[0] < position_evaluator.MAX_EVAL):
-		result = minimax_helper(board, depth)
+	while(depth <= max_depth and result[0] < MAX_MATING_EVAL):
+		result = aspiration_helper(board, depth, result[0] if depth > 1 else None)
 		depth += 1
 	return result[1]
 
 # Iterative deepening search with transposition table
 def pick_move_ids_with_tt(board, max_depth=3):
 	init_counts()
-	num_elements = 1024 * 8
-	tt_init(num_elements)
+	tt_inc_age()
 	result = (position_evaluator.MIN_EVAL, None)
 	depth = 1
-	while(depth <= max_depth and result[0] < position_evaluator.MAX_EVAL):
-		result = minimax_helper(board, depth, use_tt=True)
+	while(depth <= max_depth and result[0] < MAX_MATING_EVAL):
+		result = aspiration_helper(board, depth, result[0] if depth > 1 else None, use_tt=True)
 		depth += 1
 	return result[1]
 
@@ -250,8 +342,8 @@ def pick_move_in_time(board, time_in_seconds=1):
 	elapsed_time = 0
 	result = (position_evaluator.MIN_EVAL, None)
 	depth = 1
-	while(elapsed_time < time_in_seconds and result[0] < position_evaluator.MAX_EVAL):
-		result = minimax_helper(board, depth)
+	while(elapsed_time < time_in_seconds and result[0] < MAX_MATING_EVAL):
+		result = aspiration_helper(board, depth, result[0] if depth > 1 else None)
 		depth += 1
 		#end = datetime.datetime.now()
 		end = time.time()
@@ -267,8 +359,8 @@ def pick_full_move_in_time(board, time_in_seconds=1):
 	elapsed_time = 0
 	result = (position_evaluator.MIN_EVAL, None)
 	depth = 1
-	while(elapsed_time < time_in_seconds and result[0] < position_evaluator.MAX_EVAL):
-		result = minimax_helper(board, depth)
+	while(elapsed_time < time_in_seconds and result[0] < MAX_MATING_EVAL):
+		result = aspiration_helper(board, depth, result[0] if depth > 1 else None)
 		depth += 1
 		#end = datetime.datetime.now()
 		end = time.time()
@@ -278,3 +370,186 @@ def pick_full_move_in_time(board, time_in_seconds=1):
 	result = [result[0], result[1], depth, elapsed_time]
 	return result
 
+
+# Root split analysis
+# The root moves are dealt out to a pool of processes so every move gets its own score and line.
+# The scores of the best multipv moves found so far are published in shared memory,
+# and the worst of them is the alpha bound for moves searched after,
+# so moves that can't make the top multipv only get an upper bound and are left out.
+# Returns [(evaluation, pv)] for the best multipv root moves, best first, or None if limits were reached
+# Workers check for the stop every POLL_INTERVAL nodes, and their nodes are counted in limits.node_count
+# A pool from open_analysis_pool for the same board is reused, otherwise one is made for this depth
+def analyze(board, depth=3, multipv=None, num_workers=None, use_tt=False, limits=None, pool=None):
+	moves = list(board.legal_moves)
+	if not moves:
+		return []
+	if pool is None:
+		with open_analysis_pool(board, multipv, num_workers, use_tt) as pool:
+			return analyze(board, depth, multipv, num_workers, use_tt, limits, pool)
+	executor, best_scores, stop_event, pool_node_count = pool
+	multipv = len(best_scores)
+	num_workers = get_analysis_worker_count(moves, num_workers)
+	turn = board.turn
+	# Likely best moves first so alpha rises early
+	moves.sort(reverse=True,
+			key=lambda move: get_move_value(board, turn, move, position_evaluator.evaluate_position))
+
+	# Scores from the last depth would be too high an alpha
+	with best_scores.get_lock():
+		best_scores[:] = [position_evaluator.MIN_EVAL] * multipv
+	stop_event.clear()
+	max_nodes = None
+	if limits is not None:
+		# The pool's count includes nodes from before limits
+		node_offset = limits.node_count - pool_node_count.value
+		if limits.max_nodes is not None:
+			max_nodes = limits.max_nodes - node_offset
+	# Workers replay the game so they can detect repetitions
+	game_moves = list(board.move_stack)
+	root = board.copy()
+	while root.move_stack:
+		root.pop()
+
+	futures = [executor.submit(analyze_root_moves, root.fen(), board.chess960, game_moves,
+							moves[i::num_workers], depth, use_tt, max_nodes) for i in range(num_workers)]
+	while True:
+		done, not_done = wait(futures, timeout=ANALYSIS_POLL_INTERVAL, return_when=FIRST_EXCEPTION)
+		if limits is not None:
+			limits.node_count = node_offset + pool_node_count.value
+		if not not_done or any(future.exception() for future in done):
+			break
+		if limits is not None and limits.is_past_limit():
+			stop_event.set()
+	worker_lines = [future.result() for future in futures]
+
+	if any(lines is None for lines in worker_lines):
+		return None
+	lines = [line for lines in worker_lines for line in lines]
+	# An exact score goes ahead of an upper bound with the same value
+	lines.sort(reverse=True, key=lambda line: (line[0], line[2]))
+	return [(evaluation, pv) for evaluation, pv, _ in lines[:multipv]]
+
+def get_analysis_worker_count(moves, num_workers):
+	return max(1, min(num_workers or os.cpu_count() or 1, len(moves)))
+
+# The worker processes and the shared memory they publish to, for analyzing board at any depth
+# Yields (executor, best scores, stop event, node count)
+@contextmanager
+def open_analysis_pool(board, multipv=None, num_workers=None, use_tt=False):
+	moves = list(board.legal_moves)
+	multipv = len(moves) if multipv is None else max(1, min(multipv, len(moves)))
+	best_scores = multiprocessing.Array('d', [position_evaluator.MIN_EVAL] * max(multipv, 1))
+	stop_event = multiprocessing.Event()
+	node_count = multiprocessing.Value('q', 0)
+	tt_args = (None, 0, 0)
+	if use_tt:
+		if not transposition_table2.tt_is_shared():
+			transposition_table2.tt_init(transposition_table2.tt_size, shared=True)
+		# Entries from earlier analyses are replaced first
+		tt_inc_age()
+		tt_args = (transposition_table2.tt_shared_memory.name, transposition_table2.tt_size,
+				transposition_table2.tt_age)
+	with ProcessPoolExecutor(max_workers=get_analysis_worker_count(moves, num_workers),
+							initializer=init_analysis_worker,
+							initargs=(best_scores, stop_event, node_count) + tt_args) as executor:
+		yield executor, best_scores, stop_event, node_count
+
+def init_analysis_worker(best_scores, stop_event, node_count, tt_name, tt_size, tt_age):
+	global analysis_best_scores, analysis_stop_event, analysis_node_count
+	# Worker output would be mixed into the UCI output
+	sys.stdout = open(os.devnull, 'w')
+	analysis_best_scores = best_scores
+	analysis_stop_event = stop_event
+	analysis_node_count = node_count
+	if tt_name is not None:
+		transposition_table2.tt_attach(tt_name, tt_size)
+		transposition_table2.tt_age = tt_age
+
+class AnalysisLimits(SearchLimits):
+	"""Limits of the search in an analysis worker
+	Nodes are counted for every worker of the pool together, which is what max_nodes applies to.
+	The search stops when analyze sets the stop event.
+	"""
+
+	def __init__(self, max_nodes=None):
+		super().__init__(max_nodes=max_nodes, stop_event=analysis_stop_event)
+		# Nodes not yet added to the pool's count
+		self.unreported_nodes = 0
+
+	def check(self):
+		self.unreported_nodes += 1
+		if self.unreported_nodes == POLL_INTERVAL:
+			with analysis_node_count.get_lock():
+				analysis_node_count.value += self.unreported_nodes
+				self.node_count = analysis_node_count.value
+			self.unreported_nodes = 0
+			if self.is_past_limit():
+				raise SearchAborted
+
+# Runs in an analysis worker
+# max_nodes is for the pool's node count
+# Returns [(evaluation, pv, is exact)] for root_moves or None if the analysis was stopped
+def analyze_root_moves(root_fen, chess960, game_moves, root_moves, depth, use_tt, max_nodes=None):
+	# With minimax's default search extension limits
+	get_eval_cache().new_search((2, 8))
+	board = Board(root_fen, chess960=chess960)
+	for move in game_moves:
+		board.push(move)
+	turn = board.turn
+	move_position_evaluator = MovePositionEvaluator(board, turn)
+	limits = AnalysisLimits(max_nodes)
+	lines = []
+	for move in root_moves:
+		if limits.is_past_limit():
+			return None
+		with analysis_best_scores.get_lock():
+			alpha = min(analysis_best_scores[:])
+		board.push(move)
+		move_position_evaluator.evaluate_after_move(thorough=True)
+		try:
+			evaluation = minimax(board, depth - 1, turn, alpha, position_evaluator.MAX_EVAL,
+								position_evaluator.evaluate_position, use_tt, depth_reached=1,
+								move_position_evaluator=move_position_evaluator, limits=limits)
+		except SearchAborted:
+			# The board and evaluator are left mid-search, but aren't used again
+			return None
+		move_position_evaluator.undo_move()
+		board.pop()
+		is_exact = evaluation[0] > alpha
+		lines.append((evaluation[0], [move] + evaluation[1], is_exact))
+		if is_exact:
+			publish_analysis_score(evaluation[0])
+	return lines
+
+def publish_analysis_score(score):
+	"""Replaces the worst of the best scores if score is better
+	"""
+	with analysis_best_scores.get_lock():
+		scores = analysis_best_scores[:]
+		worst = scores.index(min(scores))
+		if score > scores[worst]:
+			analysis_best_scores[worst] = score
+
+# Iterative deepening analysis until limits are reached
+# report(lines, depth) is called with the lines of each depth
+# Returns [lines, depth] from the last depth that was fully analyzed
+def analyze_in_time(board, limits, max_depth=20, multipv=None, num_workers=None, report=None, use_tt=False):
+	lines, depth_reached = None, 0
+	# Every depth is analyzed by the same worker processes
+	with open_analysis_pool(board, multipv, num_workers, use_tt) as pool:
+		pool_node_count = pool[3]
+		start_node_count = limits.node_count
+		for depth in range(1, max_depth + 1):
+			# Depth 1 always finishes so there is a move to play
+			cur_lines = analyze(board, depth, multipv, num_workers, use_tt,
+								limits=limits if depth > 1 else None, pool=pool)
+			# Depth 1 nodes count as well
+			limits.node_count = start_node_count + pool_node_count.value
+			if cur_lines is None:
+				break
+			lines, depth_reached = cur_lines, depth
+			if report is not None:
+				report(lines, depth)
+			if not lines or limits.is_past_limit():
+				break
+	return [lines, depth_reached]
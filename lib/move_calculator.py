@@ -1,113 +1,217 @@
 # Handles calculating which move the engine should play based on a variety of parameters
 
-import time
-import math
-import signal
 import chess
-import minimax_alpha_beta
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import negamax
 import position_evaluator
 from board import Board
 from constants import MAX_MATING_EVAL, MIN_MATING_EVAL
 import search_extension
+import transposition_table2
+from transposition_table2 import tt_inc_age
+from search_limits import SearchAborted, SearchLimits
+from move_ordering import MoveOrderer
+from eval_cache import EvalCache
 from move_filter import is_hard_tactic, is_soft_tactic, is_soft_not_hard_tactic, is_non_tactic
 
-ponder_move = None
 move_result = None
+# Seconds to wait in all for the helper processes to report their results and exit once told to stop
+# Helpers check for the stop as often as for the time limit, so they don't need long
+HELPER_STOP_TIMEOUT = 1
 
 
-class AlarmException(Exception):
-    pass
-
-
-def alarmHandler(signum, frame):
-    raise AlarmException
-
-
-def calculate_with_thread(board: Board, max_think_time, max_depth=20, is_ponder=False):
-    """Returns (evaluation, move, depth, time)
+def calculate_move(board: Board, max_think_time, max_depth=20, is_ponder=False,
+                   limits: SearchLimits=None, num_threads: int=1):
+    """Returns (evaluation, move, depth, time, ponder move)
+    The search runs in this thread, with Lazy SMP helper processes when num_threads is above 1.
     """
-    # Todo: Should this timeout happen around the specific minimax call instead?
-    # Timing out this way could lead to a race condition around move_result being updated
-    signal.signal(signal.SIGALRM, alarmHandler)
-    signal.alarm(math.ceil(max_think_time))
-    try:
-        global move_result
-        move_result = None
-        board_copy = board.copy()
-        calculate(board_copy, max_think_time, max_depth, is_ponder)
-        signal.alarm(0)
-    except AlarmException:
-        pass
-    finally:
-        result = None
-        if move_result is None or move_result[1] is None:
-            print("ERROR: Could not find move in", max_think_time, "second(s)")
-            move = list(board.legal_moves)[0]
-            print("Playing random move =", move.uci())
-            result = [None, move, 0, max_think_time]
-        else:
-            result = move_result
-        return result
-        
-
-# No threading involved
+    global move_result
+    move_result = None
+    board_copy = board.copy()
+    if num_threads > 1:
+        calculate_lazy_smp(board_copy, max_think_time, max_depth, is_ponder, limits, num_threads)
+    else:
+        calculate(board_copy, max_think_time, max_depth, is_ponder, limits)
+    if move_result is None or move_result[1] is None:
+        print("ERROR: Could not find move in", max_think_time, "second(s)")
+        move = list(board.legal_moves)[0]
+        print("Playing random move =", move.uci())
+        return [None, move, 0, max_think_time, None]
+    return move_result
+
+
+# Searches in the calling process; Lazy SMP helper processes each run their own calculate
 # Finds the best move to play according to the chess engine
-# Returns [move eval, move, depth reached, time taken]
-# Todo: Implement ponder
-def calculate(board, max_think_time, max_depth=20, is_ponder=False):
-    global ponder_move
-    if is_ponder:
-        ponder_move = None
+# Returns [move eval, move, depth reached, time taken, ponder move] from the last depth that was fully searched
+# The search stops early when limits are reached, limits default to max_think_time
+# When pondering, there is no time limit until limits.set_max_think_time is called
+# Iterative deepening starts at start_depth, which helpers of a parallel search vary
+def calculate(board, max_think_time, max_depth=20, is_ponder=False, limits: SearchLimits=None,
+              start_depth: int=1):
     print("max_think_time =", max_think_time)
-    start_ts = time.time()
+    if limits is None:
+        limits = SearchLimits(None if is_ponder else max_think_time)
+    # Entries are shared by every depth of this search
+    tt_inc_age()
+    # So are killer moves and history scores
+    move_orderer = MoveOrderer()
+    # And leaf evaluations
+    eval_cache = EvalCache.from_mb()
 
     # If there's only one move, no need to calculate
     moves = list(board.legal_moves)
     if len(moves) == 1:
-        result = [None, moves[0], 0, 0]
+        result = [None, moves[0], 0, 0, None]
         set_result(result)
         return result
 
     #result, stop_search = pick_move(board, max_think_time, start_ts, depth=1,
     #                                move_filter=is_hard_tactic)
-    result, stop_search = pick_move(board, max_think_time, start_ts, depth=1,
-                                    extend_search=False)
+    # Leaves are evaluated differently without search extensions, so keep them out of the table
+    try:
+        result, stop_search = pick_move(board, limits, depth=1,
+                                        extend_search=False, use_tt=False)
+    except SearchAborted:
+        print("Search stopped before depth 1")
+        return None
     set_result(result)
     if stop_search:
         return result
 
-    for depth in range(1, max_depth + 1):
+    # Late quiet moves are searched shallower, so one selective search per depth
+    # replaces searching tactical moves first and then every move
+    for depth in range(start_depth, max_depth + 1):
+        try:
+            # Search around the last evaluation
+            cur_result, stop_search = pick_move(board, limits, depth,
+                                                previous_evaluation=result[0],
+                                                move_orderer=move_orderer, eval_cache=eval_cache)
+        except SearchAborted:
+            print("Search stopped during depth", depth)
+            return result
+        result = cur_result
+        set_result(result)
+        if stop_search:
+            return result
+
+    return result
 
-        move_filters = [is_soft_tactic, None]
-        if depth == 1:
-            move_filters = [None]
-        for move_filter in move_filters:
-        #for move_filter in [is_soft_tactic, None]:
-        #for move_filter in [is_soft_tactic, is_non_tactic]:
-        #for move_filter in [None]:
 
-            result, stop_search = pick_move(board, max_think_time, start_ts, depth,
-                                            move_filter=move_filter)
-            set_result(result)
-            if stop_search:
-                return result
+# Lazy SMP: num_threads - 1 helper processes run calculate on the same position alongside this one.
+# They only cooperate through the transposition table, which is moved into shared memory,
+# and start at different depths so they fill it with different parts of the tree.
+# Returns the result of the deepest fully searched depth of any process
+def calculate_lazy_smp(board, max_think_time, max_depth=20, is_ponder=False, limits: SearchLimits=None,
+                       num_threads: int=2):
+    if limits is None:
+        limits = SearchLimits(None if is_ponder else max_think_time)
+    if not transposition_table2.tt_is_shared():
+        transposition_table2.tt_init(transposition_table2.tt_size, shared=True)
+
+    # Helpers search until this process is done with its own search
+    stop_event = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    # Helpers replay the game so they can detect repetitions
+    moves = [move.uci() for move in board.move_stack]
+    root = board.copy()
+    while root.move_stack:
+        root.pop()
+    root_fen = root.fen()
+    helpers = []
+    for helper_index in range(1, num_threads):
+        helper = multiprocessing.Process(target=search_helper, daemon=True,
+                                         args=(root_fen, board.chess960, moves, max_depth,
+                                               get_helper_start_depth(helper_index),
+                                               transposition_table2.tt_shared_memory.name,
+                                               transposition_table2.tt_size, transposition_table2.tt_age,
+                                               stop_event, results))
+        helper.start()
+        helpers.append(helper)
 
+    try:
+        result = calculate(board, max_think_time, max_depth, is_ponder, limits)
+    finally:
+        stop_event.set()
+        helper_results = collect_helper_results(helpers, results)
+
+    for helper_result in helper_results:
+        # Ties go to this process, whose result was found first
+        if helper_result is not None and helper_result[1] is not None and \
+                (result is None or result[1] is None or helper_result[2] > result[2]):
+            result = helper_result
+    if result is not None:
+        set_result(result)
     return result
 
 
-def pick_move(board: Board, max_think_time: float, start_ts: float, depth: int,
-              forced_mate_depth: int=2, capture_depth: int=8,
-              move_filter=None, extend_search: bool=True):
-    print()
-    cur_result = minimax_alpha_beta.pick_full_move(board, depth,
-                                                   forced_mate_depth=forced_mate_depth,
-                                                   num_captures=capture_depth,
-                                                   move_filter=move_filter,
-                                                   extend_search=extend_search)
+def get_helper_start_depth(helper_index: int) -> int:
+    """Every other helper skips the first depth so helpers aren't in step with each other
+    """
+    return 1 + helper_index % 2
+
+
+def search_helper(root_fen: str, chess960: bool, moves, max_depth: int, start_depth: int,
+                  tt_name: str, tt_size: int, tt_age: int, stop_event, results) -> None:
+    """Runs in a helper process and puts the result of its deepest fully searched depth on results
+    """
+    # Helper output would be mixed into the UCI output
+    sys.stdout = open(os.devnull, 'w')
+    transposition_table2.tt_attach(tt_name, tt_size)
+    # calculate ages the table the same way the main process does
+    transposition_table2.tt_age = tt_age
+    board = Board(root_fen, chess960=chess960)
+    for move in moves:
+        board.push_uci(move)
+    global move_result
+    move_result = None
+    calculate(board, None, max_depth, limits=SearchLimits(stop_event=stop_event), start_depth=start_depth)
+    results.put(move_result)
 
-    elapsed_time = time.time() - start_ts
 
-    result = [cur_result[0], cur_result[1], depth, elapsed_time]
+def collect_helper_results(helpers, results):
+    """Results helpers report within HELPER_STOP_TIMEOUT, after which any helper still running is terminated
+    """
+    deadline = time.time() + HELPER_STOP_TIMEOUT
+    helper_results = []
+    for _ in helpers:
+        try:
+            helper_results.append(results.get(timeout=max(0, deadline - time.time())))
+        except queue.Empty:
+            break
+    for helper in helpers:
+        helper.join(max(0, deadline - time.time()))
+        if helper.is_alive():
+            helper.terminate()
+    return helper_results
+
+
+def pick_move(board: Board, limits: SearchLimits, depth: int,
+              forced_mate_depth: int=2, capture_depth: int=8,
+              move_filter=None, extend_search: bool=True, use_tt: bool=True,
+              previous_evaluation: float=None, move_orderer: MoveOrderer=None,
+              eval_cache: EvalCache=None):
+    print()
+    evaluation, pv = negamax.pick_full_line(board, depth,
+                                            forced_mate_depth=forced_mate_depth,
+                                            num_captures=capture_depth,
+                                            move_filter=move_filter,
+                                            extend_search=extend_search,
+                                            use_tt=use_tt,
+                                            limits=limits,
+                                            previous_evaluation=previous_evaluation,
+                                            move_orderer=move_orderer,
+                                            eval_cache=eval_cache)
+
+    elapsed_time = limits.get_elapsed_time()
+
+    move = pv[0] if pv else None
+    # The reply the engine expects, which can be searched while the opponent thinks
+    ponder_move = pv[1] if len(pv) > 1 and pv[1] else None
+    result = [evaluation, move, depth, elapsed_time, ponder_move]
 
     # An estimate on how many times longer it takes to calculate 1 depth deeper than the last
     #additional_depth_factor = 1.0
@@ -115,6 +219,7 @@ def pick_move(board: Board, max_think_time: float, start_ts: float, depth: int,
     #    additional_depth_factor = 5.0
     additional_depth_factor = 5.0
     print("additional_depth_factor =", additional_depth_factor)
+    max_think_time = limits.max_think_time
     stop_search = is_mating(result[0], depth, move_filter) or \
         (max_think_time and elapsed_time > max_think_time / additional_depth_factor)
 
@@ -122,9 +227,19 @@ def pick_move(board: Board, max_think_time: float, start_ts: float, depth: int,
 
 
 def is_mating(evaluation: int, depth: int, move_filter) -> bool:
+    """Has a mate been found that a deeper search can't make quicker?
+    Mates past depth were found by the search extension, so a quicker one may still be found.
+    """
     return evaluation is not None and \
         ((depth > 1) or (depth == 1 and move_filter is None)) and \
-        (evaluation >= MAX_MATING_EVAL or evaluation <= MIN_MATING_EVAL)
+        (evaluation >= MAX_MATING_EVAL or evaluation <= MIN_MATING_EVAL) and \
+        get_mate_distance(evaluation) <= depth
+
+
+def get_mate_distance(evaluation: int) -> int:
+    """How many plies until mate for a mate evaluation
+    """
+    return int(position_evaluator.MAX_EVAL - abs(evaluation))
 
 
 def set_result(result) -> None:
@@ -63,10 +63,10 @@ def is_check_capture(board: Board, move: chess.Move) -> bool:
 
 def is_good_capture(board: Board, move: chess.Move) -> bool:
     """Is `move` likely a good capture.
-    Is it a fair trade, taking a hanging piece, or taking a piece of higher value?
+    Does it break even or win material once the exchange on the square is played out?
+    SEE doesn't see pieces pinned to a queen, so a hanging piece capture still counts.
     """
-    return board.is_capture(move) and (is_equal_value_trade(board, move) or
-                                       is_higher_value_trade(board, move) or 
+    return board.is_capture(move) and (chess_util.see(board, move) >= 0 or
                                        is_hanging_piece_capture(board, move))
 
 
@@ -99,8 +99,8 @@ def does_opened_piece_make_threat(board: Board, piece_color: chess.Color,
     """
     for opened_piece in board.attackers(piece_color, piece_from_square):
         if board.piece_type_at(opened_piece) in LONG_RANGE_PIECE_TYPES:
-            for square in board.attacks(opened_piece).intersection(
-                    chess_util.start_ray(opened_piece, piece_from_square)):
+            for square in chess.scan_forward(board.attacks_mask(opened_piece) &
+                                             chess_util.start_ray_mask(opened_piece, piece_from_square)):
                 if board.is_stronger_piece_attacked_by(opened_piece, square) or \
                         board.is_hanging_piece_attacked_by(opened_piece, square):
                     return True
@@ -284,9 +284,8 @@ def is_bad_move(board: Board, move: chess.Move):
             not is_capture(board, move) and not any(attacker for attacker in board.attackers(not piece_color, piece)):
         try:
             board.push(move)
-            piece = move.to_square
-            if not board.has_defender(piece) and any(attacker for attacker in board.attackers(not piece_color, piece)
-                                                     if chess_util.can_piece_capture_no_pin(board, attacker, piece)):
+            # The opponent wins more than a pawn by taking the moved piece
+            if chess_util.see_square(board, move.to_square) > chess_util.PIECE_TYPES_TO_ROUGH_VALUES[chess.PAWN]:
                 return True
         finally:
             board.pop()
@@ -0,0 +1,109 @@
+"""Orders moves for the search without evaluating the positions after them
+Moves are given in stages: the transposition table move, winning captures,
+killer moves, quiet moves by history score, then losing captures
+"""
+import chess
+from typing import Iterator, List
+from board import Board
+import chess_util
+import position_evaluator
+
+PIECE_TYPES_TO_VALUES = position_evaluator.PIECE_TYPES_TO_VALUES.copy()
+PIECE_TYPES_TO_VALUES[chess.KING] = 0
+
+# Quiet moves that caused a cutoff are remembered for this many plies
+MAX_PLY = 64
+NUM_KILLERS = 2
+
+
+def get_mvv_lva_value(board: Board, move: chess.Move) -> int:
+    """MVV/LVA (Most Valuable Victim/Least Valuable Attacker) value of a capture or promotion
+    """
+    victim = position_evaluator.get_victim_value(board, move)
+    if move.promotion is not None:
+        victim += PIECE_TYPES_TO_VALUES[move.promotion]
+    attacker = PIECE_TYPES_TO_VALUES[board.piece_type_at(move.from_square)]
+    # The victim matters most, the attacker breaks ties
+    return victim * 10 - attacker
+
+
+def is_tactical_move(board: Board, move: chess.Move) -> bool:
+    return move.promotion is not None or board.is_capture(move)
+
+
+def is_winning_capture(board: Board, move: chess.Move) -> bool:
+    """Does the capture at least break even once the exchange on the square is played out?
+    """
+    return chess_util.see(board, move) >= 0
+
+
+class MoveOrderer:
+    """Killer moves and history scores learned during a search.
+    One MoveOrderer can be used for every iteration of iterative deepening.
+    """
+
+    def __init__(self):
+        # killers[ply] holds the latest quiet moves that caused a cutoff at ply
+        self.killers = [[None] * NUM_KILLERS for _ in range(MAX_PLY)]
+        # Indexed by from_square * 64 + to_square
+        self.history = [0] * (64 * 64)
+
+    def add_cutoff(self, board: Board, move: chess.Move, depth: int, ply: int) -> None:
+        """Remembers a move that caused a beta cutoff
+        """
+        if not move or is_tactical_move(board, move):
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        # Cutoffs deeper in the tree are worth more
+        self.history[move.from_square * 64 + move.to_square] += depth * depth
+
+    def get_history_value(self, move: chess.Move) -> int:
+        return self.history[move.from_square * 64 + move.to_square]
+
+    def order_moves(self, board: Board, moves: List[chess.Move], ply: int,
+                    tt_move: chess.Move=None) -> Iterator[chess.Move]:
+        """Yields each of moves once, best guesses first.
+        Later stages are only sorted if the search gets to them.
+        """
+        if tt_move is not None and tt_move in moves:
+            yield tt_move
+
+        null_move = None
+        captures = []
+        quiets = []
+        for move in moves:
+            if move == tt_move:
+                continue
+            if not move:
+                null_move = move
+            elif is_tactical_move(board, move):
+                captures.append(move)
+            else:
+                quiets.append(move)
+
+        captures.sort(key=lambda move: get_mvv_lva_value(board, move), reverse=True)
+        losing_captures = []
+        for move in captures:
+            if is_winning_capture(board, move):
+                yield move
+            else:
+                losing_captures.append(move)
+
+        killers = [killer for killer in self.killers[ply] if killer is not None and killer in quiets]
+        for move in killers:
+            yield move
+
+        quiets = [move for move in quiets if move not in killers]
+        quiets.sort(key=self.get_history_value, reverse=True)
+        for move in quiets:
+            yield move
+
+        for move in losing_captures:
+            yield move
+
+        # Passing is only an option in filtered searches, and is tried last
+        if null_move is not None:
+            yield null_move
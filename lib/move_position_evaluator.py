@@ -1,8 +1,14 @@
 import chess
 from board import Board
 import position_evaluator
-import chess_util
 
+# Squares within two squares of each square, where a move can change the safety of a king there
+KING_ZONES = [sum(chess.BB_SQUARES[square] for square in chess.SQUARES if chess.square_distance(king, square) <= 2)
+              for king in chess.SQUARES]
+
+# Each file with the files next to it
+ADJACENT_FILES = [chess.BB_FILES[file] | (chess.BB_FILES[file - 1] if file > 0 else chess.BB_EMPTY) |
+                  (chess.BB_FILES[file + 1] if file < 7 else chess.BB_EMPTY) for file in range(8)]
 
 class MovePositionEvaluator(object):
     """Evaluates positions on a move by move basis.
@@ -23,6 +29,11 @@ class MovePositionEvaluator(object):
         self.undo_updates = []
         self.undo_pieces_evaluation = []
         self.undo_final_evaluation = []
+        # Squares of the pieces in pieces_to_values
+        self.occupied = board.occupied
+        self.undo_occupied = []
+        self.pawns = board.pawns
+        self.undo_pawns = []
         
         for piece in board.get_all_pieces():
             piece_evaluation = self._get_piece_evaluation(piece)
@@ -31,40 +42,82 @@ class MovePositionEvaluator(object):
 
         self._set_final_evaluation()
         
-    def get_pieces_to_reevaluate(self) -> chess.SquareSet:
-        """Which pieces need to be reevaluated after a move? The piece that was moved,
-        all of the pieces that attacked the piece before the move and after the move,
-        and all of the pieces the piece attacked before and after the move.
+    def get_pieces_to_reevaluate(self, move: chess.Move, changed_squares: chess.Bitboard,
+                                 thorough: bool=False) -> chess.SquareSet:
+        """Which pieces need to be reevaluated after a move? The pieces on changed_squares,
+        all of the pieces that attack those squares after the move, and all of the pieces attacked from them.
+        If thorough, also the pieces the moved piece attacked before the move, pieces that sliders now see
+        through a vacated square, pawns whose file neighbors or squares in front changed, and kings near the move.
         """
-        # Todo: Add kings
-        move = self.board.peek()
-        attacked_pieces_from_from_square = chess.SquareSet([square for square in self.board.attacks(move.from_square)
-                                                            if self.board.piece_at(square) is not None])
-        attacked_pieces_from_to_square = chess.SquareSet([square for square in self.board.attacks(move.to_square)
-                                                          if self.board.piece_at(square) is not None])
-        pieces_to_reevaluate = chess.SquareSet.from_square(move.to_square).union(
-            attacked_pieces_from_from_square).union(attacked_pieces_from_to_square).union(
-                self.board.attackers(chess.WHITE, move.from_square)).union(
-                    self.board.attackers(chess.BLACK, move.from_square)).union(
-                        self.board.attackers(chess.WHITE, move.to_square)).union(self.board.attackers(chess.BLACK, move.to_square))
-        return pieces_to_reevaluate
+        board = self.board
+        squares = changed_squares
+        sliders = board.bishops | board.rooks | board.queens
+        # Changed squares and the squares attacked from them
+        influence = changed_squares
+        for square in chess.scan_forward(changed_squares):
+            attacks = board.attacks_mask(square)
+            attackers = board.attackers_mask(chess.WHITE, square) | board.attackers_mask(chess.BLACK, square)
+            influence |= attacks
+            squares |= attacks | attackers
+            if thorough and not board.occupied & chess.BB_SQUARES[square]:
+                for slider in chess.scan_forward(attackers & sliders):
+                    squares |= board.attacks_mask(slider)
+        if not thorough:
+            return chess.SquareSet(squares & board.occupied)
 
-    def evaluate_after_move(self) -> float:
+        previous_attacks = self._get_previous_attacks(move)
+        squares |= previous_attacks
+        influence |= previous_attacks
+        # Isolated and passed pawns depend on the pawns on their own and neighboring files
+        for square in chess.scan_forward(changed_squares & (self.pawns | board.pawns)):
+            squares |= board.pawns & ADJACENT_FILES[chess.square_file(square)]
+        # Pawns are evaluated by the two squares in front of them
+        squares |= (changed_squares >> 8 | changed_squares >> 16) & board.pawns & board.occupied_co[chess.WHITE]
+        squares |= (changed_squares << 8 | changed_squares << 16) & chess.BB_ALL & board.pawns & \
+            board.occupied_co[chess.BLACK]
+        # King safety depends on the squares around the king
+        for king in chess.scan_forward(board.kings):
+            if influence & KING_ZONES[king]:
+                squares |= chess.BB_SQUARES[king]
+        return chess.SquareSet(squares & board.occupied)
+
+    def evaluate_after_move(self, thorough: bool=False) -> float:
         """Evaluates only pieces affected by the move
+        thorough reevaluates more of the pieces the move may have affected. It is slower, but keeps the
+        evaluation close to a full evaluation across the many moves of the main search.
         Returns the evaluation of the position
         """
         # Todo: add attacking higher pieces eval
         # Todo: Handle endgames
         
         self.undo_pieces_evaluation.append(self.pieces_evaluation)
+        self.undo_occupied.append(self.occupied)
+        self.undo_pawns.append(self.pawns)
         
+        # Square to its value before the move, None if it was empty
         undo_updates = {}
-        move_from_square = self.board.peek().from_square
-        undo_updates[move_from_square] = self.pieces_to_values.get(move_from_square, 0)
-        pieces_to_reevaluate = self.get_pieces_to_reevaluate()
-        for piece in pieces_to_reevaluate:
-            undo_updates[piece] = self.pieces_to_values.get(piece, 0)
-            self._reevaluate_piece(piece)
+        move = self.board.peek()
+        occupied = self.board.occupied
+        if move:
+            # Squares that were emptied or filled: both squares of a move, the rook's squares when castling
+            # and the captured pawn's square for en passant. A capture changes the piece on to_square.
+            changed_squares = (self.occupied ^ occupied) | chess.BB_SQUARES[move.to_square]
+            pieces_to_reevaluate = self.get_pieces_to_reevaluate(move, changed_squares, thorough)
+        else:
+            # Passing changes which pieces can be taken this turn, so every piece is evaluated again
+            pieces_to_reevaluate = chess.SquareSet(occupied)
+        for square in chess.scan_forward(self.occupied & ~occupied):
+            value = self.pieces_to_values.pop(square)
+            undo_updates[square] = value
+            self.pieces_evaluation -= value
+        for square in pieces_to_reevaluate:
+            value = self.pieces_to_values.get(square)
+            undo_updates[square] = value
+            piece_evaluation = self._get_piece_evaluation(square)
+            self.pieces_evaluation += piece_evaluation - (value or 0)
+            self.pieces_to_values[square] = piece_evaluation
+        self.occupied = occupied
+        self.pawns = self.board.pawns
         self.undo_updates.append(undo_updates)
 
         self.undo_final_evaluation.append(self.final_evaluation)
@@ -75,10 +128,40 @@ class MovePositionEvaluator(object):
     def undo_move(self) -> None:
         """Undoes move, modifying pieces_to_values, pieces_evaluation, and final_evaluation
         """
-        self.pieces_to_values.update(self.undo_updates.pop())
+        for square, value in self.undo_updates.pop().items():
+            if value is None:
+                del self.pieces_to_values[square]
+            else:
+                self.pieces_to_values[square] = value
         self.pieces_evaluation = self.undo_pieces_evaluation.pop()
+        self.occupied = self.undo_occupied.pop()
+        self.pawns = self.undo_pawns.pop()
         self.final_evaluation = self.undo_final_evaluation.pop()
     
+    def _get_previous_attacks(self, move: chess.Move) -> chess.Bitboard:
+        """Squares the piece that made move attacked from its from_square
+        Assumes self.occupied is still the occupancy before the move
+        """
+        board = self.board
+        piece_type = chess.PAWN if move.promotion else board.piece_type_at(move.to_square)
+        # Chess960 castling leaves to_square empty, and only the king and rook moved
+        if piece_type is None:
+            return chess.BB_EMPTY
+        square = move.from_square
+        if piece_type == chess.PAWN:
+            return chess.BB_PAWN_ATTACKS[board.color_at(move.to_square)][square]
+        if piece_type == chess.KNIGHT:
+            return chess.BB_KNIGHT_ATTACKS[square]
+        if piece_type == chess.KING:
+            return chess.BB_KING_ATTACKS[square]
+        attacks = chess.BB_EMPTY
+        if piece_type in (chess.BISHOP, chess.QUEEN):
+            attacks |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & self.occupied]
+        if piece_type in (chess.ROOK, chess.QUEEN):
+            attacks |= chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & self.occupied] | \
+                chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & self.occupied]
+        return attacks
+
     def _set_final_evaluation(self):
         """Sets the final_evaluation, the evaluation considering checkmate, draws, and repetition
         Assumes pieces_evaluation has already been set
@@ -90,38 +173,6 @@ class MovePositionEvaluator(object):
             self.final_evaluation = position_evaluator.get_repetition_eval(self.board, self.turn, self.pieces_evaluation)
 
     
-    def _reevaluate_piece(self, piece: chess.Square) -> None:
-        """Updates the evaluation for the specified piece
-        """
-        move = self.board.peek()
-        piece_evaluation = self._get_piece_evaluation(piece)
-        # Reevaluate the piece that was moved
-        if piece == move.to_square:
-            self._clear_en_passant_square()
-            self.pieces_evaluation -= self.pieces_to_values[move.from_square]
-            self.pieces_to_values.pop(move.from_square)
-            # Subtracts the value of the captured piece if the move was a capture
-            self.pieces_evaluation -= self.pieces_to_values.get(move.to_square, 0)
-        else:
-            self.pieces_evaluation -= self.pieces_to_values[piece]
-        self.pieces_evaluation += piece_evaluation
-        self.pieces_to_values[piece] = piece_evaluation
-
-    def _clear_en_passant_square(self) -> None:
-        """Clears the value for the pawn that was taken en passant.
-        This assumes the move was already made on the board,
-        and the to_square for the move was not already cleared.
-        """
-        move = self.board.peek()
-        # Is this a pawn capture and is there no piece in the to_square being captured?
-        if self.board.piece_type_at(move.to_square) == chess.PAWN and \
-        chess.square_file(move.from_square) != chess.square_file(move.to_square) and \
-        move.to_square not in self.pieces_to_values:
-            # Square where pawn was captured en passant
-            en_passant_square = chess_util.get_prior_pawn_square(move.to_square, self.board.color_at(move.to_square))
-            self.pieces_evaluation -= self.pieces_to_values.get(en_passant_square, 0)
-            self.pieces_to_values.pop(en_passant_square, None)
-    
     def _get_piece_evaluation(self, piece: chess.Square):
         piece_evaluation = position_evaluator.evaluate_piece(self.board, self.board.color_at(piece), piece)
         if self.board.color_at(piece) != self.turn:
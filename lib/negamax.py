@@ -0,0 +1,437 @@
+"""Negamax principal variation search
+Scores inside the search are relative to the side to move.
+Scores returned by pick_full_move are relative to the side to move at the root,
+the same as minimax_alpha_beta.pick_full_move.
+Mates are scored by their distance from the root, and stored in the transposition table
+by their distance from the stored position.
+"""
+import chess
+import datetime
+import math
+import chess_util
+import position_evaluator
+from board import Board
+from constants import ASPIRATION_WINDOW, ASPIRATION_WIDEN_FACTOR, MAX_MATING_EVAL, NULL_MOVE_REDUCTION, \
+    NULL_MOVE_MIN_DEPTH, NULL_MOVE_MARGIN, NULL_MOVE_VERIFICATION_DEPTH, LMR_MIN_DEPTH, LMR_FULL_DEPTH_MOVES, \
+    LMR_DIVISOR, FUTILITY_MARGIN, RAZOR_MARGIN, RAZOR_DEPTH
+from move_filter import is_bad_move, is_soft_tactic
+from eval_cache import EvalCache
+from move_position_evaluator import MovePositionEvaluator
+from move_ordering import MoveOrderer
+from search_extension import SearchExtension
+from search_extension_util import get_root_mate_eval, get_position_mate_eval
+from search_limits import SearchAborted
+from transposition_table2 import tt_lookup_helper, tt_store
+
+# Deepest ply the principal variation table can hold
+MAX_PLY = 64
+# Width of the window used to test whether a move beats the best move so far
+NULL_WINDOW = 1
+# How many moves are counted for late move reductions; later moves are reduced the same
+MAX_MOVE_INDEX = 64
+
+# LMR_REDUCTIONS[depth][move_index] is how many plies a late quiet move is reduced by
+LMR_REDUCTIONS = [[0] * MAX_MOVE_INDEX for _ in range(MAX_PLY)]
+for depth_ in range(LMR_MIN_DEPTH, MAX_PLY):
+    for move_index_ in range(LMR_FULL_DEPTH_MOVES, MAX_MOVE_INDEX):
+        # Always leave at least one ply to search
+        LMR_REDUCTIONS[depth_][move_index_] = min(
+            int(0.75 + math.log(depth_) * math.log(move_index_) / LMR_DIVISOR), depth_ - 2)
+
+
+class NegamaxSearch:
+
+    def __init__(self, board: Board, forced_mate_depth: int=2, num_captures: int=8,
+                 use_tt: bool=False, move_filter=None, move_filter_depth: int=1,
+                 extend_search: bool=True, evaluate_position=position_evaluator.evaluate_position,
+                 limits=None, move_orderer: MoveOrderer=None, eval_cache: EvalCache=None,
+                 quiescence: bool=True, null_move_pruning: bool=True, late_move_reductions: bool=True,
+                 futility_margin: float=FUTILITY_MARGIN, razor_margin: float=RAZOR_MARGIN):
+        self.board = board
+        # Leaves are evaluated for the root turn so eval_cache can be shared by every leaf
+        self.root_turn = board.turn
+        self.forced_mate_depth = forced_mate_depth
+        self.num_captures = num_captures
+        self.use_tt = use_tt
+        self.move_filter = move_filter
+        self.move_filter_depth = move_filter_depth
+        self.extend_search = extend_search
+        # Leaves are extended with a quiescence search bounded by the node's window
+        self.quiescence = quiescence
+        self.null_move_pruning = null_move_pruning
+        self.late_move_reductions = late_move_reductions
+        # Futility pruning and razoring are turned off by margins of None
+        self.futility_margin = futility_margin
+        self.razor_margin = razor_margin
+        self.evaluate_position = evaluate_position
+        # search_limits.SearchLimits checked at every node, if any
+        self.limits = limits
+        # Killers and history can be kept between iterations by passing in the same MoveOrderer
+        self.move_orderer = move_orderer if move_orderer is not None else MoveOrderer()
+        # Entries from a filtered search are only reused by filtered searches
+        self.filtered = move_filter is not None
+        # Leaf evaluations can be kept between iterations by passing in the same EvalCache
+        self.eval_cache = eval_cache if eval_cache is not None else EvalCache.from_mb()
+        # Scores every piece for the root turn once per search,
+        # then is updated move by move for the leaves, razoring and futility pruning
+        self.move_position_evaluator = None
+        self.node_count = 0
+        self.prune_count = 0
+        self.tt_hit_count = 0
+        # Null moves searched, and how many of them pruned the node
+        self.null_move_count = 0
+        self.null_move_prune_count = 0
+        # Moves searched at reduced depth, and how many of them had to be searched again
+        self.reduction_count = 0
+        self.reduction_re_search_count = 0
+        self.futility_prune_count = 0
+        self.razor_prune_count = 0
+        self.mate_distance_prune_count = 0
+        # Number of times an aspiration window had to be widened and the position searched again
+        self.fail_high_count = 0
+        self.fail_low_count = 0
+        # pv_table[ply] holds the best line found from ply, in pv_table[ply][ply:pv_length[ply]]
+        self.pv_table = [[None] * MAX_PLY for _ in range(MAX_PLY)]
+        self.pv_length = [0] * MAX_PLY
+
+    def search(self, depth: int, alpha: float=position_evaluator.MIN_EVAL,
+               beta: float=position_evaluator.MAX_EVAL, previous_evaluation: float=None):
+        """Returns (evaluation, move) for the side to move
+        previous_evaluation, such as from the last iteration, is used for an aspiration window
+        Raises search_limits.SearchAborted, with the board restored, if a limit is reached
+        """
+        # Leaf evaluations depend on the search extension limits, so they are only kept while those are the same
+        self.eval_cache.new_search((self.quiescence, self.forced_mate_depth, self.num_captures))
+        self.move_position_evaluator = MovePositionEvaluator(self.board, self.root_turn)
+        num_moves = len(self.board.move_stack)
+        try:
+            if previous_evaluation is None or abs(previous_evaluation) >= MAX_MATING_EVAL:
+                evaluation = self.negamax(depth, alpha, beta, 0)
+            else:
+                evaluation = self.aspiration_search(depth, previous_evaluation)
+        except SearchAborted:
+            while len(self.board.move_stack) > num_moves:
+                self.board.pop()
+            raise
+        if self.pv_length[0] == 0:
+            return (evaluation, None)
+        return (evaluation, self.pv_table[0][0])
+
+    def aspiration_search(self, depth: int, previous_evaluation: float) -> float:
+        """Searches a narrow window around previous_evaluation,
+        widening the side that failed until the evaluation is inside the window
+        """
+        window = ASPIRATION_WINDOW
+        alpha = max(previous_evaluation - window, position_evaluator.MIN_EVAL)
+        beta = min(previous_evaluation + window, position_evaluator.MAX_EVAL)
+        while True:
+            evaluation = self.negamax(depth, alpha, beta, 0)
+            window *= ASPIRATION_WIDEN_FACTOR
+            if evaluation <= alpha and alpha > position_evaluator.MIN_EVAL:
+                self.fail_low_count += 1
+                alpha = max(evaluation - window, position_evaluator.MIN_EVAL)
+            elif evaluation >= beta and beta < position_evaluator.MAX_EVAL:
+                self.fail_high_count += 1
+                beta = min(evaluation + window, position_evaluator.MAX_EVAL)
+            else:
+                return evaluation
+
+    def get_pv(self):
+        """The best line found by the last search
+        """
+        return self.pv_table[0][:self.pv_length[0]]
+
+    def evaluate_leaf(self, alpha: float=position_evaluator.MIN_EVAL,
+                      beta: float=position_evaluator.MAX_EVAL, ply: int=0) -> float:
+        """Returns the evaluation of the position for the side to move, with mates scored from the root
+        alpha and beta are only used by the quiescence search
+        """
+        return get_root_mate_eval(self.evaluate_position_at_leaf(
+            get_position_mate_eval(alpha, ply), get_position_mate_eval(beta, ply)), ply)
+
+    def evaluate_position_at_leaf(self, alpha: float, beta: float) -> float:
+        if self.extend_search:
+            # The search extension evaluates for the root turn
+            if self.board.turn != self.root_turn:
+                alpha, beta = -beta, -alpha
+            evaluation = SearchExtension(self.board, self.root_turn, eval_cache=self.eval_cache,
+                                         limits=self.limits, quiescence=self.quiescence,
+                                         move_position_evaluator=self.move_position_evaluator).search(
+                forced_mate_depth=self.forced_mate_depth, num_captures_remaining=self.num_captures,
+                alpha=alpha, beta=beta)[0]
+        else:
+            evaluation = self.evaluate_position(self.board, self.root_turn, check_tactics=True, extend=True,
+                                                check_forced_mate=True)
+        return evaluation if self.board.turn == self.root_turn else -evaluation
+
+    def push(self, move: chess.Move) -> None:
+        self.board.push(move)
+        self.move_position_evaluator.evaluate_after_move(thorough=True)
+
+    def pop(self) -> None:
+        self.move_position_evaluator.undo_move()
+        self.board.pop()
+
+    def get_static_evaluation(self) -> float:
+        """The evaluation of the pieces on the board for the side to move, without searching
+        """
+        evaluation = self.move_position_evaluator.get_evaluation()
+        return evaluation if self.board.turn == self.root_turn else -evaluation
+
+    def get_moves(self, depth: int):
+        board = self.board
+        moves = list(board.legal_moves)
+        if self.move_filter is None:
+            moves = [move for move in moves if not is_bad_move(board, move)]
+            if not moves:
+                moves = list(board.legal_moves)
+        elif depth <= self.move_filter_depth:
+            moves = [move for move in moves if self.move_filter(board, move)]
+            if not board.is_check():
+                moves.append(chess.Move.null())
+        return moves
+
+    def update_pv(self, ply: int, move: chess.Move) -> None:
+        pv = self.pv_table[ply]
+        child_pv = self.pv_table[ply + 1]
+        pv[ply] = move
+        child_length = self.pv_length[ply + 1]
+        for i in range(ply + 1, child_length):
+            pv[i] = child_pv[i]
+        self.pv_length[ply] = max(child_length, ply + 1)
+
+    def can_try_null_move(self, depth: int, alpha: float, beta: float, ply: int) -> bool:
+        """Null moves are only tried at non-PV nodes where passing can't be the best move
+        """
+        board = self.board
+        if not self.null_move_pruning or ply == 0 or depth < NULL_MOVE_MIN_DEPTH or \
+                beta - alpha > NULL_WINDOW or abs(beta) >= MAX_MATING_EVAL or board.is_check():
+            return False
+        # No two null moves in a row
+        if board.move_stack and not board.move_stack[-1]:
+            return False
+        # With only pawns, passing could be better than every move (zugzwang)
+        if not board.occupied_co[board.turn] & ~(board.pawns | board.kings):
+            return False
+        return self.get_static_evaluation() + NULL_MOVE_MARGIN >= beta
+
+    def null_move_search(self, depth: int, beta: float, ply: int) -> bool:
+        """Does passing still fail high? If so, a real move should as well.
+        """
+        self.null_move_count += 1
+        self.push(chess.Move.null())
+        try:
+            score = -self.negamax(max(depth - 1 - NULL_MOVE_REDUCTION, 0), -beta, -beta + NULL_WINDOW, ply + 1)
+        finally:
+            self.pop()
+        if score < beta:
+            return False
+        if depth >= NULL_MOVE_VERIFICATION_DEPTH:
+            # Guards against zugzwang positions the material check misses
+            score = self.negamax(depth - NULL_MOVE_REDUCTION, beta - NULL_WINDOW, beta, ply, allow_null_move=False)
+            if score < beta:
+                return False
+        self.null_move_prune_count += 1
+        return True
+
+    def get_reduction(self, depth: int, move_index: int, move: chess.Move) -> int:
+        """How many plies shallower `move` is searched
+        Tactical moves are never reduced. The board is the position before `move`.
+        """
+        if not self.late_move_reductions or depth < LMR_MIN_DEPTH or move_index < LMR_FULL_DEPTH_MOVES or \
+                not move or self.board.is_check():
+            return 0
+        reduction = LMR_REDUCTIONS[min(depth, MAX_PLY - 1)][min(move_index, MAX_MOVE_INDEX - 1)]
+        if reduction <= 0 or is_soft_tactic(self.board, move):
+            return 0
+        return reduction
+
+    def is_quiet_move(self, move: chess.Move) -> bool:
+        """Can `move` be skipped by futility pruning?
+        """
+        board = self.board
+        return bool(move) and move.promotion is None and not board.is_capture(move) and \
+            not board.gives_check(move)
+
+    def is_futile(self, move: chess.Move, alpha: float) -> bool:
+        """Can't `move` raise the evaluation to within the futility margin of alpha?
+        Only the pieces affected by `move` are evaluated again.
+        """
+        self.push(move)
+        try:
+            # For the side that made the move
+            evaluation = -self.get_static_evaluation()
+        finally:
+            self.pop()
+        return evaluation + self.futility_margin <= alpha
+
+    def razor(self, depth: int, alpha: float, beta: float, ply: int) -> float:
+        """Returns the quiescence evaluation if the position looks too bad to reach alpha, otherwise None
+        """
+        board = self.board
+        if self.razor_margin is None or depth != RAZOR_DEPTH or beta - alpha > NULL_WINDOW or \
+                abs(alpha) >= MAX_MATING_EVAL or board.is_check():
+            return None
+        static_evaluation = self.get_static_evaluation()
+        if static_evaluation + self.razor_margin > alpha:
+            return None
+        evaluation = self.evaluate_leaf(alpha, alpha + NULL_WINDOW, ply)
+        if evaluation > alpha:
+            return None
+        self.razor_prune_count += 1
+        return evaluation
+
+    def negamax(self, depth: int, alpha: float, beta: float, ply: int, allow_null_move: bool=True) -> float:
+        """Returns the evaluation of the position for the side to move
+        alpha is the min possible value
+        beta is the max possible value
+        """
+        self.node_count += 1
+        if self.limits is not None:
+            self.limits.check()
+        self.pv_length[ply] = ply
+        board = self.board
+        if depth == 0 or ply == MAX_PLY - 1 or chess_util.is_game_over(board):
+            return self.evaluate_leaf(alpha, beta, ply)
+
+        if ply > 0:
+            # No line from here can do better than mating next move or worse than being mated now
+            alpha = max(alpha, position_evaluator.MIN_EVAL + ply)
+            beta = min(beta, position_evaluator.MAX_EVAL - ply - 1)
+            if alpha >= beta:
+                self.mate_distance_prune_count += 1
+                return alpha
+
+        tt_move = None
+        if self.use_tt:
+            tt_hit = tt_lookup_helper(board, get_position_mate_eval(alpha, ply), get_position_mate_eval(beta, ply),
+                                      depth, board.turn, self.filtered)
+            if tt_hit:
+                score, tt_move = tt_hit[1]
+                score = get_root_mate_eval(score, ply)
+                # Never cut off at the root because a move has to be returned
+                if tt_hit[0] and ply > 0:
+                    self.tt_hit_count += 1
+                    if tt_move is not None:
+                        self.pv_table[ply][ply] = tt_move
+                        self.pv_length[ply] = ply + 1
+                    return score
+
+        if allow_null_move and self.can_try_null_move(depth, alpha, beta, ply) and \
+                self.null_move_search(depth, beta, ply):
+            self.pv_length[ply] = ply
+            return beta
+
+        if ply > 0:
+            razor_evaluation = self.razor(depth, alpha, beta, ply)
+            if razor_evaluation is not None:
+                return razor_evaluation
+
+        moves = self.get_moves(depth)
+        # Every move was filtered out
+        if not moves:
+            return self.evaluate_leaf(alpha, beta, ply)
+
+        # The stored bound depends on the window the node was searched with
+        original_alpha = alpha
+        best_score = None
+        best_move = None
+        can_prune_futile = self.futility_margin is not None and depth == 1 and ply > 0 and \
+            not board.is_check() and abs(alpha) < MAX_MATING_EVAL
+        for move_index, move in enumerate(self.move_orderer.order_moves(board, moves, ply, tt_move)):
+            if can_prune_futile and best_score is not None and self.is_quiet_move(move):
+                if self.is_futile(move, alpha):
+                    self.futility_prune_count += 1
+                    continue
+            reduction = self.get_reduction(depth, move_index, move) if best_score is not None else 0
+            self.push(move)
+            if best_score is None:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # Only check that the move is no better than the best move so far,
+                # and search again with the full window if it is
+                score = -self.negamax(depth - 1 - reduction, -alpha - NULL_WINDOW, -alpha, ply + 1)
+                if reduction:
+                    self.reduction_count += 1
+                    # A reduced move that looks better is checked at full depth
+                    if score > alpha:
+                        self.reduction_re_search_count += 1
+                        score = -self.negamax(depth - 1, -alpha - NULL_WINDOW, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            self.pop()
+            # Greater than so the first fully evaluated best move is kept
+            if best_score is None or score > best_score:
+                best_score = score
+                best_move = move
+                self.update_pv(ply, move)
+            alpha = max(alpha, best_score)
+            if beta <= alpha:
+                self.prune_count += 1
+                self.move_orderer.add_cutoff(board, move, depth, ply)
+                break
+
+        # Draws by repetition depend on how the position was reached, so they are not stored
+        if self.use_tt and best_score != position_evaluator.DRAW_EVAL:
+            tt_store(board, get_position_mate_eval(original_alpha, ply), get_position_mate_eval(beta, ply),
+                     get_position_mate_eval(best_score, ply), best_move, depth, board.turn, self.filtered)
+        return best_score
+
+
+# Returns (evaluation, principal variation)
+def pick_full_line(board: Board, depth: int=3, forced_mate_depth: int=2, num_captures: int=8,
+                   move_filter=None, move_filter_depth: int=1, extend_search: bool=True,
+                   use_tt: bool=False, limits=None, previous_evaluation: float=None,
+                   move_orderer: MoveOrderer=None, eval_cache: EvalCache=None):
+    start = datetime.datetime.now()
+    search = NegamaxSearch(board, forced_mate_depth=forced_mate_depth, num_captures=num_captures,
+                           use_tt=use_tt, move_filter=move_filter, move_filter_depth=move_filter_depth,
+                           extend_search=extend_search, limits=limits, move_orderer=move_orderer,
+                           eval_cache=eval_cache)
+    evaluation = search.search(depth, previous_evaluation=previous_evaluation)[0]
+    pv = search.get_pv()
+    result = (evaluation, pv)
+    print("depth =", depth)
+    print("extend search =", extend_search)
+    if extend_search:
+        print("capture depth =", num_captures)
+        print("forced mate depth =", forced_mate_depth)
+    if move_filter is not None:
+        print("move filter =", move_filter.__name__)
+    print("result = ", (evaluation, pv[0] if pv else None))
+    print("pv = ", [move.uci() for move in pv])
+    if previous_evaluation is not None:
+        print("aspiration fail highs =", search.fail_high_count, "fail lows =", search.fail_low_count)
+    print("prune_count = ", search.prune_count)
+    print("node_count = ", search.node_count)
+    print("null moves =", search.null_move_count, "null move prunes =", search.null_move_prune_count)
+    print("reductions =", search.reduction_count, "re-searches =", search.reduction_re_search_count)
+    print("futility prunes =", search.futility_prune_count, "razor prunes =", search.razor_prune_count)
+    print("mate distance prunes =", search.mate_distance_prune_count)
+    if extend_search:
+        print("eval cache hits =", search.eval_cache.hits, "misses =", search.eval_cache.misses,
+              "hit rate =", round(search.eval_cache.get_hit_rate(), 3),
+              "replacements =", search.eval_cache.replacements)
+    if use_tt:
+        print("tt_hit_count = ", search.tt_hit_count)
+    end = datetime.datetime.now()
+    print("move time = ", end-start)
+    return result
+
+
+# Returns (evaluation, move)
+def pick_full_move(board: Board, depth: int=3, forced_mate_depth: int=2, num_captures: int=8,
+                   move_filter=None, move_filter_depth: int=1, extend_search: bool=True,
+                   use_tt: bool=False, limits=None, previous_evaluation: float=None):
+    evaluation, pv = pick_full_line(board, depth, forced_mate_depth=forced_mate_depth,
+                                    num_captures=num_captures, move_filter=move_filter,
+                                    move_filter_depth=move_filter_depth, extend_search=extend_search,
+                                    use_tt=use_tt, limits=limits, previous_evaluation=previous_evaluation)
+    return (evaluation, pv[0] if pv else None)
+
+
+def pick_move(board: Board, depth: int=3, move_filter=None, move_filter_depth: int=1,
+              extend_search: bool=True):
+    return pick_full_move(board, depth, move_filter=move_filter,
+                          move_filter_depth=move_filter_depth,
+                          extend_search=extend_search)[1]
@@ -0,0 +1,77 @@
+import chess
+import chess_util
+from board import Board
+
+# Caches the parts of the evaluation that only depend on where the pawns are
+# Entries are keyed by Board.get_pawn_zh, which only changes on pawn moves and captures,
+# so nearly every position searched finds its entry
+
+DEFAULT_PAWN_HASH_SIZE = 1 << 14
+
+
+class PawnEntry:
+    """Squares of pawns, for both colors, that are passed, isolated, or have a pawn right in front of them,
+    and squares of the files with no pawns or a single pawn
+    """
+    __slots__ = ['pawn_zh', 'passed', 'isolated', 'blocked', 'open_files', 'half_open_files', 'open_line_lengths']
+
+    def __init__(self, board: Board):
+        self.pawn_zh = board.get_pawn_zh()
+        self.passed = chess.BB_EMPTY
+        self.isolated = chess.BB_EMPTY
+        self.open_files = chess.BB_EMPTY
+        self.half_open_files = chess.BB_EMPTY
+        # Open ranks and diagonals of each king square looked up, see position_evaluator.get_open_line_lengths
+        self.open_line_lengths = {}
+        pawns = board.pawns
+        for color in chess.COLORS:
+            own_pawns = pawns & board.occupied_co[color]
+            enemy_pawns = pawns & board.occupied_co[not color]
+            for pawn in chess.scan_forward(own_pawns):
+                if not enemy_pawns & chess_util.get_passed_pawn_span_mask(pawn, color):
+                    self.passed |= chess.BB_SQUARES[pawn]
+                if not own_pawns & chess_util.get_adjacent_files_mask(pawn):
+                    self.isolated |= chess.BB_SQUARES[pawn]
+        self.blocked = pawns & board.occupied_co[chess.WHITE] & (pawns >> 8) | \
+            pawns & board.occupied_co[chess.BLACK] & (pawns << 8)
+        for file in chess.BB_FILES:
+            num_pawns = chess.popcount(pawns & file)
+            if num_pawns == 0:
+                self.open_files |= file
+            elif num_pawns == 1:
+                self.half_open_files |= file
+
+
+class PawnHash:
+
+    def __init__(self, size: int=DEFAULT_PAWN_HASH_SIZE):
+        self.size = size
+        self.entries = [None] * size
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry(self, board: Board) -> PawnEntry:
+        """Returns the entry for the pawns of board, making it if it isn't stored
+        An entry for other pawns in the same slot is replaced
+        """
+        pawn_zh = board.get_pawn_zh()
+        i = pawn_zh % self.size
+        entry = self.entries[i]
+        if entry is not None and entry.pawn_zh == pawn_zh:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = PawnEntry(board)
+        self.entries[i] = entry
+        return entry
+
+    def get_hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+
+# Shared by every evaluation
+pawn_hash = PawnHash()
+
+def get_pawn_entry(board: Board) -> PawnEntry:
+    return pawn_hash.get_entry(board)
@@ -5,6 +5,7 @@ import endgame
 from board import Board
 from typing import List, Tuple
 import search_extension_util
+from pawn_hash import get_pawn_entry
 
 # Todo: Knight strength with pawns; knights are stronger in closed positions
 # Todo: Avoid exchanges when down material/exchange when up material
@@ -164,6 +165,10 @@ OPEN_RANK_TO_KING_PENALTY = -10
 OPEN_DIAGONAL_TO_KING_PENALTY = -10
 
 KING_DISTANCE_TO_PAWN_BONUS = [0, 1]
+# How far from the king open ranks and diagonals are checked
+MAX_OPEN_LINE_DISTANCE = 3
+KING_RANK_DIRECTIONS = [-1, 1]
+KING_DIAGONAL_DIRECTIONS = [(-1, 1), (1, 1), (1, -1), (-1, -1)]
 
 # Delete
 POTENTIAL_CHECK_EVAL = 5
@@ -185,6 +190,77 @@ PIECE_TYPES_STRONG_TO_WEAK = [
 ALL_PIECE_TYPES = PIECE_TYPES + [chess.KING]
 
 
+def get_tapered_tables(get_value_range):
+    """Compiles a term that only depends on the square into opening and endgame tables for each color
+    get_value_range(square, color) returns a value or an [opening, endgame] range.
+    Returns a list indexed by color of (opening values, endgame values) lists indexed by square.
+    """
+    tables = []
+    for color in chess.COLORS[::-1]:
+        opening_values = []
+        endgame_values = []
+        for square in chess.SQUARES:
+            value_range = get_value_range(square, color)
+            if not isinstance(value_range, list):
+                value_range = [value_range, value_range]
+            opening_values.append(value_range[0])
+            endgame_values.append(value_range[1])
+        tables.append((opening_values, endgame_values))
+    return tables
+
+
+def add_value_ranges(*value_ranges):
+    return [sum(value_range[0] for value_range in value_ranges), sum(value_range[1] for value_range in value_ranges)]
+
+
+def get_bonus_masks(tables):
+    """Groups the squares of tables made by get_tapered_tables by their values
+    Returns a list indexed by color of (mask, opening value, endgame value) for each nonzero value,
+    so the bonus for a set of squares is the popcount of the set and each mask times its values
+    """
+    bonus_masks = []
+    for opening_values, endgame_values in tables:
+        values_to_mask = defaultdict(int)
+        for square in chess.SQUARES:
+            if opening_values[square] or endgame_values[square]:
+                values_to_mask[(opening_values[square], endgame_values[square])] |= chess.BB_SQUARES[square]
+        bonus_masks.append([(mask, opening_value, endgame_value)
+                            for (opening_value, endgame_value), mask in values_to_mask.items()])
+    return bonus_masks
+
+
+# Tapered tables: the [opening, endgame] terms are summed separately and blended once by get_tapered_eval
+ATTACKING_BONUS_TABLES = get_tapered_tables(lambda square, color: add_value_ranges(
+    SQUARES_TO_ATTACKING_BONUS[square],
+    RANKS_TO_ATTACKING_BONUS[chess_util.get_adjusted_rank(square, color)]))
+ROOK_ATTACKING_BONUS_TABLES = get_tapered_tables(lambda square, color: add_value_ranges(
+    ROOK_SQUARES_TO_ATTACKING_BONUS[square],
+    ROOK_RANKS_TO_ATTACKING_BONUS[chess_util.get_adjusted_rank(square, color)]))
+ATTACKING_BONUS_MASKS = get_bonus_masks(ATTACKING_BONUS_TABLES)
+ROOK_ATTACKING_BONUS_MASKS = get_bonus_masks(ROOK_ATTACKING_BONUS_TABLES)
+# Number of squares next to the king on each square
+KING_ADJACENT_COUNTS = [chess.popcount(chess.BB_KING_ATTACKS[square]) for square in chess.SQUARES]
+
+
+def get_open_line_ray_mask(square, rank_delta, file_delta):
+    """Returns the squares up to MAX_OPEN_LINE_DISTANCE from square in the direction, stopping at the edge of the board
+    """
+    ray = chess.BB_EMPTY
+    for i in range(1, MAX_OPEN_LINE_DISTANCE + 1):
+        ray_square = chess_util.add_rank_and_file(square, i * rank_delta, i * file_delta)
+        if ray_square is None:
+            break
+        ray |= chess.BB_SQUARES[ray_square]
+    return ray
+
+
+# Indexed by direction then square
+OPEN_RANK_RAYS = {file_direction: [get_open_line_ray_mask(square, 0, file_direction) for square in chess.SQUARES]
+                  for file_direction in KING_RANK_DIRECTIONS}
+OPEN_DIAGONAL_RAYS = {direction: [get_open_line_ray_mask(square, *direction) for square in chess.SQUARES]
+                      for direction in KING_DIAGONAL_DIRECTIONS}
+
+
 # returns range between 0 and 1 where 0 is for opening and 1 for endgame
 def get_phase(board, color):
     piece_value_total = 0
@@ -217,25 +293,37 @@ def get_eval(board, color, value_range):
         value = phase * value_diff + value_range[0]
     return value
 
+
+def get_tapered_eval(board, color, opening_value, endgame_value):
+    return board.get_phase(color) * (endgame_value - opening_value) + opening_value
+
+
+def get_table_eval(board, color, tables, square):
+    """Looks up square in tables made by get_tapered_tables
+    """
+    opening_values, endgame_values = tables[color]
+    return get_tapered_eval(board, color, opening_values[square], endgame_values[square])
+
 # Gets the bonus for the piece attacking certain squares (e.g. control the center or attack enemy territory)
 
 
-def get_attacking_bonus(board, color, piece, squares_to_attacking_bonus=SQUARES_TO_ATTACKING_BONUS,
-                        ranks_to_attacking_bonus=RANKS_TO_ATTACKING_BONUS):
-    bonus = 0
-    for attacked_square in board.attacks(piece):
-        bonus += get_eval(board, color,
-                          squares_to_attacking_bonus.get(attacked_square))
-        bonus += get_eval(board, color, ranks_to_attacking_bonus.get(
-            chess_util.get_adjusted_rank(attacked_square, color)))
-    return bonus
+def get_attacking_bonus(board, color, piece, attacking_bonus_masks=ATTACKING_BONUS_MASKS):
+    attacks = board.attacks_mask(piece)
+    opening_bonus = 0
+    endgame_bonus = 0
+    for mask, opening_value, endgame_value in attacking_bonus_masks[color]:
+        num_attacked = chess.popcount(attacks & mask)
+        opening_bonus += num_attacked * opening_value
+        endgame_bonus += num_attacked * endgame_value
+    return get_tapered_eval(board, color, opening_bonus, endgame_bonus)
 
 
 def get_piece_trapped_penalty(board: Board, piece: chess.Square) -> int:
     """Return a penalty if the piece has no safe squares to move to
     """
     piece_color = board.color_at(piece)
-    if any(not board.is_attacked_by(not piece_color, square) for square in board.get_moves_to_squares(piece)):
+    moves_to_squares = board.attacks_mask(piece) & ~board.occupied_co[piece_color]
+    if moves_to_squares & ~board.get_attack_map().pseudo_attacks[not piece_color]:
         return 0
     return PIECE_TYPES_TO_TRAPPED_PENALTIES[board.piece_type_at(piece)]
 
@@ -261,24 +349,25 @@ def attacking_stronger_pieces(board, color, free_to_take=None, free_to_trade=Non
     evaluation = 0
     if board.turn != color:
         modifier = FREE_TO_TAKE_NOT_TURN_MODIFIER
+        attack_map = board.get_attack_map()
+        # attacked by color and defended by not color
+        contested = attack_map.pseudo_attacks[color] & attack_map.pseudo_attacks[not color]
         for piece_type in PIECE_TYPES:
-            pieces = board.pieces(piece_type, not color)
-            for piece in pieces:
+            pieces = board.pieces_mask(piece_type, not color) & contested
+            for piece in chess.scan_forward(pieces):
                 if piece != free_to_take:
-                    # attacked by color and defended by not color
-                    if board.is_attacked_by(color, piece) and board.is_attacked_by(not color, piece):
-                        attackers = board.attackers(color, piece)
-                        # difference between attacking piece value and attacked piece value
-                        max_difference = 0
-                        for attacker in attackers:
-                            if board.piece_type_at(attacker) != chess.KING:
-                                attacker_value = PIECE_TYPES_TO_VALUES[board.piece_type_at(
-                                    attacker)]
-                                piece_value = PIECE_TYPES_TO_VALUES[piece_type]
-                                if attacker_value < piece_value:
-                                    max_difference = max(
-                                        max_difference, piece_value - attacker_value)
-                        evaluation += max_difference * modifier
+                    attackers = board.attackers(color, piece)
+                    # difference between attacking piece value and attacked piece value
+                    max_difference = 0
+                    for attacker in attackers:
+                        if board.piece_type_at(attacker) != chess.KING:
+                            attacker_value = PIECE_TYPES_TO_VALUES[board.piece_type_at(
+                                attacker)]
+                            piece_value = PIECE_TYPES_TO_VALUES[piece_type]
+                            if attacker_value < piece_value:
+                                max_difference = max(
+                                    max_difference, piece_value - attacker_value)
+                    evaluation += max_difference * modifier
     return evaluation
 
 # Delete
@@ -294,11 +383,7 @@ def get_num_isolated_pawns(pawns):
 
 
 def is_isolated_pawn(pawns, pawn):
-    adjacent_files = chess_util.get_adjacent_files(pawn)
-    for adjacent_file in adjacent_files:
-        if int(pawns) & chess.BB_FILES[adjacent_file]:
-            return False
-    return True
+    return not int(pawns) & chess_util.get_adjacent_files_mask(pawn)
 
 
 def get_isolated_pawn_penalty(pawns, pawn):
@@ -307,49 +392,15 @@ def get_isolated_pawn_penalty(pawns, pawn):
 
 # Delete? - This was replaced with a check for each pawn instead of all of them
 def get_num_passed_pawns(board, turn):
-    num_passed_pawns = 0
-    own_pawns = board.pieces(chess.PAWN, turn)
-    enemy_pawns = board.pieces(chess.PAWN, not turn)
-    enemy_pawn_files = list(map(chess.square_file, enemy_pawns))
-    # dictionary with default values of empty list
-    enemy_pawn_files_to_pawns = defaultdict(list)
-    for enemy_pawn in enemy_pawns:
-        enemy_pawn_files_to_pawns[chess.square_file(
-            enemy_pawn)].append(enemy_pawn)
-    for own_pawn in own_pawns:
-        own_pawn_file = chess.square_file(own_pawn)
-        if own_pawn_file - 1 not in enemy_pawn_files and own_pawn_file not in enemy_pawn_files and own_pawn_file + 1 not in enemy_pawn_files:
-            num_passed_pawns += 1
-        else:
-            own_pawn_rank = chess.square_rank(own_pawn)
-            is_passed = True
-            for enemy_pawn in (enemy_pawn_files_to_pawns[own_pawn_file - 1] + enemy_pawn_files_to_pawns[own_pawn_file] +
-                               enemy_pawn_files_to_pawns[own_pawn_file + 1]):
-                if turn:  # White
-                    if chess.square_rank(enemy_pawn) > own_pawn_rank:
-                        is_passed = False
-                        break
-                else:  # Black
-                    if chess.square_rank(enemy_pawn) < own_pawn_rank:
-                        is_passed = False
-                        break
-            if is_passed:
-                num_passed_pawns += 1
-    return num_passed_pawns
+    own_pawns = board.pawns & board.occupied_co[turn]
+    enemy_pawns = board.pawns & board.occupied_co[not turn]
+    return sum(1 for own_pawn in chess.scan_forward(own_pawns)
+               if not chess_util.get_passed_pawn_span_mask(own_pawn, turn) & enemy_pawns)
 
 
 def is_passed_pawn(board, pawn):
     color = board.color_at(pawn)
-    # Squares where an enemy pawn would make pawn not passed
-    blocking_squares = chess.SquareSet()
-    # Check pawn file as well as adjacent files
-    for file_adjust in range(-1, 2):
-        adjusted_pawn_square = chess_util.add_file(pawn, file_adjust)
-        if adjusted_pawn_square:
-            blocking_squares = blocking_squares.union(chess.SquareSet.between(adjusted_pawn_square,
-                                                                              endgame.get_promotion_square(adjusted_pawn_square, color)))
-    return not any(board.piece_type_at(blocking_square) == chess.PAWN and board.color_at(blocking_square) != color
-                   for blocking_square in blocking_squares)
+    return not chess_util.get_passed_pawn_span_mask(pawn, color) & board.pawns & board.occupied_co[not color]
 
 # Pawns closer to the center files are worth more
 
@@ -379,12 +430,10 @@ def get_adjusted_pawn_rank(pawn, color):
     return chess_util.get_adjusted_rank(pawn, color) - 1
 
 
-def can_knight_catch_pawn(board, knight, pawn):
-    """Can the knight catch the pawn before it promotes?
-    This function is inexact because returning True does not guarantee the
-    knight can catch the pawn but False guarantees the pawn cannot be caught
+def can_knight_reach_promotion_square(knight, pawn, pawn_color, pawn_turn):
+    """Can a knight on knight get to the promotion square by the time the pawn promotes
+    Only depends on the squares, so it is looked up in KNIGHTS_CATCHING_PAWN
     """
-    pawn_color = board.color_at(pawn)
     color_rank_modifier = 1 if pawn_color else -1
     promotion_rank = 7 if pawn_color else 0
     promotion_file = chess.square_file(pawn)
@@ -392,7 +441,7 @@ def can_knight_catch_pawn(board, knight, pawn):
     knight_rank = chess.square_rank(knight)
     knight_file = chess.square_file(knight)
     file_modifier = 1 if knight_file < promotion_file else -1
-    if board.turn == pawn_color:
+    if pawn_turn:
         pawn_rank += color_rank_modifier
     # +2 because knight gets one time for initial position and one time after pawn promotes
     for _ in range(abs(promotion_rank - pawn_rank) + 2):
@@ -409,7 +458,21 @@ def can_knight_catch_pawn(board, knight, pawn):
     return False
 
 
-# Todo: Check when opponent has knight or bishop as well
+# Squares of the knights that can catch a pawn, indexed by the pawn's color, whether it is the pawn's turn, then pawn
+KNIGHTS_CATCHING_PAWN = [[[sum(chess.BB_SQUARES[knight] for knight in chess.SQUARES
+                               if can_knight_reach_promotion_square(knight, pawn, pawn_color, pawn_turn))
+                           for pawn in chess.SQUARES] for pawn_turn in [False, True]] for pawn_color in chess.COLORS[::-1]]
+
+
+def can_knight_catch_pawn(board, knight, pawn):
+    """Can the knight catch the pawn before it promotes?
+    This function is inexact because returning True does not guarantee the
+    knight can catch the pawn but False guarantees the pawn cannot be caught
+    """
+    pawn_color = board.color_at(pawn)
+    return bool(KNIGHTS_CATCHING_PAWN[pawn_color][board.turn == pawn_color][pawn] & chess.BB_SQUARES[knight])
+
+
 def is_pawn_promoting(board, pawn, color):
     promotion_rank = 7
     adjusted_rank = chess_util.get_adjusted_rank(pawn, color)
@@ -421,12 +484,11 @@ def is_pawn_promoting(board, pawn, color):
     if not chess_util.has_minor_or_major_pieces(board, not color):
         if endgame.is_pawn_outside_of_square(board, pawn):
             return True
-        path_to_promote = chess.SquareSet.between(pawn, promotion_square)
-        path_to_promote.add(promotion_square)
-        if all(board.is_attacked_by(color, square) for square in path_to_promote):
+        path_to_promote = chess_util.get_front_span_mask(pawn, color)
+        if all(board.is_attacked_by(color, square) for square in chess.scan_forward(path_to_promote)):
             return True
     if chess_util.has_only_knight_minor_or_major_pieces(board, not color) and \
-            all(not can_knight_catch_pawn(board, knight, pawn) for knight in board.pieces(chess.KNIGHT, not color)):
+            not KNIGHTS_CATCHING_PAWN[color][board.turn == color][pawn] & board.knights & board.occupied_co[not color]:
         return True
     return False
 
@@ -470,6 +532,8 @@ def get_rook_behind_pawn_bonus(board, pawn):
 
 
 def get_blockaded_pawn_penalty(board, pawn):
+    if get_pawn_entry(board).blocked & chess.BB_SQUARES[pawn]:
+        return BLOCKADED_PAWN_PENALTY
     color = board.color_at(pawn)
     if (color and board.piece_at(chess_util.add_rank(pawn, 1))) or \
             (not color and board.piece_at(chess_util.add_rank(pawn, -1))):
@@ -479,7 +543,9 @@ def get_blockaded_pawn_penalty(board, pawn):
 
 def get_pawn_value(board, turn, pawn, free_to_take=None):
     evaluation = 0
-    pawns = board.pieces(chess.PAWN, turn)
+    # Passed and isolated pawns only depend on the pawns, so they are looked up in the pawn hash
+    pawn_entry = get_pawn_entry(board)
+    pawn_mask = chess.BB_SQUARES[pawn]
     if pawn == free_to_take:
         evaluation += PIECE_TYPES_TO_VALUES[chess.PAWN] * \
             FREE_TO_TAKE_MODIFIER_PENALTY
@@ -487,7 +553,7 @@ def get_pawn_value(board, turn, pawn, free_to_take=None):
         evaluation += PIECE_TYPES_TO_VALUES[chess.PAWN]
         if pawn in CENTER:
             evaluation += PAWN_IN_CENTER_EVAL
-        if is_passed_pawn(board, pawn):
+        if pawn_entry.passed & pawn_mask:
             evaluation += get_eval(board, turn, PASSED_PAWN_EVAL)
             evaluation += get_pawn_promoting_bonus(board, pawn, turn)
             evaluation += get_eval(board, turn, PAWN_RANK_BONUS) * \
@@ -502,7 +568,8 @@ def get_pawn_value(board, turn, pawn, free_to_take=None):
             evaluation += get_eval(board, turn, PAWN_RANK_BONUS) * \
                 get_adjusted_pawn_rank(pawn, turn)
         evaluation += get_center_pawn_eval(pawn)
-        evaluation += get_isolated_pawn_penalty(pawns, pawn)
+        if pawn_entry.isolated & pawn_mask:
+            evaluation += ISOLATED_PAWN_PENALTY
         evaluation += get_pressure_penalty(board, pawn)
         if board.is_soft_pinned(pawn):
             evaluation += PAWN_SOFT_PINNED_PENALTY
@@ -528,6 +595,9 @@ def get_developed_eval(piece, color):
     return 0
 
 
+DEVELOPED_TABLES = get_tapered_tables(get_developed_eval)
+
+
 def get_knight_rank_eval(knight, turn):
     # ranges from 0 to 7
     rank_val = chess.square_rank(knight)
@@ -617,17 +687,15 @@ def get_knight_value(board, turn, knight, free_to_take=None, free_to_trade=None,
     else:
         evaluation += PIECE_TYPES_TO_VALUES[chess.KNIGHT]
         if not board.is_pinned(turn, knight):
-            evaluation += len(board.attacks(knight)) * ATTACK_VALUE
-            evaluation += get_eval(board, turn,
-                                   get_attacking_bonus(board, turn, knight))
+            evaluation += chess.popcount(board.attacks_mask(knight)) * ATTACK_VALUE
+            evaluation += get_attacking_bonus(board, turn, knight)
             evaluation += get_knight_attacking_bishop_bonus(board, knight)
         if not board.is_pinned(turn, knight) and board.is_soft_pinned(knight):
             evaluation += KNIGHT_SOFT_PINNED_PENALTY
         # I don't think this is needed anymore with attacking_bonus
         #value += get_eval(board, turn, get_knight_rank_eval(knight, turn))
         evaluation += get_defended_bonus(board, knight)
-        evaluation += get_eval(board, turn,
-                               get_developed_eval(knight, turn))
+        evaluation += get_table_eval(board, turn, DEVELOPED_TABLES, knight)
         evaluation += get_eval(board, turn,
                                get_kick_knight_penalty(board, knight))
         knight_fork_value = get_knight_fork_value(board, knight)
@@ -675,6 +743,9 @@ def get_long_diagonal_bonus(bishop):
     return LONG_DIAGONAL_BONUS if bishop in long_diagonals else 0
 
 
+LONG_DIAGONAL_TABLES = get_tapered_tables(lambda square, color: get_long_diagonal_bonus(square))
+
+
 def get_bishop_pair_value(bishops):
     if chess_util.on_light_squares(bishops) and chess_util.on_dark_squares(bishops):
         return BISHOP_PAIR_EVAL
@@ -713,18 +784,15 @@ def get_bishop_value(board, turn, bishop, free_to_take=None, free_to_trade=None,
     else:
         evaluation += PIECE_TYPES_TO_VALUES[chess.BISHOP]
         if not chess_util.is_bishop_pinned(board, bishop, turn):
-            evaluation += len(board.attacks(bishop)) * ATTACK_VALUE
-            evaluation += get_eval(board, turn,
-                                   get_attacking_bonus(board, turn, bishop))
-            evaluation += get_eval(board, turn,
-                                   get_long_diagonal_bonus(bishop))
+            evaluation += chess.popcount(board.attacks_mask(bishop)) * ATTACK_VALUE
+            evaluation += get_attacking_bonus(board, turn, bishop)
+            evaluation += get_table_eval(board, turn, LONG_DIAGONAL_TABLES, bishop)
             evaluation += get_bishop_attacking_knight_bonus(board, bishop)
         if not chess_util.is_bishop_pinned(board, bishop, turn) and board.is_soft_pinned(bishop):
             evaluation += BISHOP_SOFT_PINNED_PENALTY
         evaluation += get_defended_bonus(board, bishop)
         # evaluation += get_bishop_battery_bonus(board, bishop, turn)
-        evaluation += get_eval(board, turn,
-                               get_developed_eval(bishop, turn))
+        evaluation += get_table_eval(board, turn, DEVELOPED_TABLES, bishop)
         evaluation += get_undeveloped_bishop_blocked_penalty(board, bishop)
         evaluation += get_pressure_penalty(board, bishop)
         evaluation += get_piece_trapped_penalty(board, bishop)
@@ -751,9 +819,10 @@ def get_connected_rooks_value(board, rooks):
 
 
 def get_rook_on_open_file_bonus(board, rook):
-    if chess_util.is_open_file(board, rook):
+    pawn_entry = get_pawn_entry(board)
+    if pawn_entry.open_files & chess.BB_SQUARES[rook]:
         return ROOK_ON_OPEN_FILE_BONUS
-    if chess_util.is_half_open_file(board, rook):
+    if pawn_entry.half_open_files & chess.BB_SQUARES[rook]:
         return ROOK_ON_HALF_OPEN_FILE_BONUS
     return 0
 
@@ -771,14 +840,10 @@ def get_rook_too_aggressive_penalty(board, rook):
 
 def get_rook_aligned_with_bishop_penalty(board, rook):
     rook_color = board.color_at(rook)
-    for diagonal_square in chess_util.get_diagonals(rook):
-        if board.piece_type_at(diagonal_square) == chess.BISHOP and board.color_at(diagonal_square) != rook_color:
-            num_pieces_in_between = 0
-            for in_between_square in chess.SquareSet.between(rook, diagonal_square):
-                if board.piece_at(in_between_square):
-                    num_pieces_in_between += 1
-            if num_pieces_in_between == 1:
-                return ROOK_ALIGNED_PENALTY
+    bishops = board.bishops & board.occupied_co[not rook_color]
+    for bishop in chess.scan_forward(chess_util.get_diagonals_mask(rook) & bishops):
+        if chess.popcount(chess.between(rook, bishop) & board.occupied) == 1:
+            return ROOK_ALIGNED_PENALTY
     return 0
 
 
@@ -797,9 +862,8 @@ def get_rook_value(board, turn, rook, free_to_take=None, free_to_trade=None, fre
     else:
         evaluation += PIECE_TYPES_TO_VALUES[chess.ROOK]
         if not chess_util.is_rook_pinned(board, rook, turn):
-            evaluation += len(board.attacks(rook)) * ATTACK_VALUE
-            evaluation += get_eval(board, turn,
-                                   get_attacking_bonus(board, turn, rook, ROOK_SQUARES_TO_ATTACKING_BONUS, ROOK_RANKS_TO_ATTACKING_BONUS))
+            evaluation += chess.popcount(board.attacks_mask(rook)) * ATTACK_VALUE
+            evaluation += get_attacking_bonus(board, turn, rook, ROOK_ATTACKING_BONUS_MASKS)
         if not chess_util.is_rook_pinned(board, rook, turn) and board.is_soft_pinned(rook):
             evaluation += ROOK_SOFT_PINNED_PENALTY
         evaluation += get_defended_bonus(board, rook)
@@ -829,21 +893,19 @@ def get_queen_aligned_with_piece_type_value(board, queen_color, queen, square, p
     """
     value = 0
     if board.piece_type_at(square) == piece_type and board.color_at(square) != queen_color:
-        num_pieces_in_between = 0
-        for in_between_square in chess.SquareSet.between(queen, square):
-            if board.piece_at(in_between_square):
-                num_pieces_in_between += 1
-        if num_pieces_in_between == 1:
+        if chess.popcount(chess.between(queen, square) & board.occupied) == 1:
             value -= QUEEN_ALIGNED_PENALTY
     return value
 
 def get_queen_aligned_value(board, color):
     value = 0
     queens = board.pieces(chess.QUEEN, color)
+    opponent_pieces = board.occupied_co[not color]
     for queen in queens:
-        for diagonal_square in chess_util.get_diagonals(queen):
+        # Only squares with the opponent's bishops and rooks can have a value
+        for diagonal_square in chess.scan_forward(chess_util.get_diagonals_mask(queen) & board.bishops & opponent_pieces):
             value += get_queen_aligned_with_piece_type_value(board, color, queen, diagonal_square, chess.BISHOP)
-        for file_or_rank_square in chess_util.get_file_and_rank_squares(queen):
+        for file_or_rank_square in chess.scan_forward(chess_util.get_file_and_rank_mask(queen) & board.rooks & opponent_pieces):
             value += get_queen_aligned_with_piece_type_value(board, color, queen, file_or_rank_square, chess.ROOK)
     return value
 
@@ -865,7 +927,7 @@ def get_queen_value(board, turn, queen, free_to_take=None, free_to_trade=None, f
     else:
         evaluation += PIECE_TYPES_TO_VALUES[chess.QUEEN]
         if not board.is_pinned(turn, queen):
-            evaluation += len(board.attacks(queen)) * QUEEN_ATTACK_VALUE
+            evaluation += chess.popcount(board.attacks_mask(queen)) * QUEEN_ATTACK_VALUE
         if not board.is_pinned(turn, queen) and board.is_soft_pinned(queen):
             evaluation += QUEEN_SOFT_PINNED_PENALTY
         evaluation += get_defended_bonus(board, queen)
@@ -941,16 +1003,15 @@ def get_open_file_to_king_penalty(board: Board, color: chess.Color,
     if chess_util.get_num_major_pieces(board, not color) > 1 and not board.has_castling_rights(color):
         if king is None:
             king = board.king(color)
-        if chess_util.is_open_file(board, king):
+        pawn_entry = get_pawn_entry(board)
+        if pawn_entry.open_files & chess.BB_SQUARES[king]:
             penalty += OPEN_FILE_TO_KING_PENALTY
-        if chess_util.is_half_open_file(board, king):
+        if pawn_entry.half_open_files & chess.BB_SQUARES[king]:
             penalty += HALF_OPEN_FILE_TO_KING_PENALTY
-        for adjacent_file in chess_util.get_adjacent_files(king):
-            adjacent_square = chess.square(adjacent_file, 0)
-            if chess_util.is_open_file(board, adjacent_square):
-                penalty += OPEN_ADJACENT_FILE_TO_KING_PENALTY
-            if chess_util.is_half_open_file(board, adjacent_square):
-                penalty += HALF_OPEN_ADJACENT_FILE_TO_KING_PENALTY
+        # One square of each adjacent file
+        adjacent_files = chess_util.get_adjacent_files_mask(king) & chess.BB_RANK_1
+        penalty += chess.popcount(pawn_entry.open_files & adjacent_files) * OPEN_ADJACENT_FILE_TO_KING_PENALTY
+        penalty += chess.popcount(pawn_entry.half_open_files & adjacent_files) * HALF_OPEN_ADJACENT_FILE_TO_KING_PENALTY
     return penalty
 
 
@@ -967,39 +1028,76 @@ def get_open_rank_to_king_penalty2(board, color):
     return penalty
 
 
+def get_open_line_length(king, ray, pawns, is_rank):
+    """Returns how many squares of ray from the king count towards its open line penalty, out of MAX_OPEN_LINE_DISTANCE
+    The line is open up to the first pawn. A rank ending at the edge of the board counts one less square.
+    """
+    blockers = ray & pawns
+    if blockers:
+        # Rays going up the board start from their lowest square
+        nearest_pawn = chess.lsb(blockers) if ray > chess.BB_SQUARES[king] else chess.msb(blockers)
+        return chess.square_distance(king, nearest_pawn) - 1
+    length = chess.popcount(ray)
+    if is_rank and length < MAX_OPEN_LINE_DISTANCE:
+        return max(0, length - 1)
+    return length
+
+
+def get_open_line_lengths(board: Board, king: chess.Square) -> Tuple[dict, dict]:
+    """Returns the open line lengths of the ranks and diagonals from a king on king, keyed by direction
+    They only depend on the pawns, so they are kept in the pawn entry for each king square looked up
+    """
+    pawn_entry = get_pawn_entry(board)
+    open_line_lengths = pawn_entry.open_line_lengths.get(king)
+    if open_line_lengths is None:
+        pawns = board.pawns
+        open_line_lengths = ({file_direction: get_open_line_length(king, OPEN_RANK_RAYS[file_direction][king], pawns, True)
+                              for file_direction in KING_RANK_DIRECTIONS},
+                             {direction: get_open_line_length(king, OPEN_DIAGONAL_RAYS[direction][king], pawns, False)
+                              for direction in KING_DIAGONAL_DIRECTIONS})
+        pawn_entry.open_line_lengths[king] = open_line_lengths
+    return open_line_lengths
+
+
+def is_open_line_guarded(board: Board, color: chess.Color, piece_type: chess.PieceType,
+                         king: chess.Square, square: chess.Square) -> bool:
+    """Is the square next to the king on an open line held by one of color's rooks or bishops, given by piece_type
+    """
+    pieces = board.pieces_mask(piece_type, color)
+    if pieces & chess.BB_SQUARES[square]:
+        return True
+    if board.occupied & chess.BB_SQUARES[square]:
+        return False
+    # Otherwise the piece has to be further along the line, seeing the king through the empty square.
+    # A castling square checked for the king can hold the piece itself, which doesn't count
+    if piece_type == chess.ROOK:
+        line_attacks = chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & board.occupied]
+    else:
+        line_attacks = chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & board.occupied]
+    return bool(pieces & line_attacks & chess.BB_RAYS[king][square] & ~chess.BB_SQUARES[king])
+
+
 def get_open_ranks_to_king_penalty(board: Board, king_color: chess.Color) -> float:
     """Checks both directions of king rank towards king
     """
     penalty = 0
-    file_directions = [-1, 1]
-    for file_direction in file_directions:
+    for file_direction in KING_RANK_DIRECTIONS:
         penalty += get_open_rank_to_king_penalty(board, king_color, file_direction)
     return penalty
 
 
 def get_open_rank_to_king_penalty(board: Board, king_color: chess.Color, file_direction: int) -> float:
-    penalty_modifier = len(board.pieces(chess.QUEEN, not king_color))
-    penalty_modifier += 1 if board.pieces(chess.ROOK, not king_color) else 0
+    opponent_pieces = board.occupied_co[not king_color]
+    penalty_modifier = chess.popcount(board.queens & opponent_pieces)
+    penalty_modifier += 1 if board.rooks & opponent_pieces else 0
     penalty = OPEN_RANK_TO_KING_PENALTY * penalty_modifier
     if penalty != 0:
-        max_distance = 3
-
-        for i in range(1, max_distance + 1):
-            king = board.king(king_color)
-            square = chess_util.add_file(king, i * file_direction)
-
-            if square is None:
-                return max(0, i - 2) * penalty / max_distance
-
-            if board.piece_type_at(square) == chess.PAWN:
-                return (i - 1) * penalty / max_distance
-
-            if i == 1:
-                for rook in board.pieces(chess.ROOK, king_color):
-                    rook_attacks = board.attacks(rook)
-                    if rook == square or (square in rook_attacks and king in rook_attacks):
-                        return 0
-
+        king = board.king(king_color)
+        length = get_open_line_lengths(board, king)[0][file_direction]
+        # A length above 0 means the square next to the king is on the board without a pawn
+        if length == 0 or is_open_line_guarded(board, king_color, chess.ROOK, king, king + file_direction):
+            return 0
+        return length * penalty / MAX_OPEN_LINE_DISTANCE
     return penalty
 
 
@@ -1008,41 +1106,31 @@ def get_open_diagonals_to_king_penalty(board: Board, king_color: chess.Color,
     """Checks all open diagonals around the king
     """
     penalty = 0
-    directions = {(1,1), (1,-1), (-1,1), (-1,-1)}
-    for direction in directions:
+    for direction in KING_DIAGONAL_DIRECTIONS:
         penalty += get_open_diagonal_to_king_penalty(board, king_color, direction, king=king)
     return penalty
 
 
-# Todo: Update
 def get_open_diagonal_to_king_penalty(board: Board, king_color: chess.Color, direction: Tuple[int, int],
                                       king: chess.Square=None) -> float:
     """Checks specific open diagonal
     Open diagonals towards the king put the king at risk
     """
-    penalty_modifier = len(board.pieces(chess.QUEEN, not king_color))
+    opponent_pieces = board.occupied_co[not king_color]
+    penalty_modifier = chess.popcount(board.queens & opponent_pieces)
     if king is None:
         king = board.king(king_color)
-    on_same_color = chess_util.on_light_squares if chess_util.is_piece_on_light_square(king) \
-        else chess_util.on_dark_squares
-    penalty_modifier += 1 if on_same_color(board.pieces(chess.BISHOP, not king_color)) else 0
+    king_square_color = chess.BB_LIGHT_SQUARES if chess.BB_SQUARES[king] & chess.BB_LIGHT_SQUARES \
+        else chess.BB_DARK_SQUARES
+    penalty_modifier += 1 if board.bishops & opponent_pieces & king_square_color else 0
     penalty = OPEN_DIAGONAL_TO_KING_PENALTY * penalty_modifier
     if penalty != 0:
-        max_distance = 3
+        length = get_open_line_lengths(board, king)[1][direction]
         rank_delta, file_delta = direction
-
-        for i in range(1, max_distance + 1):
-            square = chess_util.add_rank_and_file(king, i * rank_delta, i * file_delta)
-
-            if square is None or board.piece_type_at(square) == chess.PAWN:
-                return (i - 1) * penalty / max_distance
-
-            if i == 1:
-                for bishop in board.pieces(chess.BISHOP, king_color):
-                    bishop_attacks = board.attacks(bishop)
-                    if bishop == square or (square in bishop_attacks and king in bishop_attacks):
-                        return 0
-
+        if length == 0 or is_open_line_guarded(board, king_color, chess.BISHOP, king,
+                                               king + 8 * rank_delta + file_delta):
+            return 0
+        return length * penalty / MAX_OPEN_LINE_DISTANCE
     return penalty
 
 
@@ -1069,7 +1157,7 @@ def get_king_safety(board, color):
     # percentage of adjacent squares that are attacked
     percentage_attacked_adjacent = get_percent_attacked_adjacent(board, color)
     attacking_adjacent_value = -percentage_attacked_adjacent * \
-        get_eval(board, color, ATTACKING_ADJACENT_EVAL)
+        get_tapered_eval(board, color, *ATTACKING_ADJACENT_EVAL)
     evaluation += attacking_adjacent_value
     #print("attacking adjacent =", attacking_adjacent_value)
     # TODO: Delete?
@@ -1135,10 +1223,9 @@ def get_num_checks(board, color):
 
 # returns the percentage of squares adjacent to color's king that are attacked by not color
 def get_percent_attacked_adjacent(board, color):
-    adjacent_squares = chess_util.get_adjacent_squares(board.king(color))
-    num_attacked_squares = sum(
-        1 for adjacent_square in adjacent_squares if board.is_attacked_by(not color, adjacent_square))
-    return 1.0 * num_attacked_squares / len(adjacent_squares)
+    king = board.king(color)
+    num_attacked_squares = chess.popcount(chess.BB_KING_ATTACKS[king] & board.get_attack_map().pseudo_attacks[not color])
+    return 1.0 * num_attacked_squares / KING_ADJACENT_COUNTS[king]
 
 
 def get_castling_eval(board, turn):
@@ -5,6 +5,7 @@ from board import Board
 import position_evaluator
 import move_filter
 from move_position_evaluator import MovePositionEvaluator
+from eval_cache import EvalCache
 import endgame
 import search_extension_util as util
 
@@ -102,10 +103,10 @@ def is_hanging_piece_capture(board: Board, move: chess.Move) -> bool:
 
 
 def is_capture(board: Board, move: chess.Move) -> bool:
-    """Is `move` a fair trade, taking a hanging piece, or taking a piece of higher value?
+    """Does `move` break even or win material once the exchange on the square is played out?
+    SEE doesn't see pieces pinned to a queen, so a hanging piece capture still counts.
     """
-    return board.is_capture(move) and (is_equal_value_trade(board, move) or
-                                       is_higher_value_trade(board, move) or 
+    return board.is_capture(move) and (chess_util.see(board, move) >= 0 or
                                        is_hanging_piece_capture(board, move))
 
 
@@ -217,13 +218,22 @@ def is_past_max_loss(board_turn: chess.Color, evaluating_turn: chess.Color, star
 class SearchExtension:
 
     def __init__(self, board: Board, turn: chess.Color, return_best: bool=False,
-               max_loss: int=200, fens_to_evals={}):
+               max_loss: int=200, eval_cache: EvalCache=None, limits=None, quiescence: bool=False,
+               move_position_evaluator: MovePositionEvaluator=None):
+        """eval_cache can be shared between searches with the same limits. Otherwise, a small one is made.
+        move_position_evaluator, if given, must be evaluating board for turn and is updated as moves
+        are pushed and undone, so the search starts from its per piece scores instead of rescoring the board
+        """
         self.board = board
         self.turn = turn
         self.return_best = return_best
         self.max_loss = max_loss
-        self.fens_to_evals = fens_to_evals
-        self.move_position_evaluator = None
+        self.eval_cache = eval_cache if eval_cache is not None else EvalCache()
+        # search_limits.SearchLimits checked at every node, if any
+        self.limits = limits
+        # Search within the caller's window, standing pat on the evaluation when not in check
+        self.quiescence = quiescence
+        self.move_position_evaluator = move_position_evaluator
         self.start_evaluation = None
 
     def minimax(self, maximizing: bool,
@@ -241,20 +251,22 @@ class SearchExtension:
         #else:
         #    seen_fens.add(board.fen())
     
+        if self.limits is not None:
+            self.limits.check()
+
         # Make move and evaluate
         self.board.push(move)
-        evaluation = None
-        position_string = self.board.get_position_string()
-        if self.fens_to_evals.get(position_string) is not None:
-            evaluation = self.fens_to_evals.get(position_string)
-        else:
+        evaluation = self.eval_cache.get(self.board, self.turn)
+        if evaluation is None:
             evaluation = self.search_helper(
                                 num_checks_remaining, num_pawn_promotion_remaining, num_captures_remaining,
                                 num_attacks_and_defends_remaining, num_check_forks_remaining,
                                 num_moves_remaining, old_evaluation)
-            self.fens_to_evals[position_string] = evaluation
+            self.eval_cache.store(self.board, self.turn, evaluation)
             self.move_position_evaluator.undo_move()
         self.board.pop()
+        # Mates are scored from the position after move, one ply further than from this one
+        evaluation = util.get_root_mate_eval(evaluation[0], 1), evaluation[1]
         
         if (self.return_best and (min_or_max_eval is None or not min_or_max_eval[1])) or \
             (maximizing and (min_or_max_eval is None or evaluation[0] > min_or_max_eval[0])) or \
@@ -274,13 +286,14 @@ class SearchExtension:
         min_or_max_eval = None
         if self.move_position_evaluator is None:
             self.move_position_evaluator = MovePositionEvaluator(self.board, self.turn)
+        # The evaluator is already up to date at the start of the search
+        if self.start_evaluation is None:
             min_or_max_eval = self.move_position_evaluator.get_evaluation(), []
+            self.start_evaluation = min_or_max_eval[0]
         else:
             min_or_max_eval = self.move_position_evaluator.evaluate_after_move(), []
         # Todo: Check
         # min_or_max_eval = position_evaluator.evaluate_position_after_capture(board, turn, old_evaluation), []
-        if self.start_evaluation is None:
-            self.start_evaluation = min_or_max_eval[0]
     
         if is_past_max_loss(self.board.turn, self.turn, self.start_evaluation, min_or_max_eval[0], self.max_loss):
             num_moves_remaining = 1
@@ -361,11 +374,124 @@ class SearchExtension:
 
         return min_or_max_eval
 
+    def quiescence_minimax(self, move: chess.Move, alpha: float, beta: float,
+                           num_checks_remaining: int, num_pawn_promotion_remaining: int,
+                           num_captures_remaining: int, num_attacks_and_defends_remaining: int,
+                           num_check_forks_remaining: int, num_moves_remaining: int) \
+            -> Tuple[int, List[chess.Move]]:
+        """Returns the evaluation and the best moves after `move`
+        """
+        if self.limits is not None:
+            self.limits.check()
+
+        # Mates are scored from the position after move, one ply further than from this one
+        alpha, beta = util.get_position_mate_eval(alpha, 1), util.get_position_mate_eval(beta, 1)
+        self.board.push(move)
+        evaluation = self.eval_cache.get(self.board, self.turn)
+        if evaluation is None:
+            evaluation = self.quiescence_helper(
+                alpha, beta, num_checks_remaining, num_pawn_promotion_remaining, num_captures_remaining,
+                num_attacks_and_defends_remaining, num_check_forks_remaining, num_moves_remaining)
+            # Evaluations outside the window are only bounds
+            if alpha < evaluation[0] < beta:
+                self.eval_cache.store(self.board, self.turn, evaluation)
+            self.move_position_evaluator.undo_move()
+        self.board.pop()
+        return util.get_root_mate_eval(evaluation[0], 1), evaluation[1]
+
+    def quiescence_helper(self, alpha: float, beta: float, num_checks_remaining: int = 1,
+                          num_pawn_promotion_remaining: int = 1, num_captures_remaining: int = 8,
+                          num_attacks_and_defends_remaining: int = 0, num_check_forks_remaining: int = 2,
+                          num_moves_remaining: int = 20) \
+            -> Tuple[int, List[chess.Move]]:
+        """Returns the evaluation and the list of best moves that were calculated
+        The side to move can stand pat on the evaluation unless it is in check.
+        The search stops as soon as the evaluation is outside of (alpha, beta).
+        """
+        if self.move_position_evaluator is None:
+            self.move_position_evaluator = MovePositionEvaluator(self.board, self.turn)
+        if self.start_evaluation is None:
+            stand_pat = self.move_position_evaluator.get_evaluation()
+            self.start_evaluation = stand_pat
+        else:
+            stand_pat = self.move_position_evaluator.evaluate_after_move()
+
+        if is_past_max_loss(self.board.turn, self.turn, self.start_evaluation, stand_pat, self.max_loss):
+            num_moves_remaining = 1
+
+        if num_moves_remaining == 0 or \
+            (num_checks_remaining <= 0 and num_pawn_promotion_remaining <= 0 and \
+            num_captures_remaining <= 0 and num_attacks_and_defends_remaining <= 0) \
+            or self.board.is_checkmate() or self.board.is_stalemate() or self.board.is_insufficient_material():
+            return stand_pat, []
+
+        maximizing = self.board.turn == self.turn
+        best_eval = None
+        if not self.board.is_check():
+            best_eval = stand_pat, []
+            if maximizing:
+                if stand_pat >= beta:
+                    return best_eval
+                alpha = max(alpha, stand_pat)
+            else:
+                if stand_pat <= alpha:
+                    return best_eval
+                beta = min(beta, stand_pat)
+
+        # (move, remaining counts) for each move to search
+        moves_and_counts = []
+        checkmating_move = next((move for move in self.board.legal_moves if self.board.gives_checkmate(move)), None)
+        if checkmating_move is not None:
+            moves_and_counts.append((checkmating_move, (
+                num_checks_remaining, num_pawn_promotion_remaining, num_captures_remaining,
+                num_attacks_and_defends_remaining, num_check_forks_remaining)))
+        elif self.board.is_check():
+            for move in self.board.legal_moves:
+                moves_and_counts.append((move, (
+                    num_checks_remaining, num_pawn_promotion_remaining, num_captures_remaining,
+                    num_attacks_and_defends_remaining, num_check_forks_remaining-1)))
+        else:
+            for move in self.board.legal_moves:
+                if num_checks_remaining > 0 and self.board.gives_check(move):
+                    counts = (num_checks_remaining-1, num_pawn_promotion_remaining, num_captures_remaining,
+                              num_attacks_and_defends_remaining, num_check_forks_remaining-1)
+                elif num_captures_remaining > 0 and is_capture(self.board, move):
+                    counts = (num_checks_remaining-1, num_pawn_promotion_remaining, num_captures_remaining-1,
+                              num_attacks_and_defends_remaining, num_check_forks_remaining-1)
+                elif num_pawn_promotion_remaining > 0 and is_pawn_promotion_move(move):
+                    counts = (num_checks_remaining, num_pawn_promotion_remaining-1, num_captures_remaining,
+                              num_attacks_and_defends_remaining, num_check_forks_remaining-1)
+                elif num_attacks_and_defends_remaining > 0 and is_attack_or_defend(self.board, move):
+                    counts = (num_checks_remaining, num_pawn_promotion_remaining, num_captures_remaining,
+                              num_attacks_and_defends_remaining-1, num_check_forks_remaining-1)
+                elif num_check_forks_remaining > 0 and move_filter.is_check_fork(self.board, move):
+                    counts = (num_checks_remaining, num_pawn_promotion_remaining, num_captures_remaining,
+                              num_attacks_and_defends_remaining, num_check_forks_remaining-1)
+                else:
+                    continue
+                moves_and_counts.append((move, counts))
+
+        for move, counts in moves_and_counts:
+            evaluation = self.quiescence_minimax(move, alpha, beta, *counts, num_moves_remaining-1)
+            if (self.return_best and (best_eval is None or not best_eval[1])) or best_eval is None or \
+                (maximizing and evaluation[0] > best_eval[0]) or \
+                (not maximizing and evaluation[0] < best_eval[0]):
+                best_eval = evaluation[0], [move] + evaluation[1]
+            if maximizing:
+                alpha = max(alpha, best_eval[0])
+            else:
+                beta = min(beta, best_eval[0])
+            if alpha >= beta:
+                break
+
+        return best_eval
+
     def search(self, num_checks_remaining: int=0,
                num_pawn_promotion_remaining: int=1, num_captures_remaining: int=8,
                num_attacks_and_defends_remaining: int=0, num_check_forks_remaining: int = 2,
-               forced_mate_depth: int=2):
+               forced_mate_depth: int=2, alpha: float=MIN_EVAL, beta: float=MAX_EVAL):
         """Returns the evaluation and the list of best moves that were calculated
+        In quiescence mode, evaluations outside of (alpha, beta) are only bounds
         """
         # TODO: Delete
         #global seen_fens, repeated_fen_count
@@ -383,6 +509,10 @@ class SearchExtension:
         if forced_mate_eval[0] != 0:
             return forced_mate_eval
 
+        if self.quiescence:
+            return self.quiescence_helper(alpha, beta, num_checks_remaining, num_pawn_promotion_remaining,
+                                          num_captures_remaining, num_attacks_and_defends_remaining,
+                                          num_check_forks_remaining)
         result = self.search_helper(num_checks_remaining, num_pawn_promotion_remaining, num_captures_remaining,
                                     num_attacks_and_defends_remaining, num_check_forks_remaining)
         #print("fens repeated =", repeated_fen_count)
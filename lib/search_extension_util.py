@@ -1,20 +1,21 @@
 import chess
 from typing import List
 from board import Board
-from constants import MAX_EVAL, MIN_EVAL
+from constants import MAX_EVAL, MIN_EVAL, MAX_MATING_EVAL, MIN_MATING_EVAL
 
 """Utility for search_extension.py and position_evaluator.py
 """
 
 def search_getting_mated_helper(board: Board, turn: chess.Color, num_checks_left: int=2,
-                                num_checks_made: int=0) -> (float, List[chess.Move]):
+                                ply: int=0) -> (float, List[chess.Move]):
     """Check to see if player is getting mated
+    Mates are scored by how many plies away they are
     """
     if board.is_checkmate():
         if board.turn == turn:
-            return MIN_EVAL + num_checks_made, []
+            return MIN_EVAL + ply, []
         else:
-            return MAX_EVAL - num_checks_made, []
+            return MAX_EVAL - ply, []
     if num_checks_left == 0:
         return 0, []
     # Search all possible moves when in check
@@ -23,7 +24,7 @@ def search_getting_mated_helper(board: Board, turn: chess.Color, num_checks_left
         for move in board.legal_moves:
             board.push(move)
             search_evaluation = search_getting_mated_helper(
-                board, turn, num_checks_left, num_checks_made)
+                board, turn, num_checks_left, ply+1)
             board.pop()
             # At least one line does not lead to forced mate
             if search_evaluation[0] == 0:
@@ -41,7 +42,7 @@ def search_getting_mated_helper(board: Board, turn: chess.Color, num_checks_left
             board.push(move)
             if board.is_check():
                 evaluation = search_getting_mated_helper(
-                    board, turn, num_checks_left-1, num_checks_made+1)
+                    board, turn, num_checks_left-1, ply+1)
             board.pop()
             if evaluation[0] != 0:
                 return evaluation[0], [move] + evaluation[1]
@@ -56,3 +57,24 @@ def search_getting_mated(board: Board, turn: chess.Color, forced_mate_depth: int
             return forced_mate_evaluation
     return 0, []
 
+
+def get_root_mate_eval(evaluation: float, ply: int) -> float:
+    """Converts a mate evaluation for the position `ply` plies from the root
+    into one for the root, where the mate is `ply` plies further away
+    """
+    if evaluation >= MAX_MATING_EVAL:
+        return evaluation - ply
+    if evaluation <= MIN_MATING_EVAL:
+        return evaluation + ply
+    return evaluation
+
+
+def get_position_mate_eval(evaluation: float, ply: int) -> float:
+    """Converts a mate evaluation for the root
+    into one for the position `ply` plies from the root
+    """
+    if evaluation >= MAX_MATING_EVAL:
+        return evaluation + ply
+    if evaluation <= MIN_MATING_EVAL:
+        return evaluation - ply
+    return evaluation
@@ -0,0 +1,51 @@
+"""Limits on how long a search can run
+The search calls check() at every node and stops by raising SearchAborted
+"""
+import threading
+import time
+
+# How many nodes are searched between checks of the clock and the stop flag
+POLL_INTERVAL = 16
+
+
+class SearchAborted(Exception):
+    """Raised by SearchLimits.check when the search has to stop
+    """
+    pass
+
+
+class SearchLimits:
+
+    def __init__(self, max_think_time: float=None, max_nodes: int=None, stop_event: threading.Event=None):
+        """max_think_time is in seconds. No limit is set for values that are None.
+        stop_event can be set from another thread to stop the search.
+        """
+        self.set_max_think_time(max_think_time)
+        self.max_nodes = max_nodes
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.node_count = 0
+
+    def set_max_think_time(self, max_think_time: float) -> None:
+        """Restarts the clock with a new think time, such as when a ponder move is played
+        """
+        self.max_think_time = max_think_time
+        self.start_ts = time.time()
+        self.deadline = self.start_ts + max_think_time if max_think_time else None
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def get_elapsed_time(self) -> float:
+        return time.time() - self.start_ts
+
+    def is_past_limit(self) -> bool:
+        return self.stop_event.is_set() or \
+            (self.max_nodes is not None and self.node_count >= self.max_nodes) or \
+            (self.deadline is not None and time.time() >= self.deadline)
+
+    def check(self) -> None:
+        """Counts a node and raises SearchAborted if a limit has been reached
+        """
+        self.node_count += 1
+        if self.node_count % POLL_INTERVAL == 0 and self.is_past_limit():
+            raise SearchAborted
@@ -0,0 +1,58 @@
+import unittest
+import chess
+from board import Board
+
+
+class TestAttackMap(unittest.TestCase):
+
+	def test_attacks(self):
+		board = Board("4k3/8/8/3n4/8/8/3R4/4K3 w - - 0 1")
+		attack_map = board.get_attack_map()
+		self.assertEqual(attack_map.attacks[chess.WHITE][chess.ROOK], int(board.attacks(chess.D2)))
+		self.assertTrue(attack_map.is_attacked(chess.WHITE, chess.D5))
+		self.assertEqual(attack_map.get_hanging_pieces(chess.BLACK), chess.BB_D5)
+		self.assertEqual(attack_map.get_hanging_pieces(chess.WHITE), chess.BB_EMPTY)
+		# Kings can't be captured
+		self.assertFalse(attack_map.is_attacked(chess.BLACK, chess.E1))
+
+	def test_pinned(self):
+		# The knight on d2 is pinned to its king by the bishop on b4
+		board = Board("4k3/8/8/8/1b6/8/3N4/4K3 w - - 0 1")
+		attack_map = board.get_attack_map()
+		self.assertEqual(attack_map.pinned[chess.WHITE], chess.BB_D2)
+		self.assertEqual(attack_map.attacks[chess.WHITE][chess.KNIGHT], chess.BB_EMPTY)
+		self.assertEqual(attack_map.get_attackers_mask(chess.WHITE, chess.B3), chess.BB_EMPTY)
+		self.assertTrue(attack_map.pseudo_attacks[chess.WHITE] & chess.BB_B3)
+		# A bishop pinned along a diagonal can still take the pinner
+		board = Board("4k3/8/8/8/1b6/8/3B4/4K3 w - - 0 1")
+		attack_map = board.get_attack_map()
+		self.assertEqual(attack_map.get_attackers_mask(chess.WHITE, chess.B4), chess.BB_D2)
+		self.assertTrue(attack_map.can_capture(chess.D2, chess.B4))
+
+	def test_xray_attacks(self):
+		# The queen behind the rook backs it up on d5 and d6, and the rook backs up the queen on d1
+		board = Board("4k3/8/3p4/8/3R4/8/3Q4/4K3 w - - 0 1")
+		xray_attacks = board.get_attack_map().xray_attacks[chess.WHITE]
+		self.assertEqual(xray_attacks & chess.BB_FILE_D, chess.BB_D1 | chess.BB_D5 | chess.BB_D6)
+		# Knights don't form batteries
+		board = Board("4k3/8/3p4/8/3N4/8/3Q4/4K3 w - - 0 1")
+		self.assertEqual(board.get_attack_map().xray_attacks[chess.WHITE], chess.BB_EMPTY)
+
+	def test_attacked_by_lesser(self):
+		board = Board("4k3/8/2p5/3N4/8/8/3R4/4K3 b - - 0 1")
+		attack_map = board.get_attack_map()
+		self.assertEqual(attack_map.attacked_by_lesser[chess.WHITE], chess.BB_D5)
+		self.assertEqual(attack_map.attacked_by_lesser[chess.BLACK], chess.BB_EMPTY)
+
+	def test_reset_on_push(self):
+		board = Board("4k3/8/8/3n4/8/8/3R4/4K3 w - - 0 1")
+		attack_map = board.get_attack_map()
+		self.assertIs(board.get_attack_map(), attack_map)
+		board.push(chess.Move.from_uci("d2d5"))
+		self.assertEqual(board.get_attack_map().get_hanging_pieces(chess.BLACK), chess.BB_EMPTY)
+		board.pop()
+		self.assertEqual(board.get_attack_map().get_hanging_pieces(chess.BLACK), chess.BB_D5)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 import chess
+import chess.polyglot
 from board import Board
 
 
@@ -25,6 +26,51 @@ class TestBoard(unittest.TestCase):
 		self.assertNotEqual(board._squares_to_attackers_and_defenders,
 						board_copy._squares_to_attackers_and_defenders)
 
+	def test_get_zh(self):
+		board = Board("r3k2r/1P3ppp/8/3pP3/8/8/PPP2PPP/R3K2R w KQkq d6 0 12")
+		self.assertEqual(board.get_zh(), chess.polyglot.zobrist_hash(board))
+		# En passant, promotion with capture, castling, and a null move
+		moves = ["e5d6", "e8g8", "b7a8q", "f8a8", "e1g1", "0000", "a2a4"]
+		for move in moves:
+			board.push(chess.Move.from_uci(move))
+			self.assertEqual(board.get_zh(), chess.polyglot.zobrist_hash(board))
+
+		board_copy = board.copy()
+		self.assertEqual(board_copy.get_zh(), board.get_zh())
+
+		for _ in moves:
+			board.pop()
+			self.assertEqual(board.get_zh(), chess.polyglot.zobrist_hash(board))
+
+		board.set_fen(chess.STARTING_FEN)
+		self.assertEqual(board.get_zh(), chess.polyglot.zobrist_hash(board))
+
+	def test_get_pawn_zh(self):
+		board = Board("r3k2r/1P3ppp/8/3pP3/8/8/PPP2PPP/R3K2R w KQkq d6 0 12")
+		pawns_only = Board("4k3/1P3ppp/8/3pP3/8/8/PPP2PPP/4K3 w - - 0 1")
+		self.assertEqual(board.get_pawn_zh(), pawns_only.get_pawn_zh())
+		pawn_zh = board.get_pawn_zh()
+		# Piece moves don't change the pawn hash, pawn moves and captures do
+		board.push(chess.Move.from_uci("e1g1"))
+		self.assertEqual(board.get_pawn_zh(), pawn_zh)
+		board.push(chess.Move.from_uci("d5d4"))
+		self.assertNotEqual(board.get_pawn_zh(), pawn_zh)
+		board.push(chess.Move.from_uci("b7a8q"))
+		self.assertEqual(board.get_pawn_zh(), Board(board.fen()).get_pawn_zh())
+		for _ in range(3):
+			board.pop()
+		self.assertEqual(board.get_pawn_zh(), pawn_zh)
+
+	def test_is_repetition(self):
+		board = Board()
+		board.get_zh()
+		for move in ["g1f3", "g8f6", "f3g1", "f6g8", "g1f3", "g8f6", "f3g1"]:
+			board.push(chess.Move.from_uci(move))
+			self.assertFalse(board.is_repetition())
+		board.push(chess.Move.from_uci("f6g8"))
+		self.assertTrue(board.is_repetition())
+		self.assertTrue(board.is_repetition(count=2))
+
 	def test_get_position_string(self):
 		fen = "r3kbnr/pN1bq1p1/2p2p2/3p3p/P2Pn3/2P2N2/1P2PPPP/R1BQKB1R b KQkq - 0 15"
 		position_string = "r3kbnr/pN1bq1p1/2p2p2/3p3p/P2Pn3/2P2N2/1P2PPPP/R1BQKB1R b KQkq -"
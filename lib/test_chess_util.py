@@ -44,6 +44,34 @@ class TestChessUtil(unittest.TestCase):
 		self.assertEqual(chess_util.get_adjacent_files(chess.B1), [0, 2])
 		self.assertEqual(chess_util.get_adjacent_files(chess.H8), [6])
 
+	def test_get_adjacent_files_mask(self):
+		self.assertEqual(chess_util.get_adjacent_files_mask(chess.A1), chess.BB_FILE_B)
+		self.assertEqual(chess_util.get_adjacent_files_mask(chess.B1), chess.BB_FILE_A | chess.BB_FILE_C)
+		self.assertEqual(chess_util.get_adjacent_files_mask(chess.H8), chess.BB_FILE_G)
+
+	def test_geometry_masks(self):
+		# Built square by square from coordinates rather than from the tables
+		for square in chess.SQUARES:
+			file, rank = chess.square_file(square), chess.square_rank(square)
+			diagonals = chess.SquareSet([x for x in chess.SQUARES
+				if abs(chess.square_file(x) - file) == abs(chess.square_rank(x) - rank)])
+			file_squares = chess.SquareSet([x for x in chess.SQUARES if chess.square_file(x) == file])
+			file_and_rank_squares = chess.SquareSet([x for x in chess.SQUARES
+				if chess.square_file(x) == file or chess.square_rank(x) == rank])
+			self.assertEqual(chess_util.get_diagonals_mask(square), int(diagonals))
+			self.assertEqual(chess_util.get_file_mask(square), int(file_squares))
+			self.assertEqual(chess_util.get_file_and_rank_mask(square), int(file_and_rank_squares))
+			self.assertEqual(chess_util.get_adjacent_squares(square),
+				{x for x in chess.SQUARES if chess.square_distance(x, square) == 1})
+		self.assertEqual(chess_util.between_inclusive_mask(chess.C5, chess.F8),
+			int(chess.SquareSet([chess.C5, chess.D6, chess.E7, chess.F8])))
+		self.assertEqual(chess_util.between_inclusive_mask(chess.A1, chess.D1),
+			int(chess.SquareSet([chess.A1, chess.B1, chess.C1, chess.D1])))
+		self.assertEqual(chess_util.start_ray_mask(chess.A2, chess.A7),
+			int(chess.SquareSet([chess.A2, chess.A3, chess.A4, chess.A5, chess.A6, chess.A7, chess.A8])))
+		self.assertEqual(chess_util.start_ray_mask(chess.C3, chess.D4),
+			int(chess.SquareSet([chess.C3, chess.D4, chess.E5, chess.F6, chess.G7, chess.H8])))
+
 	def test_get_file_squares(self):
 		self.assertEqual(chess_util.get_file_squares(chess.A1), \
 			chess.SquareSet([chess.A1, chess.A2, chess.A3, chess.A4, chess.A5, chess.A6, chess.A7, chess.A8]))
@@ -98,6 +126,16 @@ class TestChessUtil(unittest.TestCase):
 		adjusted_rank = chess_util.get_adjusted_rank(square, color)
 		self.assertEqual(adjusted_rank, 3)
 
+	def test_get_front_span_mask(self):
+		self.assertEqual(chess_util.get_front_span_mask(chess.E2, chess.WHITE),
+			chess.BB_E3 | chess.BB_E4 | chess.BB_E5 | chess.BB_E6 | chess.BB_E7 | chess.BB_E8)
+		self.assertEqual(chess_util.get_front_span_mask(chess.A3, chess.BLACK), chess.BB_A2 | chess.BB_A1)
+
+	def test_get_passed_pawn_span_mask(self):
+		self.assertEqual(chess_util.get_passed_pawn_span_mask(chess.H6, chess.WHITE),
+			chess.BB_G7 | chess.BB_G8 | chess.BB_H7 | chess.BB_H8)
+		self.assertEqual(chess_util.get_passed_pawn_span_mask(chess.C2, chess.BLACK), chess.BB_B1 | chess.BB_C1 | chess.BB_D1)
+
 	def test_between_inclusive(self):
 		result = chess.SquareSet([chess.C5, chess.D6, chess.E7, chess.F8])
 		self.assertEqual(result, chess_util.between_inclusive(chess.C5, chess.F8))
@@ -366,5 +404,30 @@ class TestChessUtil(unittest.TestCase):
 		self.assertEqual(chess_util.get_most_valuable_free_to_trade(board), (chess.C4, chess_util.PIECE_TYPES_TO_VALUES[chess.KNIGHT]))
 
 
+	def test_see(self):
+		# Rook takes knight defended by a pawn
+		board = Board("4k3/8/2p5/3n4/8/8/3R4/4K3 w - - 0 1")
+		self.assertEqual(chess_util.see(board, chess.Move.from_uci("d2d5")), -200)
+		board = Board("4k3/8/8/3n4/8/8/3R4/4K3 w - - 0 1")
+		self.assertEqual(chess_util.see(board, chess.Move.from_uci("d2d5")), 300)
+		# The rook behind the rook joins the exchange
+		board = Board("4k3/3r4/8/3n4/8/8/3R4/3RK3 w - - 0 1")
+		self.assertEqual(chess_util.see(board, chess.Move.from_uci("d2d5")), 300)
+		board = Board("3qk3/3r4/8/3n4/8/8/3R4/3RK3 w - - 0 1")
+		self.assertEqual(chess_util.see(board, chess.Move.from_uci("d2d5")), -200)
+
+	def test_see_pinned_defender(self):
+		# The pawn on g3 is pinned to its king by the rook on g8
+		board = Board("r1b1k1r1/pp1n1p1p/2pqp3/3p4/3PnB2/3B1NPP/PPP2P2/R2QR1K1 b q - 2 14")
+		self.assertEqual(chess_util.see(board, chess.Move.from_uci("d6f4")), 300)
+
+	def test_see_square(self):
+		board = Board("4k3/8/2p5/3n4/8/8/3R4/4K3 w - - 0 1")
+		self.assertEqual(chess_util.see_square(board, chess.D5), -200)
+		board = Board("4k3/8/8/3n4/8/8/3R4/4K3 w - - 0 1")
+		self.assertEqual(chess_util.see_square(board, chess.D5), 300)
+		# Black has no attackers
+		self.assertEqual(chess_util.see_square(board, chess.D2, chess.BLACK), 0)
+
 if __name__ == '__main__':
 	unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import chess
+import eval_cache
+from eval_cache import EvalCache, EVAL_CACHE_WAYS
+from board import Board
+
+
+class TestEvalCache(unittest.TestCase):
+
+	def test_store_and_get(self):
+		cache = EvalCache(64)
+		board = Board()
+		evaluation = (25, [chess.Move.from_uci("e2e4")])
+		self.assertIsNone(cache.get(board, chess.WHITE))
+		cache.store(board, chess.WHITE, evaluation)
+		self.assertEqual(cache.get(board, chess.WHITE), evaluation)
+		# Evaluations are for the turn they were stored with
+		self.assertIsNone(cache.get(board, chess.BLACK))
+		self.assertEqual((cache.hits, cache.misses, cache.stores), (1, 2, 1))
+		self.assertEqual(cache.get_hit_rate(), 1 / 3)
+
+		board.push(chess.Move.from_uci("e2e4"))
+		self.assertIsNone(cache.get(board, chess.WHITE))
+
+	def test_replacement(self):
+		# Every position goes to the one slot
+		cache = EvalCache(1)
+		boards = [Board(), Board("4k3/8/8/8/8/8/8/4K3 w - - 0 1"), Board("4k3/8/8/8/8/8/8/3K4 w - - 0 1")]
+		for i, board in enumerate(boards):
+			cache.store(board, chess.WHITE, (i, []))
+		# The first entry keeps what it stored this search, the last is replaced
+		self.assertEqual(cache.get(boards[0], chess.WHITE), (0, []))
+		self.assertIsNone(cache.get(boards[1], chess.WHITE))
+		self.assertEqual(cache.get(boards[2], chess.WHITE), (2, []))
+		self.assertEqual(cache.replacements, 1)
+
+		# Entries from old searches are replaced first
+		cache.new_search()
+		cache.store(boards[2], chess.WHITE, (3, []))
+		cache.store(boards[1], chess.WHITE, (1, []))
+		self.assertEqual(cache.get(boards[1], chess.WHITE), (1, []))
+		self.assertEqual(cache.get(boards[2], chess.WHITE), (3, []))
+		self.assertEqual(cache.replacements, 0)
+
+	def test_new_search(self):
+		cache = EvalCache(64)
+		board = Board()
+		cache.new_search((2, 8))
+		cache.store(board, chess.WHITE, (25, []))
+		cache.get(board, chess.WHITE)
+		# Kept between searches with the same settings, with stats for each search
+		cache.new_search((2, 8))
+		self.assertEqual(cache.hits, 0)
+		self.assertEqual(cache.get(board, chess.WHITE), (25, []))
+		cache.new_search((2, 4))
+		self.assertIsNone(cache.get(board, chess.WHITE))
+
+	def test_from_mb(self):
+		cache = EvalCache.from_mb(1)
+		self.assertLessEqual(cache.size * EVAL_CACHE_WAYS * eval_cache.EVAL_CACHE_ENTRY_SIZE, 1024 * 1024)
+		self.assertEqual(len(cache.evaluations), cache.size * EVAL_CACHE_WAYS)
+
+
+if __name__ == '__main__':
+	unittest.main()
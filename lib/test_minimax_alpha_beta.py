@@ -1,4 +1,6 @@
 import unittest
+import threading
+import time
 import chess
 import chess_util
 import minimax_alpha_beta
@@ -6,12 +8,25 @@ from board import Board
 import move_filter
 import move_calculator
 import position_evaluator
+import transposition_table2
+from search_limits import SearchLimits
 
 class TestMinimaxAlphaBeta(unittest.TestCase):
 
 	"""Mate related tests
 	"""
 
+	def test_mate_score(self):
+		# Mates are scored by the number of plies from the root
+		board = Board("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+		self.assertEqual(minimax_alpha_beta.pick_full_move(board, depth=2),
+						(position_evaluator.MAX_EVAL - 1, chess.Move.from_uci("a1a8")))
+		board = Board("7k/5K2/8/8/8/8/8/R7 b - - 0 1")
+		self.assertEqual(minimax_alpha_beta.pick_full_move(board, depth=2)[0], position_evaluator.MIN_EVAL + 2)
+		# Entries in the transposition table hold mates scored from their own position
+		self.assertEqual(minimax_alpha_beta.pick_full_move(board, depth=2, use_tt=True)[0],
+						position_evaluator.MIN_EVAL + 2)
+
 	def test_avoid_mate(self):
 		"""g7g5 blunders mate in 1
 		"""
@@ -220,7 +235,7 @@ class TestMinimaxAlphaBeta(unittest.TestCase):
 	def test_avoid_fork(self):
 		board = Board("r1bq1rk1/ppp1ppbp/2n3p1/3p4/4n3/1P2P1P1/PBPP1PBP/RNQ1K1NR b KQ - 3 8")
 		#move = minimax_alpha_beta.pick_move(board, 1, extend_search=False)
-		move = move_calculator.calculate_with_thread(board, 20)
+		move = move_calculator.calculate_move(board, 20)
 		self.assertNotEqual(move, chess.Move.from_uci("c8g4"))
 
 	def test_pin_to_queen(self):
@@ -281,6 +296,65 @@ class TestMinimaxAlphaBeta(unittest.TestCase):
 		move = minimax_alpha_beta.pick_move(board, 2, move_filter=move_filter.is_soft_tactic)
 		self.assertEqual(move, chess.Move.from_uci("a5c5"))
 
+	def test_aspiration_helper(self):
+		fen = "r5k1/5ppp/8/8/8/2n5/5PPP/3R2K1 w - - 0 1"
+		result = minimax_alpha_beta.minimax_helper(Board(fen), 2)
+		minimax_alpha_beta.init_counts()
+		self.assertEqual(minimax_alpha_beta.aspiration_helper(Board(fen), 2, result[0] + 1000), result)
+		self.assertTrue(minimax_alpha_beta.fail_low_count > 0)
+		self.assertEqual(minimax_alpha_beta.aspiration_helper(Board(fen), 2, result[0] - 1000), result)
+		self.assertTrue(minimax_alpha_beta.fail_high_count > 0)
+
+	def test_analyze(self):
+		board = Board("rnbqkbnr/3ppppp/8/1pp5/PpPP4/5N2/4PPPP/RNBQKB1R w KQkq - 0 5")
+		lines = minimax_alpha_beta.analyze(board, 1, num_workers=2)
+		self.assertEqual({pv[0] for _, pv in lines}, set(board.legal_moves))
+		evaluations = [evaluation for evaluation, _ in lines]
+		self.assertEqual(evaluations, sorted(evaluations, reverse=True))
+		self.assertEqual(lines[0][1][0], chess.Move.from_uci("c4b5"))
+		# The alpha bound shared by the workers doesn't change the best lines
+		self.assertEqual(minimax_alpha_beta.analyze(board, 1, multipv=2, num_workers=2), lines[:2])
+
+	def test_analyze_in_time(self):
+		board = Board("rnbqkbnr/3ppppp/8/1pp5/PpPP4/5N2/4PPPP/RNBQKB1R w KQkq - 0 5")
+		reports = []
+		lines, depth = minimax_alpha_beta.analyze_in_time(board, SearchLimits(.1), multipv=3, num_workers=2,
+														report=lambda lines, depth: reports.append(depth))
+		# Depth 1 is always finished
+		self.assertGreaterEqual(depth, 1)
+		self.assertEqual(len(lines), 3)
+		self.assertEqual(reports, list(range(1, depth + 1)))
+		# Every depth is analyzed by the same workers, which share the transposition table
+		self.addCleanup(transposition_table2.tt_init_mb, transposition_table2.DEFAULT_HASH_MB)
+		lines, depth = minimax_alpha_beta.analyze_in_time(board, SearchLimits(.1), multipv=3, num_workers=2,
+														use_tt=True)
+		self.assertGreaterEqual(depth, 1)
+		self.assertEqual(len(lines), 3)
+		self.assertTrue(transposition_table2.tt_is_shared())
+
+	def test_analyze_in_time_limits(self):
+		board = Board()
+		start = time.time()
+		lines, depth = minimax_alpha_beta.analyze_in_time(board, SearchLimits(.5), max_depth=20, num_workers=2)
+		# Slack for starting the workers, depth 1 and polling the limits
+		self.assertLess(time.time() - start, .5 + 1)
+		self.assertIn(lines[0][1][0], board.legal_moves)
+		self.assertLess(depth, 20)
+		# The nodes of every worker are counted
+		limits = SearchLimits(max_nodes=500)
+		lines, depth = minimax_alpha_beta.analyze_in_time(board, limits, max_depth=20, num_workers=2)
+		self.assertIn(lines[0][1][0], board.legal_moves)
+		self.assertTrue(limits.is_past_limit())
+		self.assertLess(depth, 20)
+
+	def test_analyze_stop(self):
+		"""A stop in the middle of a depth is answered within a few nodes
+		"""
+		limits = SearchLimits()
+		threading.Timer(.5, limits.stop).start()
+		start = time.time()
+		self.assertIsNone(minimax_alpha_beta.analyze(Board(), 6, num_workers=2, limits=limits))
+		self.assertLess(time.time() - start, .5 + 1)
 
 
 if __name__ == '__main__':
@@ -5,9 +5,10 @@ import chess_util
 from board import Board
 import position_evaluator
 import move_filter
+import transposition_table2
 
 def get_move(board, time=.5):
-		return move_calculator.calculate_with_thread(board, time)[1]
+		return move_calculator.calculate_move(board, time)[1]
 
 class TestMoveCalculator(unittest.TestCase):
 
@@ -120,23 +121,40 @@ class TestMoveCalculator(unittest.TestCase):
 		move = get_move(board, time=2)
 		self.assertEqual(move, chess.Move.from_uci("b5c4"))
 		
+	def test_lazy_smp(self):
+		board = Board("rnbqkbnr/3ppppp/8/1pp5/PpPP4/8/4PPPP/RNBQKBNR w KQkq - 0 5")
+		board.push(chess.Move.from_uci("g1f3"))
+		board.push(chess.Move.from_uci("c8b7"))
+		self.addCleanup(transposition_table2.tt_init_mb, transposition_table2.DEFAULT_HASH_MB)
+		result = move_calculator.calculate_move(board, 2, num_threads=2)
+		self.assertIn(result[1], board.legal_moves)
+		self.assertGreaterEqual(result[2], 1)
+		# Helpers search with this process through the transposition table
+		self.assertTrue(transposition_table2.tt_is_shared())
+
+	def test_helper_start_depths(self):
+		self.assertEqual({move_calculator.get_helper_start_depth(i) for i in range(1, 5)}, {1, 2})
+
 	def test_is_mating(self):
-		self.assertTrue(move_calculator.is_mating(position_evaluator.MAX_EVAL - 5,
+		self.assertTrue(move_calculator.is_mating(position_evaluator.MAX_EVAL - 1,
 					depth=1, move_filter=None))
 		self.assertTrue(move_calculator.is_mating(position_evaluator.MIN_EVAL + 5,
-					depth=1, move_filter=None))
+					depth=5, move_filter=None))
 		self.assertFalse(move_calculator.is_mating(0, depth=1, move_filter=None))
-		self.assertFalse(move_calculator.is_mating(position_evaluator.MIN_EVAL + 5,
+		self.assertFalse(move_calculator.is_mating(position_evaluator.MIN_EVAL + 1,
 					depth=1, move_filter=move_filter.is_hard_tactic))
-		self.assertTrue(move_calculator.is_mating(position_evaluator.MIN_EVAL + 5,
+		self.assertTrue(move_calculator.is_mating(position_evaluator.MIN_EVAL + 2,
 					depth=2, move_filter=move_filter.is_hard_tactic))
+		# A deeper search may find a quicker mate
+		self.assertFalse(move_calculator.is_mating(position_evaluator.MAX_EVAL - 5,
+					depth=2, move_filter=None))
 
 	#@unittest.skip("Used for temporary testing")
 	def test(self):
 		board = Board("8/2br2kp/4p1p1/3q4/1p6/1P3NP1/5P1P/4R1K1 w - - 1 32")
 		time = 25
 		#move = move_calculator.calculate(board, time)[1]
-		move = move_calculator.calculate_with_thread(board, time)[1]
+		move = move_calculator.calculate_move(board, time)[1]
 		print(move)
 
 
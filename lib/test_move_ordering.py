@@ -0,0 +1,61 @@
+import unittest
+import chess
+from board import Board
+from move_ordering import MoveOrderer, get_mvv_lva_value, is_winning_capture
+
+
+class TestMoveOrdering(unittest.TestCase):
+
+	def test_get_mvv_lva_value(self):
+		board = Board("4k3/8/8/3q4/2P1N3/8/8/4K3 w - - 0 1")
+		pawn_takes_queen = chess.Move.from_uci("c4d5")
+		self.assertTrue(get_mvv_lva_value(board, pawn_takes_queen) >
+						get_mvv_lva_value(board, chess.Move.from_uci("e4c5")))
+
+	def test_is_winning_capture(self):
+		board = Board("4k3/8/2p5/3n4/8/8/3R4/4K3 w - - 0 1")
+		# Rook takes knight defended by a pawn
+		self.assertFalse(is_winning_capture(board, chess.Move.from_uci("d2d5")))
+		board = Board("4k3/8/8/3n4/8/8/3R4/4K3 w - - 0 1")
+		self.assertTrue(is_winning_capture(board, chess.Move.from_uci("d2d5")))
+
+	def test_order_moves(self):
+		board = Board("4k3/6p1/7n/8/3q4/8/3RP3/4K2R w - - 0 1")
+		move_orderer = MoveOrderer()
+		killer = chess.Move.from_uci("h1h5")
+		history_move = chess.Move.from_uci("h1h3")
+		move_orderer.killers[0] = [killer, None]
+		move_orderer.history[history_move.from_square * 64 + history_move.to_square] = 100
+		tt_move = chess.Move.from_uci("e2e3")
+		moves = list(board.legal_moves)
+		ordered_moves = list(move_orderer.order_moves(board, moves, 0, tt_move))
+		self.assertEqual(sorted(ordered_moves, key=str), sorted(moves, key=str))
+		self.assertEqual(ordered_moves[:4], [tt_move, chess.Move.from_uci("d2d4"), killer, history_move])
+		# Rook takes knight defended by a pawn is tried last
+		self.assertEqual(ordered_moves[-1], chess.Move.from_uci("h1h6"))
+
+	def test_null_move_last(self):
+		board = Board()
+		moves = list(board.legal_moves) + [chess.Move.null()]
+		ordered_moves = list(MoveOrderer().order_moves(board, moves, 0))
+		self.assertEqual(ordered_moves[-1], chess.Move.null())
+		self.assertEqual(len(ordered_moves), len(moves))
+
+	def test_add_cutoff(self):
+		board = Board()
+		move_orderer = MoveOrderer()
+		first = chess.Move.from_uci("e2e4")
+		second = chess.Move.from_uci("d2d4")
+		move_orderer.add_cutoff(board, first, 2, 3)
+		move_orderer.add_cutoff(board, second, 3, 3)
+		self.assertEqual(move_orderer.killers[3], [second, first])
+		self.assertEqual(move_orderer.get_history_value(first), 4)
+		self.assertEqual(move_orderer.get_history_value(second), 9)
+		# Captures are ordered without killers or history
+		board = Board("4k3/8/8/3q4/2P5/8/8/4K3 w - - 0 1")
+		move_orderer.add_cutoff(board, chess.Move.from_uci("c4d5"), 3, 3)
+		self.assertEqual(move_orderer.killers[3], [second, first])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -31,13 +31,21 @@ class TestMovePositionEvaluator(unittest.TestCase):
 		evaluator = MovePositionEvaluator(board, turn)
 		initial_eval = evaluator.get_evaluation()
 		board.push(move)
-		eval_after_move = evaluator.evaluate_after_move()
+		eval_after_move = evaluator.evaluate_after_move(thorough=True)
 
-		estimated_value_after_move = initial_eval + position_evaluator.PIECE_TYPES_TO_VALUES[chess.PAWN]
-		# bound on extra value pawn may have had
-		error_bound = 50
-		self.assertTrue(eval_after_move < estimated_value_after_move + error_bound and
-					estimated_value_after_move - error_bound < eval_after_move)
+		self.assertLess(initial_eval + position_evaluator.PIECE_TYPES_TO_VALUES[chess.PAWN] / 2, eval_after_move)
+		# The captured pawn's square and the pieces around it are evaluated again
+		self.assertAlmostEqual(eval_after_move, MovePositionEvaluator(board, turn).get_evaluation())
+
+	def test_thorough(self):
+		board = Board("r2qkbnr/pppbpp1p/6p1/3pP3/1n3P2/N1PP1Q1P/PP2N1P1/R1B1KB1R b KQkq - 0 10")
+		turn = chess.BLACK
+		evaluator = MovePositionEvaluator(board, turn)
+		# Opens the bishop's diagonal, changes the pawn files, then trades on b4
+		for move in ["e7e6", "c3b4", "f8b4", "e2c3"]:
+			board.push(chess.Move.from_uci(move))
+			evaluator.evaluate_after_move(thorough=True)
+			self.assertAlmostEqual(evaluator.get_evaluation(), MovePositionEvaluator(board, turn).get_evaluation())
 
 	def test_pawn_promotion(self):
 		board = Board("4k3/3q3P/8/8/8/8/8/4K3 w - - 0 1")
@@ -66,11 +74,53 @@ class TestMovePositionEvaluator(unittest.TestCase):
 		
 		self.helper_test_undo(board, turn, move)
 
+	def test_castling(self):
+		board = Board("r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 6 5")
+		turn = chess.WHITE
+		self.helper_test_same_as_full_evaluation(board, turn, chess.Move.from_uci("e1g1"))
+		self.helper_test_undo(board, turn, chess.Move.from_uci("e1g1"))
+
+	def test_chess960_castling(self):
+		# The king takes its own rook
+		board = Board("r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 6 5", chess960=True)
+		turn = chess.BLACK
+		self.helper_test_same_as_full_evaluation(board, turn, chess.Move.from_uci("e1h1"))
+		self.helper_test_undo(board, turn, chess.Move.from_uci("e1h1"))
+
+	def test_null_move(self):
+		board = Board("rnbqkbnr/1p1ppppp/8/P1p5/1pP5/8/3PPPPP/RNBQKBNR b KQkq - 0 4")
+		turn = chess.WHITE
+		evaluator = MovePositionEvaluator(board, turn)
+		pieces_to_values = evaluator.pieces_to_values.copy()
+		board.push(chess.Move.null())
+		evaluator.evaluate_after_move()
+		# Every piece is evaluated again for the new side to move
+		self.assertEqual(evaluator.pieces_to_values, MovePositionEvaluator(board, turn).pieces_to_values)
+		evaluator.undo_move()
+		self.assertEqual(pieces_to_values, evaluator.pieces_to_values)
+
+	def test_undo_en_passant_capture(self):
+		board = Board("rnbqkbnr/pp1ppppp/8/2pP4/8/8/PPP1PPPP/RNBQKBNR w KQkq c6 0 2")
+		self.helper_test_undo(board, chess.WHITE, chess.Move.from_uci("d5c6"))
+
+	def helper_test_same_as_full_evaluation(self, board: Board, turn: chess.Color, move: chess.Move):
+		"""Pieces that moved are scored as if the board had been evaluated from scratch
+		"""
+		evaluator = MovePositionEvaluator(board, turn)
+		occupied_before = board.occupied
+		board.push(move)
+		evaluator.evaluate_after_move()
+		full_evaluator = MovePositionEvaluator(board, turn)
+		self.assertEqual(set(evaluator.pieces_to_values), set(full_evaluator.pieces_to_values))
+		for square in chess.SquareSet(board.occupied & ~occupied_before):
+			self.assertEqual(evaluator.pieces_to_values[square], full_evaluator.pieces_to_values[square])
+		board.pop()
+
 	def helper_test_undo(self, board: Board, turn: chess.Color, move: chess.Move):
 		evaluator = MovePositionEvaluator(board, turn)
 		initial_eval = evaluator.get_evaluation()
 		initial_pieces_evaluation = evaluator.pieces_evaluation
-		initial_pieces_to_values = evaluator.pieces_to_values
+		initial_pieces_to_values = evaluator.pieces_to_values.copy()
 		board.push(move)
 		evaluator.evaluate_after_move()
 		evaluator.undo_move()
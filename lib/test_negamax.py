@@ -0,0 +1,160 @@
+import unittest
+import chess
+import minimax_alpha_beta
+import negamax
+from negamax import NegamaxSearch
+from board import Board
+from move_position_evaluator import MovePositionEvaluator
+import move_filter
+import position_evaluator
+from transposition_table2 import tt_init
+
+
+class TestNegamax(unittest.TestCase):
+
+	def test_avoid_mate(self):
+		"""g7g5 blunders mate in 1
+		"""
+		board = Board("r1bqkbnr/1p1np1pp/2P2p2/p7/P2PP3/8/1P3PPP/RNBQKBNR b KQkq - 0 6")
+		move = negamax.pick_move(board, depth=1)
+		self.assertNotEqual(move, chess.Move.from_uci('g7g5'))
+
+	def test_getting_mated(self):
+		"""Even if the engine is getting mated, it should still return a move.
+		"""
+		board = Board("1n3k2/5ppr/8/pp1p1b2/3P3P/4rP2/PP5q/4K3 w - - 0 34")
+		evaluation, move = negamax.pick_full_move(board, depth=2)
+		self.assertEqual(move, chess.Move.from_uci('e1f1'))
+		# Mated in 2 plies
+		self.assertEqual(evaluation, position_evaluator.MIN_EVAL + 2)
+
+	def test_back_rank_mate(self):
+		board = Board("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+		evaluation, move = negamax.pick_full_move(board, depth=1)
+		self.assertEqual(move, chess.Move.from_uci('d1d8'))
+		# Mate in 1 ply
+		self.assertEqual(evaluation, position_evaluator.MAX_EVAL - 1)
+
+	def test_same_as_minimax(self):
+		for fen in ["r5k1/5ppp/8/8/8/2n5/5PPP/3R2K1 w - - 0 1", "8/4k3/1R6/5P2/5K2/8/8/8 b - - 51 130"]:
+			for move_filter_ in [None, move_filter.is_soft_tactic]:
+				self.assertEqual(
+					negamax.pick_full_move(Board(fen), depth=3, move_filter=move_filter_),
+					minimax_alpha_beta.pick_full_move(Board(fen), depth=3, move_filter=move_filter_))
+
+	def test_pv(self):
+		board = Board("1n3k2/5ppr/8/pp1p1b2/3P3P/4rP2/PP5q/4K3 w - - 0 34")
+		search = NegamaxSearch(board)
+		evaluation, move = search.search(2)
+		pv = search.get_pv()
+		self.assertEqual(pv[0], move)
+		self.assertEqual(len(pv), 2)
+		# The search leaves the board as it found it
+		self.assertEqual(board.fen(), "1n3k2/5ppr/8/pp1p1b2/3P3P/4rP2/PP5q/4K3 w - - 0 34")
+
+	def test_tt(self):
+		tt_init(1024)
+		fen = "r5k1/5ppp/8/8/8/2n5/5PPP/3R2K1 w - - 0 1"
+		result = negamax.pick_full_move(Board(fen), depth=3)
+		search = NegamaxSearch(Board(fen), use_tt=True)
+		search.search(2)
+		self.assertEqual(search.search(3), result)
+
+	def test_aspiration_window(self):
+		fen = "r5k1/5ppp/8/8/8/2n5/5PPP/3R2K1 w - - 0 1"
+		result = NegamaxSearch(Board(fen)).search(3)
+		previous_evaluation = NegamaxSearch(Board(fen)).search(2)[0]
+		search = NegamaxSearch(Board(fen))
+		self.assertEqual(search.search(3, previous_evaluation=previous_evaluation), result)
+		# A bad guess is searched again with a wider window
+		search = NegamaxSearch(Board(fen))
+		self.assertEqual(search.search(3, previous_evaluation=result[0] + 1000), result)
+		self.assertTrue(search.fail_low_count > 0)
+		search = NegamaxSearch(Board(fen))
+		self.assertEqual(search.search(3, previous_evaluation=result[0] - 1000), result)
+		self.assertTrue(search.fail_high_count > 0)
+
+
+	def test_null_move_pruning(self):
+		fen = "r1b1k1r1/pp1n1p1p/2pqp3/3p4/3PnB2/3B1NPP/PPP2P2/R2QR1K1 b q - 2 14"
+		search = NegamaxSearch(Board(fen))
+		result = search.search(3)
+		self.assertTrue(search.null_move_prune_count > 0)
+		no_null_search = NegamaxSearch(Board(fen), null_move_pruning=False)
+		self.assertEqual(no_null_search.search(3), result)
+		self.assertEqual(no_null_search.null_move_count, 0)
+		self.assertTrue(search.node_count < no_null_search.node_count)
+
+	def test_no_null_move_with_only_pawns(self):
+		"""Passing could be better than any move in a king and pawn ending (zugzwang)
+		"""
+		board = Board("8/8/8/3k4/8/3P4/3K4/8 w - - 0 1")
+		search = NegamaxSearch(board)
+		self.assertFalse(search.can_try_null_move(3, 0, negamax.NULL_WINDOW, 1))
+		board = Board("8/8/8/3k4/8/3P4/3K4/7R w - - 0 1")
+		search = NegamaxSearch(board)
+		# The static evaluation is kept by the evaluator a search makes
+		search.move_position_evaluator = MovePositionEvaluator(board, board.turn)
+		self.assertTrue(search.can_try_null_move(3, 0, negamax.NULL_WINDOW, 1))
+		# Never at PV nodes
+		self.assertFalse(search.can_try_null_move(3, 0, 100, 1))
+
+	def test_late_move_reductions(self):
+		fen = "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"
+		search = NegamaxSearch(Board(fen))
+		result = search.search(3)
+		self.assertTrue(search.reduction_count > 0)
+		no_lmr_search = NegamaxSearch(Board(fen), late_move_reductions=False)
+		self.assertEqual(no_lmr_search.search(3), result)
+		self.assertEqual(no_lmr_search.reduction_count, 0)
+		self.assertTrue(search.node_count < no_lmr_search.node_count)
+
+	def test_tactical_moves_not_reduced(self):
+		board = Board("r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4")
+		search = NegamaxSearch(board)
+		self.assertTrue(search.get_reduction(5, 10, chess.Move.from_uci("a2a3")) > 0)
+		# Takes a pawn with check
+		self.assertEqual(search.get_reduction(5, 10, chess.Move.from_uci("c4f7")), 0)
+		# The first moves are searched at full depth
+		self.assertEqual(search.get_reduction(5, 1, chess.Move.from_uci("a2a3")), 0)
+		self.assertEqual(search.get_reduction(2, 10, chess.Move.from_uci("a2a3")), 0)
+
+	def test_futility_pruning_and_razoring(self):
+		fen = "8/3rkp1p/pr2q1p1/Rp1pPn2/3Pb3/1BP5/Q1PBR1PP/6K1 b - - 11 23"
+		search = NegamaxSearch(Board(fen))
+		result = search.search(3)
+		self.assertTrue(search.futility_prune_count > 0)
+		no_pruning_search = NegamaxSearch(Board(fen), futility_margin=None, razor_margin=None)
+		self.assertEqual(no_pruning_search.search(3), result)
+		self.assertEqual(no_pruning_search.futility_prune_count + no_pruning_search.razor_prune_count, 0)
+		self.assertTrue(search.node_count < no_pruning_search.node_count)
+
+	def test_is_quiet_move(self):
+		board = Board("r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 6 5")
+		search = NegamaxSearch(board)
+		self.assertTrue(search.is_quiet_move(chess.Move.from_uci("d2d3")))
+		self.assertTrue(search.is_quiet_move(chess.Move.from_uci("e1g1")))
+		self.assertFalse(search.is_quiet_move(chess.Move.from_uci("c4f7")))
+		self.assertFalse(search.is_quiet_move(chess.Move.null()))
+
+	def test_quicker_mate(self):
+		"""Mate in 1 is preferred over longer mates
+		"""
+		board = Board("6k1/5ppp/8/8/8/8/5PPP/1R1R2K1 w - - 0 1")
+		search = NegamaxSearch(board)
+		evaluation, move = search.search(3)
+		self.assertEqual(evaluation, position_evaluator.MAX_EVAL - 1)
+		self.assertIn(move, [chess.Move.from_uci("b1b8"), chess.Move.from_uci("d1d8")])
+		self.assertTrue(search.mate_distance_prune_count > 0)
+
+	def test_tt_mate_scores(self):
+		"""Mates from the transposition table are scored from the root
+		"""
+		tt_init(1024)
+		fen = "6k1/5ppp/8/8/8/8/5PPP/1R1R2K1 w - - 0 1"
+		search = NegamaxSearch(Board(fen), use_tt=True)
+		search.search(2)
+		self.assertEqual(search.search(3)[0], position_evaluator.MAX_EVAL - 1)
+
+if __name__ == '__main__':
+	unittest.main()
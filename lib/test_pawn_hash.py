@@ -0,0 +1,49 @@
+import unittest
+import chess
+import chess_util
+import position_evaluator
+from pawn_hash import PawnEntry, PawnHash
+from board import Board
+
+FENS = ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+		"r2qkbnr/pppbpp1p/6p1/3pP3/1n3P2/N1PP1Q1P/PP2N1P1/R1B1KB1R b KQkq - 0 10",
+		"8/3rkp1p/pr2q1p1/Rp1pPn2/3Pb3/1BP5/Q1PBR1PP/6K1 b - - 11 23",
+		"8/1p3k2/p7/P1P5/4p3/4P1pK/8/8 w - - 0 50"]
+
+
+class TestPawnHash(unittest.TestCase):
+
+	def test_entry(self):
+		for fen in FENS:
+			board = Board(fen)
+			entry = PawnEntry(board)
+			for pawn in board.pieces(chess.PAWN, chess.WHITE) | board.pieces(chess.PAWN, chess.BLACK):
+				pawns = board.pieces(chess.PAWN, board.color_at(pawn))
+				self.assertEqual(bool(entry.passed & chess.BB_SQUARES[pawn]),
+								position_evaluator.is_passed_pawn(board, pawn), fen)
+				self.assertEqual(bool(entry.isolated & chess.BB_SQUARES[pawn]),
+								position_evaluator.is_isolated_pawn(pawns, pawn), fen)
+			for square in chess.SQUARES:
+				self.assertEqual(bool(entry.open_files & chess.BB_SQUARES[square]),
+								chess_util.is_open_file(board, square), fen)
+				self.assertEqual(bool(entry.half_open_files & chess.BB_SQUARES[square]),
+								chess_util.is_half_open_file(board, square), fen)
+
+	def test_blocked(self):
+		board = Board("8/1p3k2/p7/P1P5/4p3/4P1pK/8/8 w - - 0 50")
+		self.assertEqual(PawnEntry(board).blocked, chess.BB_A5 | chess.BB_A6 | chess.BB_E3 | chess.BB_E4)
+
+	def test_get_entry(self):
+		pawn_hash = PawnHash(64)
+		board = Board()
+		entry = pawn_hash.get_entry(board)
+		# Piece moves keep the pawns, and so the entry
+		board.push(chess.Move.from_uci("g1f3"))
+		self.assertIs(pawn_hash.get_entry(board), entry)
+		board.push(chess.Move.from_uci("e7e5"))
+		self.assertIsNot(pawn_hash.get_entry(board), entry)
+		self.assertEqual((pawn_hash.hits, pawn_hash.misses), (1, 2))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 import chess
+import chess_util
 import position_evaluator
 from board import Board
 from constants import MIN_MATING_EVAL
@@ -344,6 +345,38 @@ class TestPositionEvaluator(unittest.TestCase):
 			fourth_rank_count * position_evaluator.RANKS_TO_ATTACKING_BONUS.get(6)[0]
 		self.assertEqual(position_evaluator.get_attacking_bonus(board, color, piece), attacking_bonus)
 
+	def test_tapered_tables(self):
+		# Between the opening and endgame, so both values of the ranges count
+		board = Board("3r2k1/1p3pp1/p1n4p/4b3/2B1P3/2N2P2/PP4PP/3R2K1 w - - 0 25")
+		for piece in [chess.C3, chess.C4, chess.D1, chess.C6, chess.E5, chess.D8]:
+			color = board.color_at(piece)
+			squares_to_bonus, ranks_to_bonus, bonus_masks = (position_evaluator.ROOK_SQUARES_TO_ATTACKING_BONUS,
+				position_evaluator.ROOK_RANKS_TO_ATTACKING_BONUS, position_evaluator.ROOK_ATTACKING_BONUS_MASKS) \
+				if board.piece_type_at(piece) == chess.ROOK else (position_evaluator.SQUARES_TO_ATTACKING_BONUS,
+				position_evaluator.RANKS_TO_ATTACKING_BONUS, position_evaluator.ATTACKING_BONUS_MASKS)
+			attacking_bonus = 0
+			for square in board.attacks(piece):
+				attacking_bonus += position_evaluator.get_eval(board, color, squares_to_bonus[square])
+				attacking_bonus += position_evaluator.get_eval(board, color,
+					ranks_to_bonus[chess_util.get_adjusted_rank(square, color)])
+			self.assertAlmostEqual(position_evaluator.get_attacking_bonus(board, color, piece, bonus_masks), attacking_bonus)
+			self.assertAlmostEqual(position_evaluator.get_table_eval(board, color, position_evaluator.DEVELOPED_TABLES, piece),
+				position_evaluator.get_eval(board, color, position_evaluator.get_developed_eval(piece, color)))
+
+	def test_get_bonus_masks(self):
+		tables = position_evaluator.ROOK_ATTACKING_BONUS_TABLES
+		for color in chess.COLORS:
+			opening_values, endgame_values = tables[color]
+			covered = chess.BB_EMPTY
+			for mask, opening_value, endgame_value in position_evaluator.get_bonus_masks(tables)[color]:
+				self.assertFalse(covered & mask)
+				covered |= mask
+				for square in chess.scan_forward(mask):
+					self.assertEqual((opening_values[square], endgame_values[square]), (opening_value, endgame_value))
+			# Squares without a bonus are left out
+			for square in chess.scan_forward(~covered & chess.BB_ALL):
+				self.assertEqual((opening_values[square], endgame_values[square]), (0, 0))
+
 	def test_get_piece_trapped_penalty(self):
 		board = Board("1r1qkb1r/2pbnpp1/ppn1p2p/3pB2Q/3P1P2/2NB1N2/PPP1P1PP/3RK2R w Kk - 0 10")
 		piece = chess.E5
@@ -601,6 +634,25 @@ class TestPositionEvaluator(unittest.TestCase):
 		print(result)
 		self.assertTrue(result < 0)
 
+	def test_get_open_line_lengths(self):
+		board = Board("1r2r1k1/pb1pqnbp/1pp1ppp1/8/P2PBQ2/1RN1PNP1/1PPR1P1P/6K1 w - - 1 29")
+		rank_lengths, diagonal_lengths = position_evaluator.get_open_line_lengths(board, chess.G1)
+		# Only one square to the right before the edge, three open squares to the left
+		self.assertEqual(rank_lengths, {-1: 3, 1: 0})
+		# Pawns on f2 and h2
+		self.assertEqual(diagonal_lengths, {(-1, 1): 0, (1, 1): 0, (1, -1): 0, (-1, -1): 0})
+		# Kept in the pawn entry, and shared by positions with the same pawns
+		board.push(chess.Move.from_uci("g1h1"))
+		self.assertIs(position_evaluator.get_open_line_lengths(board, chess.G1)[0], rank_lengths)
+
+	def test_is_open_line_guarded(self):
+		board = Board("6k1/8/8/8/8/8/8/R3K3 w - - 0 1")
+		self.assertTrue(position_evaluator.is_open_line_guarded(board, chess.WHITE, chess.ROOK, chess.E1, chess.D1))
+		self.assertFalse(position_evaluator.is_open_line_guarded(board, chess.WHITE, chess.ROOK, chess.E1, chess.F1))
+		# The rook can't see the king past another piece
+		board = Board("6k1/8/8/8/8/8/8/R2NK3 w - - 0 1")
+		self.assertFalse(position_evaluator.is_open_line_guarded(board, chess.WHITE, chess.ROOK, chess.E1, chess.D1))
+
 	def test_repetition_brings_eval_closer_to_zero(self):
 		board = Board("rnbqk1nr/p1p5/4ppp1/1p5Q/1bpP4/2N1P3/PP3PPP/R1B1KB1R w KQkq - 0 9")
 		turn = chess.WHITE
@@ -615,7 +667,7 @@ class TestPositionEvaluator(unittest.TestCase):
 		board = Board("3r2k1/p1p1q3/5p1R/2p1p2Q/N7/pP2P3/K1P5/3r4 w - - 7 31")
 		turn = chess.BLACK
 		self.assertEqual(position_evaluator.evaluate_position(board, turn, extend=True, check_forced_mate=True),
-						position_evaluator.MIN_EVAL + 2)
+						position_evaluator.MIN_EVAL + 3)
 
 	def test_mate_in_3_not_found(self):
 		"""Should only check up to mate in 2
@@ -6,6 +6,7 @@ from search_extension import SearchExtension, get_potential_tactics_moves, \
 	is_past_max_loss
 import search_extension
 from move_position_evaluator import MovePositionEvaluator
+from eval_cache import EvalCache
 
 
 class TestSearchExtension(unittest.TestCase):
@@ -93,6 +94,56 @@ class TestSearchExtension(unittest.TestCase):
 							num_checks_remaining=1, num_pawn_promotion_remaining=1, num_captures_remaining=8)
 		self.assertEqual(chess.Move.from_uci("e7b4"), result[1][0])
 		
+	def test_quiescence_same_as_search_helper(self):
+		for fen, turn in [("r1b1k1r1/pp1n1p1p/2pqp3/3p4/3PnB2/3B1NPP/PPP2P2/R2QR1K1 b q - 2 14", chess.BLACK),
+						("r4rk1/pp2bppp/4b3/2p5/2q1NR2/P3P3/1BQP2PP/5RK1 w - - 0 21", chess.WHITE)]:
+			expected = SearchExtension(Board(fen), turn, eval_cache=EvalCache()).search_helper()
+			result = SearchExtension(Board(fen), turn, eval_cache=EvalCache(), quiescence=True).quiescence_helper(
+				search_extension.MIN_EVAL, search_extension.MAX_EVAL)
+			self.assertEqual(result[0], expected[0])
+			self.assertEqual(result[1][0], expected[1][0])
+
+	def test_inherited_evaluator(self):
+		"""An evaluator carried in from the caller's search gives the same result as a new one
+		and is left as it was
+		"""
+		fen = "r1b1k1r1/pp1n1p1p/2pqp3/3p4/3PnB2/3B1NPP/PPP2P2/R2QR1K1 b q - 2 14"
+		expected = SearchExtension(Board(fen), chess.BLACK, eval_cache=EvalCache()).search()
+		board = Board(fen)
+		evaluator = MovePositionEvaluator(board, chess.BLACK)
+		pieces_to_values = evaluator.pieces_to_values.copy()
+		result = SearchExtension(board, chess.BLACK, eval_cache=EvalCache(), move_position_evaluator=evaluator).search()
+		self.assertEqual(result, expected)
+		self.assertEqual(evaluator.pieces_to_values, pieces_to_values)
+
+	def test_quiescence_cutoff(self):
+		"""Outside of the window, the evaluation is only a bound
+		"""
+		fen = "r1b1k1r1/pp1n1p1p/2pqp3/3p4/3PnB2/3B1NPP/PPP2P2/R2QR1K1 b q - 2 14"
+		expected = SearchExtension(Board(fen), chess.BLACK, eval_cache=EvalCache()).search_helper()[0]
+		result = SearchExtension(Board(fen), chess.BLACK, eval_cache=EvalCache(), quiescence=True).quiescence_helper(
+			expected - 200, expected - 100)[0]
+		self.assertTrue(result >= expected - 100)
+		result = SearchExtension(Board(fen), chess.BLACK, eval_cache=EvalCache(), quiescence=True).quiescence_helper(
+			expected + 100, expected + 200)[0]
+		self.assertTrue(result <= expected + 100)
+
+	def test_mate_distance(self):
+		"""A mate found by the extension counts every ply it is away, including cached ones
+		Qxg8+ Rxg8 Nf7# without the forced mate search
+		"""
+		fen = "r6k/6pp/7N/8/8/1Q6/8/6K1 w - - 0 1"
+		for quiescence in [False, True]:
+			cache = EvalCache()
+			for _ in range(2):
+				result = SearchExtension(Board(fen), chess.WHITE, eval_cache=cache, quiescence=quiescence).search(
+					num_checks_remaining=2, forced_mate_depth=0)
+				self.assertEqual(result[0], search_extension.MAX_EVAL - 3)
+				self.assertEqual(result[1], [chess.Move.from_uci(move) for move in ["b3g8", "a8g8", "h6f7"]])
+			result = SearchExtension(Board(fen), chess.BLACK, eval_cache=EvalCache(), quiescence=quiescence).search(
+				num_checks_remaining=2, forced_mate_depth=0)
+			self.assertEqual(result[0], search_extension.MIN_EVAL + 3)
+
 	def test_is_past_max_loss(self):
 		board_turn = chess.WHITE
 		evaluating_turn = chess.BLACK
@@ -0,0 +1,52 @@
+import unittest
+import chess
+import move_calculator
+import negamax
+from board import Board
+from search_limits import SearchAborted, SearchLimits, POLL_INTERVAL
+
+
+class TestSearchLimits(unittest.TestCase):
+
+	def test_no_limits(self):
+		limits = SearchLimits()
+		for _ in range(POLL_INTERVAL * 10):
+			limits.check()
+		self.assertEqual(limits.node_count, POLL_INTERVAL * 10)
+
+	def test_max_nodes(self):
+		limits = SearchLimits(max_nodes=POLL_INTERVAL)
+		for _ in range(POLL_INTERVAL - 1):
+			limits.check()
+		self.assertRaises(SearchAborted, limits.check)
+
+	def test_stop(self):
+		limits = SearchLimits()
+		limits.stop()
+		self.assertTrue(limits.is_past_limit())
+
+	def test_deadline(self):
+		limits = SearchLimits(.01)
+		self.assertFalse(limits.is_past_limit())
+		limits.deadline = limits.start_ts
+		self.assertTrue(limits.is_past_limit())
+
+	def test_aborted_search_restores_board(self):
+		fen = "r5k1/5ppp/8/8/8/2n5/5PPP/3R2K1 w - - 0 1"
+		board = Board(fen)
+		search = negamax.NegamaxSearch(board, limits=SearchLimits(max_nodes=POLL_INTERVAL * 2))
+		self.assertRaises(SearchAborted, search.search, 3)
+		self.assertEqual(board.fen(), fen)
+		self.assertFalse(board.move_stack)
+
+	def test_calculate_returns_completed_depth(self):
+		board = Board("r5k1/5ppp/8/8/8/2n5/5PPP/3R2K1 w - - 0 1")
+		limits = SearchLimits(max_nodes=POLL_INTERVAL * 100)
+		result = move_calculator.calculate_move(board, None, limits=limits)
+		self.assertIsNotNone(result[1])
+		self.assertTrue(result[2] >= 1)
+		self.assertTrue(limits.node_count < POLL_INTERVAL * 101)
+
+
+if __name__ == '__main__':
+	unittest.main()
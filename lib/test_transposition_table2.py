@@ -0,0 +1,126 @@
+import unittest
+import chess
+import transposition_table2
+from multiprocessing import shared_memory
+from transposition_table2 import tt_init, tt_inc_age, tt_store, tt_lookup, tt_lookup_helper
+from board import Board
+
+
+class TestTranspositionTable2(unittest.TestCase):
+
+	def setUp(self):
+		tt_init(64)
+
+	def test_store_and_lookup(self):
+		board = Board()
+		move = chess.Move.from_uci("e2e4")
+		tt_store(board, -100, 100, 25, move, 3, chess.WHITE)
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 3, chess.WHITE), [True, (25, move)])
+		# Not deep enough to use the score, but the move can still be used
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 4, chess.WHITE), [False, (25, move)])
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 3, chess.BLACK), [True, (-25, move)])
+
+		board.push(move)
+		self.assertIsNone(tt_lookup(board))
+
+	def test_bounds(self):
+		board = Board()
+		tt_store(board, 50, 100, 200, None, 2, chess.WHITE)
+		self.assertEqual(tt_lookup_helper(board, 0, 150, 2, chess.WHITE), [True, (200, None)])
+		self.assertEqual(tt_lookup_helper(board, 0, 250, 2, chess.WHITE), [False, (200, None)])
+
+	def test_bounds_swap_with_turn(self):
+		board = Board()
+		# A lower bound for black is an upper bound for white
+		tt_store(board, -100, -50, 200, None, 2, chess.BLACK)
+		self.assertEqual(tt_lookup_helper(board, -150, 0, 2, chess.WHITE), [True, (-200, None)])
+		self.assertEqual(tt_lookup_helper(board, -250, 0, 2, chess.WHITE), [False, (-200, None)])
+		self.assertEqual(tt_lookup_helper(board, 0, 150, 2, chess.BLACK), [True, (200, None)])
+
+	def test_filtered_entry(self):
+		board = Board()
+		move = chess.Move.from_uci("e2e4")
+		tt_store(board, -100, 100, 25, move, 3, chess.WHITE, filtered=True)
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 3, chess.WHITE, filtered=True),
+						[True, (25, move)])
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 3, chess.WHITE), [False, (25, move)])
+		# A full width entry replaces a filtered one and is used by both
+		tt_store(board, -100, 100, 10, move, 2, chess.WHITE)
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 2, chess.WHITE, filtered=True),
+						[True, (10, move)])
+		tt_store(board, -100, 100, 25, move, 3, chess.WHITE, filtered=True)
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 2, chess.WHITE), [True, (10, move)])
+
+	def test_promotion_move(self):
+		board = Board("8/1P4k1/8/8/8/8/6K1/8 w - - 0 1")
+		move = chess.Move.from_uci("b7b8n")
+		tt_store(board, -100, 100, 0, move, 1, chess.WHITE)
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 1, chess.WHITE)[1][1], move)
+
+	def test_shallower_entry_does_not_replace_deeper_entry(self):
+		board = Board()
+		tt_store(board, -100, 100, 25, None, 3, chess.WHITE)
+		tt_store(board, -100, 100, 10, None, 1, chess.WHITE)
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 3, chess.WHITE), [True, (25, None)])
+
+	def test_entries_survive_new_search(self):
+		board = Board()
+		tt_store(board, -100, 100, 25, None, 3, chess.WHITE)
+		tt_inc_age()
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 3, chess.WHITE), [True, (25, None)])
+
+	def test_old_entries_replaced_first(self):
+		tt_init(1)
+		boards = []
+		board = Board()
+		for move in ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5", "a7a6"]:
+			board.push(chess.Move.from_uci(move))
+			boards.append(board.copy())
+		old_boards = boards[:transposition_table2.tt_sub_size]
+		for board in old_boards:
+			tt_store(board, -100, 100, 0, None, 1, chess.WHITE)
+		tt_inc_age()
+		new_boards = boards[-2:]
+		for board in new_boards:
+			tt_store(board, -100, 100, 0, None, 1, chess.WHITE)
+		for board in new_boards:
+			self.assertIsNotNone(tt_lookup(board))
+
+	def test_init_mb(self):
+		transposition_table2.tt_init_mb(1)
+		self.assertEqual(len(transposition_table2.tt_hashes),
+						transposition_table2.tt_size * transposition_table2.tt_sub_size)
+		self.assertTrue(transposition_table2.tt_size * transposition_table2.tt_sub_size *
+						transposition_table2.TT_ENTRY_SIZE <= 1024 * 1024)
+
+	def test_torn_entry_is_ignored(self):
+		board = Board()
+		tt_store(board, -100, 100, 25, None, 3, chess.WHITE)
+		i = transposition_table2.tt_calc_slot(board.get_zh()) * transposition_table2.tt_sub_size
+		# Another process wrote the score of a different position but not yet its hash
+		transposition_table2.tt_scores[i] = 50
+		self.assertIsNone(tt_lookup(board))
+
+	def test_shared_table(self):
+		tt_init(64, shared=True)
+		self.assertTrue(transposition_table2.tt_is_shared())
+		board = Board()
+		move = chess.Move.from_uci("e2e4")
+		tt_store(board, -100, 100, 25, move, 3, chess.WHITE)
+		# A second mapping of the memory, as a helper process would have, sees the entry
+		name = transposition_table2.tt_shared_memory.name
+		other = shared_memory.SharedMemory(name=name)
+		try:
+			num_entries = transposition_table2.tt_size * transposition_table2.tt_sub_size
+			other_scores = other.buf[8 * num_entries:16 * num_entries].cast('d')
+			self.assertIn(25, other_scores.tolist())
+			other_scores.release()
+		finally:
+			other.close()
+		self.assertEqual(tt_lookup_helper(board, -100, 100, 3, chess.WHITE), [True, (25, move)])
+		tt_init(64)
+		self.assertFalse(transposition_table2.tt_is_shared())
+
+
+if __name__ == '__main__':
+	unittest.main()
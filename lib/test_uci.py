@@ -1,5 +1,11 @@
 import unittest
+import time
+import chess
 import uci
+import eval_cache
+import minimax_alpha_beta
+import transposition_table2
+import position_evaluator
 from board import Board
 
 
@@ -17,6 +23,27 @@ class TestUci(unittest.TestCase):
 		uci.set_option(parts, board)
 		self.assertFalse(board.chess960)
 
+		line = "setoption name Hash value 1"
+		parts = line.split(' ')
+		uci.set_option(parts, board)
+		self.assertTrue(transposition_table2.tt_size * transposition_table2.tt_sub_size *
+						transposition_table2.TT_ENTRY_SIZE <= 1024 * 1024)
+
+		uci.set_option("setoption name Threads value 2".split(' '), board)
+		self.assertEqual(uci.num_threads, 2)
+		uci.set_option("setoption name Threads value 1".split(' '), board)
+		self.assertEqual(uci.num_threads, 1)
+
+		uci.set_option("setoption name MultiPV value 3".split(' '), board)
+		self.assertEqual(uci.multipv, 3)
+		uci.set_option("setoption name MultiPV value 1".split(' '), board)
+		self.assertEqual(uci.multipv, 1)
+
+		uci.set_option("setoption name EvalCache value 2".split(' '), board)
+		self.assertEqual(eval_cache.eval_cache_mb, 2)
+		self.assertIsNone(minimax_alpha_beta.eval_cache)
+		uci.set_option(("setoption name EvalCache value %d" % eval_cache.DEFAULT_EVAL_CACHE_MB).split(' '), board)
+
 		# Test doesn't throw error
 		line = "setoption name go_commands value {'movetime': 1000}"
 		parts = line.split(' ')
@@ -26,9 +53,75 @@ class TestUci(unittest.TestCase):
 		board = Board()
 		line = "go movetime 1000"
 		parts = line.split(' ')
-		uci.go(parts, board)
-		
-		
+		uci.go(parts, board).join()
+		self.assertEqual(len(board.move_stack), 1)
+
+	def test_go_multipv(self):
+		board = Board()
+		uci.multipv = 2
+		try:
+			uci.go("go movetime 1000".split(' '), board).join()
+		finally:
+			uci.multipv = 1
+		self.assertEqual(len(board.move_stack), 1)
+
+	def test_get_score(self):
+		self.assertEqual(uci.get_score(25.4), 'cp 25')
+		# Mate in 2 is 3 plies away
+		self.assertEqual(uci.get_score(position_evaluator.MAX_EVAL - 3), 'mate 2')
+		self.assertEqual(uci.get_score(position_evaluator.MIN_EVAL + 4), 'mate -2')
+
+	def test_get_score_of_analysis(self):
+		# Back rank mate in 1, found by the analysis used for MultiPV
+		board = Board("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+		lines = minimax_alpha_beta.analyze(board, 2, multipv=2, num_workers=2)
+		self.assertEqual(lines[0][1][0], chess.Move.from_uci("a1a8"))
+		self.assertEqual(uci.get_score(lines[0][0]), 'mate 1')
+		self.assertTrue(uci.get_score(lines[1][0]).startswith('cp'))
+		# Mated in 1 whatever is played
+		board = Board("7k/5K2/8/8/8/8/8/R7 b - - 0 1")
+		lines = minimax_alpha_beta.analyze(board, 2, num_workers=2)
+		self.assertEqual(uci.get_score(lines[0][0]), 'mate -1')
+
+	def test_stop(self):
+		board = Board()
+		search_thread = uci.go("go infinite".split(' '), board)
+		time.sleep(.5)
+		self.assertTrue(search_thread.is_alive())
+		uci.stop()
+		self.assertFalse(search_thread.is_alive())
+		self.assertEqual(len(board.move_stack), 1)
+
+	def test_stop_multipv(self):
+		board = Board()
+		uci.multipv = 2
+		try:
+			search_thread = uci.go("go infinite".split(' '), board)
+			time.sleep(1)
+			self.assertTrue(search_thread.is_alive())
+			start = time.time()
+			uci.stop()
+			# The analysis workers stop in the middle of a depth
+			self.assertLess(time.time() - start, 1)
+		finally:
+			uci.multipv = 1
+		self.assertFalse(search_thread.is_alive())
+		self.assertEqual(len(board.move_stack), 1)
+
+	def test_ponderhit(self):
+		board = Board()
+		board.push(chess.Move.from_uci("e2e4"))
+		search_thread = uci.go("go ponder wtime 1000 btime 1000".split(' '), board)
+		time.sleep(.5)
+		# No bestmove while pondering
+		self.assertTrue(search_thread.is_alive())
+		self.assertIsNone(uci.search_limits.deadline)
+		uci.ponder_hit()
+		self.assertIsNotNone(uci.search_limits.deadline)
+		search_thread.join(10)
+		self.assertFalse(search_thread.is_alive())
+		self.assertEqual(len(board.move_stack), 2)
+
 
 if __name__ == '__main__':
 	unittest.main()
@@ -1,119 +1,266 @@
 # Making any modifications I like here in this file
 # Transposition Table for storing chess positions
 # Can be used to check if a position has already been evaluated
-# Uses chess.Board
+# Uses board.Board, which keeps the zobrist hash up to date as moves are pushed and popped
+# Entries are packed into parallel arrays, allocated once, and aged between moves instead of cleared
+# Scores are stored relative to the side to move in the stored position,
+# so the same entry can be read back for either root turn
+# The arrays can live in shared memory so worker processes of a parallel search share one table.
+# There are no locks: the stored hash is XORed with a checksum of the rest of the entry,
+# so an entry torn by two processes writing it at once no longer matches its position.
+import atexit
 import chess
-import chess.polyglot
-import copy
+from array import array
+from multiprocessing import shared_memory
+
+DEFAULT_HASH_MB = 16
 
-tt = []
-tt_size = 0
 # number of values that can be stored at each index in table
-tt_sub_size = 8
+tt_sub_size = 4
+# Bytes used by a single entry across all of the arrays
+# hash_ + score + move + depth + flags + age
+TT_ENTRY_SIZE = 8 + 8 + 2 + 1 + 1 + 1
+
+# Flags
+TT_EMPTY = 0
+TT_EXACT = 1 # Exact, no alpha beta cutoff
+TT_LOWER = 2 # Lower bound
+TT_UPPER = 3 # Upper bound
+TT_BOUND_MASK = 3
+# Set when the entry came from a search that used a move filter,
+# so its score is only trusted by other filtered searches
+TT_FILTERED = 4
+
+tt_size = 0
 tt_age = 0
+# Set when the arrays are views into shared memory
+tt_shared_memory = None
+# Whether this process created tt_shared_memory and so has to unlink it
+tt_owns_shared_memory = False
+
+# hash_ because hash is a keyword
+tt_hashes = array('Q')
+tt_scores = array('d')
+tt_moves = array('H')
+tt_depths = array('b')
+tt_flags = array('B')
+tt_ages = array('B')
 
-class tt_element(object):
-    __slots__ = [ 'hash_', 'score', 'flags', 'depth', 'age', 'move', 'turn' ]
-
-    # hash_ because hash is a keyword
-    # flags
-    def __init__(self, hash_, score, flags, depth, age, move, turn):
-        self.hash_ = hash_
-        self.score = score
-        self.flags = flags
-        self.depth = depth
-        self.age = age
-        self.move = move
-        self.turn = turn
-
-def tt_init(size):
-    global tt_size, tt_sub_size, tt
+def tt_init(size, shared=False):
+    """Allocates `size` slots of tt_sub_size entries each, clearing anything stored
+    A shared table can be attached to by other processes with tt_attach
+    """
+    global tt_size, tt_owns_shared_memory
+    tt_free()
     tt_size = size
-    tt = [[tt_element(None, None, None, -1, -1, None, False) for i in range(tt_sub_size)] for i in range(tt_size)]
+    num_entries = size * tt_sub_size
+    if shared:
+        memory = shared_memory.SharedMemory(create=True, size=TT_ENTRY_SIZE * num_entries)
+        tt_owns_shared_memory = True
+        _use_shared_memory(memory)
+    else:
+        _use_arrays(num_entries)
+
+def tt_attach(name, size):
+    """Uses the shared table called `name`, created by another process with tt_init
+    """
+    global tt_size, tt_owns_shared_memory
+    if tt_shared_memory is not None and tt_shared_memory.name == name:
+        # Already mapped, such as in a forked process, which mustn't unlink it
+        tt_owns_shared_memory = False
+        return
+    tt_free()
+    tt_size = size
+    _use_shared_memory(shared_memory.SharedMemory(name=name))
+
+def tt_free():
+    """Releases shared memory used by the table, unlinking it if this process created it
+    """
+    global tt_shared_memory, tt_owns_shared_memory
+    if tt_shared_memory is None:
+        return
+    # Views have to be released before the memory can be closed
+    for view in (tt_hashes, tt_scores, tt_moves, tt_depths, tt_flags, tt_ages):
+        view.release()
+    _use_arrays(0)
+    tt_shared_memory.close()
+    if tt_owns_shared_memory:
+        tt_shared_memory.unlink()
+    tt_shared_memory = None
+    tt_owns_shared_memory = False
+
+def _use_arrays(num_entries):
+    global tt_hashes, tt_scores, tt_moves, tt_depths, tt_flags, tt_ages
+    tt_hashes = array('Q', bytes(8 * num_entries))
+    tt_scores = array('d', bytes(8 * num_entries))
+    tt_moves = array('H', bytes(2 * num_entries))
+    tt_depths = array('b', bytes(num_entries))
+    tt_flags = array('B', bytes(num_entries))
+    tt_ages = array('B', bytes(num_entries))
+
+def _use_shared_memory(memory):
+    """Lays the arrays out one after another in memory, largest items first so each is aligned
+    """
+    global tt_shared_memory, tt_hashes, tt_scores, tt_moves, tt_depths, tt_flags, tt_ages
+    tt_shared_memory = memory
+    num_entries = tt_size * tt_sub_size
+    buf = memory.buf
+    offset = 0
+    views = []
+    for item_format, item_size in (('Q', 8), ('d', 8), ('H', 2), ('b', 1), ('B', 1), ('B', 1)):
+        views.append(buf[offset:offset + item_size * num_entries].cast(item_format))
+        offset += item_size * num_entries
+    tt_hashes, tt_scores, tt_moves, tt_depths, tt_flags, tt_ages = views
+
+def tt_init_mb(size_mb, shared=False):
+    """Sizes the table to use roughly `size_mb` megabytes
+    """
+    tt_init(max(1, size_mb * 1024 * 1024 // (TT_ENTRY_SIZE * tt_sub_size)), shared)
+
+def tt_is_shared():
+    return tt_shared_memory is not None
 
 def tt_inc_age():
+    """Should be called before each new search so entries from old searches get replaced first
+    """
     global tt_age
-    tt_age += 1
+    tt_age = (tt_age + 1) % 256
 
 def tt_calc_slot(hash_):
     global tt_size
     return hash_ % tt_size
 
-def tt_store(board, alpha, beta, score, move, depth, turn):
-    global tt_sub_size, tt, tt_age
+def tt_checksum(i):
+    """Mixes every field of the entry other than the hash into 64 bits
+    hash() of a float is the same in every process
+    """
+    return (hash(tt_scores[i]) ^ tt_moves[i] ^ ((tt_depths[i] & 0xFF) << 16) ^
+            (tt_flags[i] << 24) ^ (tt_ages[i] << 32)) & 0xFFFFFFFFFFFFFFFF
+
+def tt_get_hash(i):
+    """The hash of the position stored at i, which won't match any position if the entry is torn
+    """
+    return tt_hashes[i] ^ tt_checksum(i)
+
+def encode_move(move):
+    """Packs a move into 16 bits. None and the null move are both 0.
+    """
+    if not move:
+        return 0
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+def decode_move(encoded_move):
+    if encoded_move == 0:
+        return None
+    return chess.Move(encoded_move & 63, (encoded_move >> 6) & 63, (encoded_move >> 12) or None)
+
+def tt_store(board, alpha, beta, score, move, depth, turn, filtered=False):
+    """alpha, beta and score are relative to turn.
+    alpha and beta should be the window the node was searched with, not the updated values.
+    """
+    if board.turn != turn:
+        score, alpha, beta = -score, -beta, -alpha
 
     if score <= alpha:
-        flags = 'U' # Upper bound
+        bound = TT_UPPER
     elif score >= beta:
-        flags = 'L' # Lower bound
+        bound = TT_LOWER
     else:
-        flags = 'E' # Exact, no alpha beta cutoff
+        bound = TT_EXACT
 
-    h = chess.polyglot.zobrist_hash(board)
-    idx = tt_calc_slot(h)
+    h = board.get_zh()
+    start = tt_calc_slot(h) * tt_sub_size
 
-    # subarray index
+    # Index of the entry to replace
     use_ss = None
-    use_ss2 = None
     min_depth = 99999
 
-    for i in range(0, tt_sub_size):
-        if tt[idx][i].hash_ == h:
-            if tt[idx][i].depth > depth:
+    for i in range(start, start + tt_sub_size):
+        if tt_get_hash(i) == h and tt_flags[i] != TT_EMPTY:
+            stored_filtered = bool(tt_flags[i] & TT_FILTERED)
+            # A full width result is always kept over a filtered one
+            if filtered and not stored_filtered:
                 return
 
-            if flags != 'E' and tt[idx][i].depth == depth:
-                return
+            if filtered == stored_filtered:
+                if tt_depths[i] > depth:
+                    return
+
+                if bound != TT_EXACT and tt_depths[i] == depth:
+                    return
 
             use_ss = i
             break
 
-        if tt[idx][i].age != tt_age:
+        # Prefer empty entries, then entries from old searches, then the shallowest entry
+        if tt_flags[i] == TT_EMPTY or tt_ages[i] != tt_age:
+            depth_priority = -2 if tt_flags[i] == TT_EMPTY else -1
+        else:
+            depth_priority = tt_depths[i]
+        if depth_priority < min_depth:
+            min_depth = depth_priority
             use_ss = i
-        elif tt[idx][i].depth < min_depth:
-            min_depth = tt[idx][i].depth
-            use_ss2 = i
-
-        if not use_ss:
-            use_ss = use_ss2
 
-    tt[idx][use_ss] = tt_element(h, score, flags, depth, tt_age, move, turn)
+    tt_scores[use_ss] = score
+    tt_moves[use_ss] = encode_move(move)
+    tt_depths[use_ss] = depth
+    tt_flags[use_ss] = bound | (TT_FILTERED if filtered else 0)
+    tt_ages[use_ss] = tt_age
+    tt_hashes[use_ss] = h ^ tt_checksum(use_ss)
 
 def tt_lookup(board):
-    global tt_sub_size, tt
+    """Returns (score, encoded move, depth, flags) of the entry for the position or None
+    The fields are copied so another process overwriting the entry can't change them
+    """
+    hash_ = board.get_zh()
+    start = tt_calc_slot(hash_) * tt_sub_size
 
-    hash_ = chess.polyglot.zobrist_hash(board)
-    idx = tt_calc_slot(hash_)
-
-    for i in range(0, tt_sub_size):
-        if tt[idx][i].hash_ == hash_:
-            if tt[idx][i].move == None or tt[idx][i].move in board.legal_moves:
-                return tt[idx][i]
+    for i in range(start, start + tt_sub_size):
+        entry = (tt_scores[i], tt_moves[i], tt_depths[i], tt_flags[i])
+        stored_hash = tt_hashes[i]
+        if entry[3] != TT_EMPTY and stored_hash ^ tt_checksum(i) == hash_ and \
+                entry == (tt_scores[i], tt_moves[i], tt_depths[i], tt_flags[i]):
+            move = decode_move(entry[1])
+            if move is None or board.is_legal(move):
+                return entry
 
     return None
 
-# Returns [bool, (score, move)]
-def tt_lookup_helper(board, alpha, beta, depth, turn):
-    tt_hit = tt_lookup(board)
-    if not tt_hit:
+# Returns [bool, (score, move)] or None if the position is not stored
+# The bool is whether the score can be used as the result of the search
+# The move can still be used for move ordering when the bool is False
+def tt_lookup_helper(board, alpha, beta, depth, turn, filtered=False):
+    entry = tt_lookup(board)
+    if entry is None:
         return None
 
-    if tt_hit.turn != turn:
-        tt_hit.score = -tt_hit.score
-    full_move = (tt_hit.score, tt_hit.move)
+    score, encoded_move, stored_depth, flags = entry
+    bound = flags & TT_BOUND_MASK
+    # Convert from the side to move back to turn, which swaps the bounds
+    if board.turn != turn:
+        score = -score
+        if bound == TT_LOWER:
+            bound = TT_UPPER
+        elif bound == TT_UPPER:
+            bound = TT_LOWER
+    full_move = (score, decode_move(encoded_move))
+
+    if stored_depth < depth:
+        return [ False, full_move ]
 
-    if tt_hit.depth < depth:
+    if flags & TT_FILTERED and not filtered:
         return [ False, full_move ]
 
-    # Todo: what to do with E, L, and U
-    if tt_hit.flags == 'E':
+    if bound == TT_EXACT:
         return [ True, full_move ]
 
-    if tt_hit.flags == 'L' and tt_hit.score >= beta:
+    if bound == TT_LOWER and score >= beta:
         return [ True, full_move ]
 
-    if tt_hit.flags == 'U' and tt_hit.score <= alpha:
+    if bound == TT_UPPER and score <= alpha:
         return [ True, full_move ]
 
     return [ False, full_move ]
 
+tt_init_mb(DEFAULT_HASH_MB)
+atexit.register(tt_free)
@@ -8,11 +8,31 @@ import sys
 import threading
 import time
 import traceback
+import eval_cache
+import minimax_alpha_beta
 import move_calculator
 import think_time_calculator
+import transposition_table2
+from constants import MAX_MATING_EVAL, MIN_MATING_EVAL
+from search_limits import SearchLimits
 from log import l
 
-ponder = False
+MAX_THREADS = 64
+MAX_MULTIPV = 256
+MAX_EVAL_CACHE_MB = 1024
+
+# The search runs on its own thread so commands like stop and isready are handled during it
+search_thread = None
+search_limits = None
+# Think time to use once the ponder move is played
+ponder_think_time = None
+# Number of processes searching each position, set with the Threads option
+num_threads = 1
+# Number of best lines to report, set with the MultiPV option
+# Above 1, every root move is analyzed instead of searching for the best move
+multipv = 1
+# Set when bestmove can be sent after pondering or an infinite search
+search_end = threading.Event()
 
 class stdin_reader(threading.Thread):
 	q = Queue()
@@ -46,18 +66,36 @@ def send(str_):
 def uci():
 	send('id name FENder_Bender')
 	send('id author Matt')
+	send('option name Hash type spin default %d min 1 max 4096' % transposition_table2.DEFAULT_HASH_MB)
+	send('option name EvalCache type spin default %d min 1 max %d' % (eval_cache.DEFAULT_EVAL_CACHE_MB,
+		MAX_EVAL_CACHE_MB))
+	send('option name Threads type spin default 1 min 1 max %d' % MAX_THREADS)
+	send('option name MultiPV type spin default 1 min 1 max %d' % MAX_MULTIPV)
+	send('option name UCI_Chess960 type check default false')
+	send('option name Ponder type check default false')
 	send('uciok')
 
 def is_ready():
 	send('readyok')
 
-# Todo: Update with other setoption possibilities
 def set_option(parts, board):
+	global num_threads, multipv
 	if len(parts) >= 5:
 		name = parts[2]
+		value = parts[4]
 		if name == "UCI_Chess960":
-			value = parts[4]
 			board.chess960 = strtobool(value)
+		elif name == "Hash":
+			# Size in MB, kept in shared memory when helper processes search too
+			transposition_table2.tt_init_mb(int(value), num_threads > 1)
+		elif name == "EvalCache":
+			# Size in MB of the caches of leaf evaluations, which are made again at the new size
+			eval_cache.set_eval_cache_mb(max(1, min(MAX_EVAL_CACHE_MB, int(value))))
+			minimax_alpha_beta.eval_cache = None
+		elif name == "Threads":
+			num_threads = max(1, min(MAX_THREADS, int(value)))
+		elif name == "MultiPV":
+			multipv = max(1, min(MAX_MULTIPV, int(value)))
 	else:
 		raise ValueError("setoption should have at least 5 space separated parts, such as 'setoption name UCI_Chess960 value true': " + parts)
 
@@ -88,6 +126,8 @@ def position(parts, board):
 
 		elif parts[nr] == 'moves':
 			is_moves = True
+			# Hash before replaying the game so repetition checks can use the zobrist hashes
+			board.get_zh()
 
 		else:
 			l('unknown: %s' % parts[nr])
@@ -103,8 +143,9 @@ def go(parts, board):
 	wtime = btime = None
 	winc = binc = 0
 	movestogo = None
+	nodes = None
 	ponder = False
-	ponder_move = None
+	infinite = False
 
 	nr = 1
 	while nr < len(parts):
@@ -136,10 +177,16 @@ def go(parts, board):
 			depth = int(parts[nr + 1])
 			nr += 1
 
+		elif parts[nr] == 'nodes':
+			nodes = int(parts[nr + 1])
+			nr += 1
+
+		# The ponder move has already been played in the position
 		elif parts[nr] == 'ponder':
 			ponder = True
-			ponder_move = parts[nr + 1]
-			nr += 1
+
+		elif parts[nr] == 'infinite':
+			infinite = True
 
 		else:
 			l('unknown: %s' % parts[nr])
@@ -160,11 +207,33 @@ def go(parts, board):
 	if depth == None:
 		depth = 10
 
-	result = move_calculator.calculate_with_thread(board, current_duration,
-												depth, is_ponder=ponder)
+	global search_thread, search_limits, ponder_think_time
+	wait_for_stop = ponder or infinite
+	search_limits = SearchLimits(None if wait_for_stop else current_duration, max_nodes=nodes)
+	ponder_think_time = None if infinite else current_duration
+	search_end.clear()
+	search_thread = threading.Thread(target=search, args=(board, search_limits, depth, wait_for_stop))
+	search_thread.start()
+	return search_thread
+
+
+def search(board, limits, depth, wait_for_stop):
+	if multipv > 1:
+		result = analyze(board, limits, depth)
+	else:
+		result = move_calculator.calculate_move(board, limits.max_think_time, depth,
+													is_ponder=wait_for_stop, limits=limits,
+													num_threads=num_threads)
+
+	# bestmove can't be sent while pondering or searching infinitely until ponderhit or stop
+	if wait_for_stop:
+		search_end.wait()
 
 	if result and result[1]:
-		send('bestmove %s' % result[1].uci())
+		if result[4]:
+			send('bestmove %s ponder %s' % (result[1].uci(), result[4].uci()))
+		else:
+			send('bestmove %s' % result[1].uci())
 		board.push(result[1])
 
 	else:
@@ -173,6 +242,53 @@ def go(parts, board):
 		send('bestmove a1a1')
 
 
+def analyze(board, limits, depth):
+	"""Analyzes every root move with a process per thread, sending the best multipv lines after each depth
+	The processes share the transposition table, as the Lazy SMP helpers do.
+	Returns (evaluation, move, depth, time, ponder move) for the best line
+	"""
+	lines, depth_reached = minimax_alpha_beta.analyze_in_time(board.copy(), limits, depth, multipv,
+															num_threads, report=send_lines, use_tt=True)
+	if not lines:
+		return None
+	evaluation, pv = lines[0]
+	ponder_move = pv[1] if len(pv) > 1 and pv[1] else None
+	return [evaluation, pv[0], depth_reached, limits.get_elapsed_time(), ponder_move]
+
+
+def send_lines(lines, depth):
+	for i, (evaluation, pv) in enumerate(lines):
+		send('info depth %d multipv %d score %s pv %s' %
+			(depth, i + 1, get_score(evaluation), ' '.join(move.uci() for move in pv if move)))
+
+
+def get_score(evaluation):
+	"""UCI score of an evaluation, such as 'cp 25' or 'mate -2'
+	"""
+	if evaluation >= MAX_MATING_EVAL or evaluation <= MIN_MATING_EVAL:
+		moves_to_mate = (move_calculator.get_mate_distance(evaluation) + 1) // 2
+		return 'mate %d' % (moves_to_mate if evaluation > 0 else -moves_to_mate)
+	return 'cp %d' % round(evaluation)
+
+
+def stop():
+	"""Stops the search, if there is one, and waits for bestmove to be sent
+	"""
+	if search_thread is not None and search_thread.is_alive():
+		search_limits.stop()
+		search_end.set()
+		search_thread.join()
+
+
+def ponder_hit():
+	"""The opponent played the ponder move, so the search continues with the normal think time
+	Entries the search has already stored stay in the transposition table
+	"""
+	if search_thread is not None and search_thread.is_alive():
+		search_limits.set_max_think_time(ponder_think_time)
+		search_end.set()
+
+
 def fen(board):
 	send('%s' % board.fen())
 
@@ -205,23 +321,35 @@ def main():
 			elif parts[0] == 'isready':
 				is_ready()
 
+			elif parts[0] == 'stop':
+				stop()
+
+			elif parts[0] == 'ponderhit':
+				ponder_hit()
+
 			elif parts[0] == 'setoption':
+				stop()
 				set_option(parts, board)
 
 			elif parts[0] == 'ucinewgame':
+				stop()
 				uci_new_game()
 				board = Board()
 
 			elif parts[0] == 'position':
+				stop()
 				position(parts, board)
 
 			elif parts[0] == 'go':
+				stop()
 				go(parts, board)
 
 			elif parts[0] == 'quit':
+				stop()
 				break
 
 			elif parts[0] == 'fen':
+				stop()
 				fen(board)
 
 			else: